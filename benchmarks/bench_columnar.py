@@ -0,0 +1,121 @@
+"""
+Benchmark of loading the metadata of a large upload.
+
+Writes the metadata of the same images as a json file per image, a metadata.jsonl manifest, a
+metadata.csv table and a binary columnar metadata.cols table, then reports the size of each
+and the time to load it back: json.load of every file, json.loads of every line, csv reading,
+and read_columnar.
+
+Usage (from repo root):
+    python -m benchmarks.bench_columnar --images 10000
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+from utils.extract_meta import (
+    MetadataManifest,
+    METADATA_JSONL,
+    METADATA_CSV,
+    METADATA_COLUMNAR,
+    _write_to_json,
+)
+from utils.columnar import read_columnar
+
+
+def _metadata(i: int) -> dict:
+    return {
+        "format": "JPEG",
+        "mode": "RGB",
+        "size": [6000, 4000],
+        "exif": {
+            "Make": "NIKON CORPORATION",
+            "Model": "NIKON D750",
+            "Software": "Ver.1.10",
+            "DateTime": f"2020:01:{i % 28 + 1:02d} 12:00:00",
+            "DateTimeOriginal": f"2020:01:{i % 28 + 1:02d} 12:00:00",
+            "Orientation": 1,
+            "ExposureTime": 1 / (i % 1000 + 1),
+            "FNumber": 2.8 + i % 10,
+            "ISOSpeedRatings": 100 * (i % 64 + 1),
+            "ExposureBiasValue": 0.0,
+            "MeteringMode": 5,
+            "Flash": 16,
+            "FocalLength": 50.0,
+            "FocalLengthIn35mmFilm": 50,
+            "LensModel": "50.0 mm f/1.8",
+            "MakerNote": {"length": 5000, "sha256": f"{i:064x}"},
+        },
+        "gps": {"latitude": -33.86 + i / 1e5, "longitude": 151.21 - i / 1e5},
+    }
+
+
+def _time(load) -> float:
+    start = time.perf_counter()
+    load()
+    return time.perf_counter() - start
+
+
+def _size(paths: list[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def run(images: int) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        files_folder = os.path.join(folder, "files")
+        os.mkdir(files_folder)
+        manifests = {
+            output: MetadataManifest(folder, output)
+            for output in (METADATA_JSONL, METADATA_CSV, METADATA_COLUMNAR)
+        }
+        for i in range(images):
+            metadata = _metadata(i)
+            _write_to_json(os.path.join(files_folder, f"DSC_{i}.jpg"), metadata)
+            for manifest in manifests.values():
+                manifest.add(f"DSC_{i}.jpg", metadata)
+        for manifest in manifests.values():
+            manifest.close()
+        json_files = [os.path.join(files_folder, name) for name in os.listdir(files_folder)]
+
+        def load_files():
+            for path in json_files:
+                with open(path) as f:
+                    json.load(f)
+
+        def load_jsonl():
+            with open(manifests[METADATA_JSONL].path) as f:
+                [json.loads(line) for line in f]
+
+        def load_csv():
+            with open(manifests[METADATA_CSV].path, newline="") as f:
+                list(csv.reader(f))
+
+        def load_columnar():
+            read_columnar(manifests[METADATA_COLUMNAR].path)
+
+        results = [
+            ("json files", _size(json_files), _time(load_files)),
+            ("metadata.jsonl", _size([manifests[METADATA_JSONL].path]), _time(load_jsonl)),
+            ("metadata.csv", _size([manifests[METADATA_CSV].path]), _time(load_csv)),
+            (
+                "metadata.cols",
+                _size([manifests[METADATA_COLUMNAR].path]),
+                _time(load_columnar),
+            ),
+        ]
+
+    print(f"images:           {images}")
+    print(f"{'output':18}{'size':>12}{'load':>12}")
+    for name, size, seconds in results:
+        print(f"{name:18}{size / 1000:>10.0f}kB{seconds * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=10000, help="number of images")
+    args = parser.parse_args()
+    run(args.images)
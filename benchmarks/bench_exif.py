@@ -0,0 +1,81 @@
+"""
+Benchmark of reading image metadata at different image resolutions.
+
+Compares Pillow, opening the image and calling _getexif twice like extract_image_metadata did,
+with the header-only reader of utils.image_header. Images are generated in memory with the same
+EXIF data at each resolution, as JPEG and as PNG, and each is read repeatedly from an in-memory
+buffer. Reports the mean cost per image.
+
+Usage (from repo root):
+    python -m benchmarks.bench_exif --repeat 50
+"""
+
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from utils.extract_meta import load_image_plugins, IMAGE_FORMATS
+from utils.image_header import read_image_header, parse_exif
+
+
+RESOLUTIONS = (256, 1024, 4096)
+
+
+def _create_image(image_format: str, side: int) -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = "Maker"
+    exif[0x0110] = "Model"
+    exif[0x0132] = "2020:01:01 00:00:00"
+    exif[0x8769] = {0x829A: 0.004, 0x829D: 2.8, 0x8827: 100, 0x920A: 50.0}
+    exif[0x8825] = {1: "S", 2: (33.0, 51.0, 36.0), 3: "E", 4: (151.0, 12.0, 36.0)}
+
+    # a gradient, so the pixel data does not compress to nothing
+    image = Image.linear_gradient("L").resize((side, side)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, exif=exif)
+    return buffer.getvalue()
+
+
+def _read_pillow(data: bytes) -> None:
+    with Image.open(io.BytesIO(data), formats=IMAGE_FORMATS) as img:
+        img.format, img.mode, img.size
+        if img._getexif() is not None:
+            img._getexif().items()
+
+
+def _read_header(data: bytes) -> None:
+    header = read_image_header(data)
+    if header.exif is not None:
+        parse_exif(header.exif)
+
+
+def _time(read, data: bytes, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(data)
+    return (time.perf_counter() - start) / repeat
+
+
+def run(repeat: int) -> None:
+    load_image_plugins()
+    print(f"repeat:           {repeat} reads per image")
+    print(f"{'image':18}{'file size':>12}{'pillow':>12}{'header':>12}")
+    for image_format in IMAGE_FORMATS:
+        for side in RESOLUTIONS:
+            data = _create_image(image_format, side)
+            pillow = _time(_read_pillow, data, repeat)
+            header = _time(_read_header, data, repeat)
+            name = f"{image_format} {side}x{side}"
+            print(
+                f"{name:18}{len(data) / 1000:>10.0f}kB"
+                f"{pillow * 1000:>10.3f}ms{header * 1000:>10.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50, help="number of reads per image")
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,124 @@
+"""
+Benchmark of opening images with Pillow in a fresh worker.
+
+Compares Pillow's lazy initialization, where the first Image.open imports plugins and a file
+that is not identified loads every plugin, with the plugins loaded at startup by
+load_image_plugins and images opened with formats=IMAGE_FORMATS. Each variant runs in a fresh
+interpreter and reports the latency of the first open, the first open of a file that is not an
+image, and the mean cost of later opens. An open reads the image's EXIF data, like
+extract_image_metadata does.
+
+Usage (from repo root):
+    python -m benchmarks.bench_image_open --opens 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+TEST_IMAGE = os.path.join("test", "testing_files", "valid_single", "DSC_2233.jpg")
+VARIANTS = ("lazy", "preloaded")
+
+
+def _open(path: str, formats) -> None:
+    from PIL import Image
+
+    with Image.open(path, formats=formats) as img:
+        img._getexif()
+
+
+def _open_invalid(path: str, formats) -> None:
+    from PIL import UnidentifiedImageError
+
+    try:
+        _open(path, formats)
+    except UnidentifiedImageError:
+        pass
+
+
+def _child(variant: str, opens: int, invalid_path: str) -> None:
+    """
+    Runs one variant in this interpreter and prints its timings as json.
+    """
+    start = time.perf_counter()
+    if variant == "preloaded":
+        from utils.extract_meta import load_image_plugins, IMAGE_FORMATS
+
+        load_image_plugins()
+        formats = IMAGE_FORMATS
+    else:
+        from PIL import Image  # noqa: F401
+
+        formats = None
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _open(TEST_IMAGE, formats)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _open_invalid(invalid_path, formats)
+    first_invalid = time.perf_counter() - start
+
+    times = []
+    for _ in range(opens):
+        start = time.perf_counter()
+        _open(TEST_IMAGE, formats)
+        times.append(time.perf_counter() - start)
+
+    print(
+        json.dumps(
+            {
+                "startup": startup,
+                "first": first,
+                "first_invalid": first_invalid,
+                "per_open": statistics.mean(times),
+            }
+        )
+    )
+
+
+def run(opens: int, runs: int) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as invalid:
+        invalid.write(b"\xff\xd8\xff" + b"0" * 1000)
+        invalid.flush()
+
+        results = {variant: [] for variant in VARIANTS}
+        for _ in range(runs):
+            for variant in VARIANTS:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_image_open"]
+                    + ["--child", variant, "--opens", str(opens), "--invalid", invalid.name],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                results[variant].append(json.loads(output))
+
+    print(f"runs:             {runs} fresh interpreters per variant, {opens} opens each")
+    print(f"{'':18}{'startup':>10}{'first open':>12}{'first invalid':>15}{'per open':>10}")
+    for variant, timings in results.items():
+        median = {key: statistics.median(t[key] for t in timings) * 1000 for key in timings[0]}
+        print(
+            f"{variant:18}{median['startup']:>8.2f}ms{median['first']:>10.2f}ms"
+            f"{median['first_invalid']:>13.2f}ms{median['per_open']:>8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--opens", type=int, default=200, help="number of opens per run")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters")
+    parser.add_argument("--child", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--invalid", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child, args.opens, args.invalid)
+    else:
+        run(args.opens, args.runs)
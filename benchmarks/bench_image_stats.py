@@ -0,0 +1,62 @@
+"""
+Benchmark of computing the pixel statistics of large images.
+
+Compares compute_image_stats on a fully decoded image with the default draft mode decoding at a
+reduced size, for JPEG images of increasing resolution generated in memory. Reports the mean
+cost per image, and the largest difference of the channel means between the two.
+
+Usage (from repo root):
+    python -m benchmarks.bench_image_stats --repeat 5
+"""
+
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from utils.image_stats import compute_image_stats, STATS_SIZE
+
+
+# width, height; 6000x4000 is a 24 MP camera image
+RESOLUTIONS = ((1500, 1000), (3000, 2000), (6000, 4000))
+
+
+def _create_image(width: int, height: int) -> bytes:
+    # a gradient, so the pixel data does not compress to nothing
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _stats(data: bytes, size: int) -> dict:
+    with Image.open(io.BytesIO(data)) as img:
+        return compute_image_stats(img, size)
+
+
+def _time(data: bytes, size: int, repeat: int) -> tuple[float, dict]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        stats = _stats(data, size)
+    return (time.perf_counter() - start) / repeat, stats
+
+
+def run(repeat: int) -> None:
+    print(f"repeat:           {repeat} images per resolution")
+    print(f"{'image':18}{'full decode':>14}{'draft':>12}{'mean diff':>12}")
+    for width, height in RESOLUTIONS:
+        data = _create_image(width, height)
+        # the shorter side as size decodes every pixel and skips the reduction
+        full, full_stats = _time(data, min(width, height), repeat)
+        draft, draft_stats = _time(data, STATS_SIZE, repeat)
+        diff = max(abs(full_stats["mean"][c] - draft_stats["mean"][c]) for c in "RGB")
+        name = f"{width}x{height}"
+        print(f"{name:18}{full * 1000:>12.1f}ms{draft * 1000:>10.1f}ms{diff:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="number of images per resolution")
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,75 @@
+"""
+Throughput benchmark for the /login endpoint.
+
+Runs the app in-process with the in-memory user store, registers one user and sends login
+requests from several client threads. Reports throughput, latency percentiles and how many
+requests were rejected with 503 because the password hashing pool was saturated.
+
+Usage (from repo root):
+    python -m benchmarks.bench_login --threads 8 --requests 200
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("STORE_BACKEND", "memory")
+os.environ.setdefault("FLASK_SECRET_KEY", "benchmark-secret-key")
+
+from exif import app, user_store, LOGIN_SUCCESS, ERR_AUTH_BUSY  # noqa: E402
+from models.users import USERNAME_FIELD, PASSWORD_FIELD  # noqa: E402
+
+
+CREDENTIALS = {USERNAME_FIELD: "bench_user", PASSWORD_FIELD: "bench_password"}
+
+
+def _worker(num_requests: int, latencies: list, statuses: list) -> None:
+    with app.test_client() as client:
+        for _ in range(num_requests):
+            start = time.perf_counter()
+            response = client.post("/login", json=CREDENTIALS)
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+
+def run(threads: int, requests: int) -> None:
+    user_store.delete_user(CREDENTIALS[USERNAME_FIELD])
+    with app.test_client() as client:
+        client.post("/register", json=CREDENTIALS)
+
+    latencies, statuses = [], []
+    per_thread = max(1, requests // threads)
+    workers = [
+        threading.Thread(target=_worker, args=(per_thread, latencies, statuses))
+        for _ in range(threads)
+    ]
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    user_store.delete_user(CREDENTIALS[USERNAME_FIELD])
+
+    succeeded = statuses.count(LOGIN_SUCCESS[1])
+    rejected = statuses.count(ERR_AUTH_BUSY[1])
+    latencies.sort()
+    print(f"bcrypt rounds:    {app.config['BCRYPT_LOG_ROUNDS']}")
+    print(f"hash workers:     {app.config['PASSWORD_HASH_WORKERS']}")
+    print(f"client threads:   {threads}")
+    print(f"requests:         {len(statuses)} ({succeeded} ok, {rejected} rejected with 503)")
+    print(f"throughput:       {succeeded / elapsed:.1f} logins/s")
+    print(f"latency p50:      {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p99:      {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8, help="number of client threads")
+    parser.add_argument("--requests", type=int, default=200, help="total number of logins")
+    args = parser.parse_args()
+    run(args.threads, args.requests)
@@ -1,7 +1,61 @@
+import os
+
+
 class Config:
     USERS_COLLECTION = "users"
+    METADATA_COLLECTION = "metadata"
+    # maximum number of metadata documents written per insert_many round trip
+    METADATA_BATCH_SIZE = 500
+    # resumable uploads (/uploads) carry the zipfile in chunks, so they allow larger zipfiles
+    RESUMABLE_UPLOAD_SIZE_LIMIT_MB = 500
+    RESUMABLE_UPLOAD_CHUNK_LIMIT_MB = 16
+    # upload temp folders are created under WORKSPACE_ROOT (default "temp"), e.g. a tmpfs such as
+    # /dev/shm/exif; abandoned resumable upload sessions are deleted after the session TTL
+    WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT")
+    WORKSPACE_QUOTA_MB = 2000
+    WORKSPACE_SESSION_TTL_MINS = 24 * 60
+    WORKSPACE_SWEEP_INTERVAL_S = 10
+    # free space kept on the workspace's filesystem beyond what in-flight uploads reserved
+    WORKSPACE_DISK_HEADROOM_MB = 100
+    # uploads processed at once, by count and by total size; others wait in a queue for up to
+    # UPLOAD_ADMISSION_TIMEOUT_S and are then rejected with 503 and Retry-After
+    UPLOAD_MAX_IN_FLIGHT = 4
+    UPLOAD_MAX_IN_FLIGHT_MB = 400
+    UPLOAD_ADMISSION_QUEUE_LIMIT = 16
+    UPLOAD_ADMISSION_TIMEOUT_S = 5
+    # image processing threads, shared fairly between users in weighted round robin (weights
+    # default to 1); uploads up to PROCESSING_FAST_LANE_MB also use dedicated fast lane threads
+    PROCESSING_WORKERS = 4
+    PROCESSING_FAST_LANE_WORKERS = 1
+    PROCESSING_FAST_LANE_MB = 10
+    PROCESSING_USER_WEIGHTS = {}
+    # GridFS bucket holding result zips for re-download, and how long they are kept
+    RESULTS_BUCKET = "results"
+    RESULT_TTL_MINS = 24 * 60
+    RESULT_PURGE_INTERVAL_S = 300
+    # binary EXIF values (e.g. MakerNote) longer than this are "omit"ted, "summary"-ized by length
+    # and hash, or also written to a "sidecar" .bin file; uploads can choose with ?binary=
+    EXIF_BINARY_LIMIT_BYTES = 256
+    EXIF_BINARY_POLICY = "summary"
+    # metadata is written to a json file per image ("files"), or to a single compact manifest,
+    # metadata.json ("json"), metadata.jsonl ("jsonl"), a typed table metadata.csv ("csv") or
+    # the binary columnar metadata.cols ("columnar"); uploads can choose with ?output=
+    METADATA_OUTPUT = "files"
+    # add each image's luminance histogram, channel mean/variance and clipping ratios, computed
+    # from a reduced size decode; uploads can choose with ?stats=true|false
+    IMAGE_STATS_ENABLED = False
+    MONGO_MAX_POOL_SIZE = 100
+    MONGO_MIN_POOL_SIZE = 0
+    # MongoDB commands taking at least this long are logged with the request id
+    MONGO_SLOW_OP_THRESHOLD_MS = 100
+    # "mongo" or "memory"; the in-memory backend needs no services but is per-process
+    STORE_BACKEND = os.getenv("STORE_BACKEND", "mongo")
     JWT_EXPIRATION_DELTA_MINS = 30
     JWT_REFRESH_WINDOW_MINS = 15
+    # bcrypt cost factor; stored hashes with a different cost are rehashed on login
+    BCRYPT_LOG_ROUNDS = 12
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE_LIMIT = 16
 
 
 class DevelopmentConfig(Config):
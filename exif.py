@@ -2,17 +2,20 @@
 Flask app for uploading zip files containing images, extracting metadata from the images, and returning a zip file
 """
 
-import shutil
+import concurrent.futures
+import functools
 import uuid
 import logging
 import zipfile
 import os
 import datetime
 from io import BytesIO
+from typing import Callable
 
 from dotenv import load_dotenv
-from flask import Flask, request, send_file, make_response, jsonify
+from flask import Flask, Response, request, send_file, make_response, jsonify
 from flask_cors import CORS
+from werkzeug.wsgi import wrap_file
 from flask_jwt_extended import (
     JWTManager,
     jwt_required,
@@ -22,32 +25,69 @@ from flask_jwt_extended import (
     set_access_cookies,
     unset_jwt_cookies,
 )
-from flask_bcrypt import Bcrypt
 
 from utils.constants import ZIP_NAME
-from utils.extract_meta import extract_metadata, ExtractMetaError
-from utils.zip import unzip_file, zip_files, ZipError, UnzipError
+from utils.extract_meta import (
+    extract_image_metadata,
+    load_image_plugins,
+    ExtractMetaError,
+    BINARY_POLICIES,
+    METADATA_FILES,
+    METADATA_OUTPUTS,
+    TABLE_OUTPUTS,
+    MetadataManifest,
+    resolve_tags,
+)
+from utils.zip import unzip_file, zip_files, get_uncompressed_size, ZipError, UnzipError
 from utils.upload_utils import (
-    validate_zip_contents,
-    check_zip_size,
-    save_file,
-    create_temp_folder,
+    validate_image_filename,
+    validate_image_file,
+    validate_image_stream,
+    save_stream,
     InvalidFileError,
     LargeZipError,
     CreateTempFolderError,
-    SaveZipFileError,
+    SaveFileError,
     ZIP_SIZE_LIMIT_MB,
 )
-from utils.mongo_utils import (
-    create_mongo_client,
-    create_db,
-    create_collection,
-    close_connection,
-    add_user,
-    get_user,
+from utils.multipart import (
+    MultipartReader,
+    get_boundary,
+    LargeUploadError,
+    MalformedMultipartError,
+)
+from utils.mongo_utils import MongoConnection
+from utils.user_store import create_user_store
+from utils.metadata_store import (
+    create_metadata_store,
+    to_response,
+    parse_search_filters,
+    parse_page_size,
+    LIMIT_PARAM,
+    CURSOR_PARAM,
+    METADATA_FIELD,
+)
+from utils.summary import UploadSummary, SUMMARY_NAME
+from utils.result_store import create_result_store
+from utils.resumable_upload import (
+    create_session,
+    get_session,
+    write_chunk,
+    finalize_session,
+    delete_session,
+    SessionNotFoundError,
+    InvalidSessionError,
+    OffsetMismatchError,
+    SessionBusyError,
+    IncompleteUploadError,
 )
-from utils.file_permissions import restrict_file_permissions
-from models.users import User, USERNAME_FIELD, PASSWORD_FIELD
+from utils.fair_scheduler import FairScheduler
+from utils.workspace import WorkspaceManager, WorkspaceQuotaError, InsufficientSpaceError
+from utils.admission import AdmissionController, AdmissionRejectedError
+from utils.password_hashing import PasswordHasher, HasherBusyError
+from utils.request_context import set_request_id, get_request_id
+from utils import metrics
+from models.users import User, USERNAME_FIELD, PASSWORD_FIELD, UserExistsError
 
 
 load_dotenv()
@@ -58,7 +98,6 @@ MONGO_URI = os.getenv("MONGO_URI")
 app = Flask(__name__)
 ACCEPT_ORIGINS = ["http://localhost:3000"]
 CORS(app, origins=ACCEPT_ORIGINS, supports_credentials=True)
-bcrypt = Bcrypt(app)
 
 
 FLASK_ENV = os.getenv("FLASK_ENV")
@@ -68,12 +107,37 @@ else:
     app.config.from_object("config.DevelopmentConfig")
 
 
-# MongoDB setup
+# MongoDB setup: the client is created lazily, per process, on first use
 DB_NAME = app.config["DB_NAME"]
 USERS_COLLECTION = app.config["USERS_COLLECTION"]
-mongo_client = create_mongo_client(MONGO_URI)
-db = create_db(mongo_client, DB_NAME)
-users = create_collection(db, USERS_COLLECTION)
+METADATA_COLLECTION = app.config["METADATA_COLLECTION"]
+app.config["MONGO_URI"] = MONGO_URI
+mongo = MongoConnection(app)
+user_store = create_user_store(app.config["STORE_BACKEND"], mongo, USERS_COLLECTION)
+metadata_store = create_metadata_store(
+    app.config["STORE_BACKEND"], mongo, METADATA_COLLECTION, app.config["METADATA_BATCH_SIZE"]
+)
+result_store = create_result_store(
+    app.config["STORE_BACKEND"],
+    mongo,
+    app.config["RESULTS_BUCKET"],
+    datetime.timedelta(minutes=app.config["RESULT_TTL_MINS"]),
+    app.config["RESULT_PURGE_INTERVAL_S"],
+)
+
+# temp folders of uploads, deleted in the background
+workspaces = WorkspaceManager(app)
+
+# limits uploads processed at once, by count and by size
+upload_admission = AdmissionController(app, "upload")
+
+# image processing work is shared fairly between users, with a fast lane for small uploads
+processing_scheduler = FairScheduler(app)
+load_image_plugins()
+
+# password hashing runs on a bounded pool, off the request threads
+password_hasher = PasswordHasher(app)
+
 
 # JWT setup
 app.config["JWT_COOKIE_SECURE"] = False  # TODO: set True for production
@@ -100,7 +164,7 @@ ERR_NO_JSON = "Request contains no json", 400
 
 # /upload endpoint responses
 ERR_NO_FILES = "No files contained in request", 400
-ERR_FILE_NAME = "Expected attached file to be named 'file'", 400
+ERR_FILE_NAME = "Expected a zipfile named 'file' or image files named 'image'", 400
 ERR_NO_ZIP = "Request is missing zipfile", 400
 ERR_TEMP_FOLDER = (
     "Internal error occured while processing images: failed to create temp folder",
@@ -124,7 +188,45 @@ ERR_ZIP_SIZE_LIMIT = (
     400,
 )
 ERR_ZIP_CORRUPT = "Zip file is corrupted", 400
-ERR_SAVE_ZIP = "Internal error occured while processing images: failed to save zipfile", 500
+ERR_INSUFFICIENT_STORAGE = "Not enough disk space to process this upload", 507
+ERR_WORKSPACE_FULL = "Server is out of space for uploads, try again later", 507
+ERR_UPLOAD_BUSY = "Server is busy processing other uploads, try again later", 503
+ERR_SAVE_FILE = (
+    "Internal error occured while processing images: failed to save uploaded file",
+    500,
+)
+ERR_UPLOAD_SIZE_LIMIT = f"Upload exceeds size limit of {ZIP_SIZE_LIMIT_MB} MB", 400
+ERR_MALFORMED_UPLOAD = "Request body is not valid multipart/form-data", 400
+ERR_EXTRACT_OPTIONS = "Invalid metadata extraction options", 400
+
+# multipart field names of an uploaded zipfile, and of uploaded images
+ZIP_FIELD = "file"
+IMAGE_FIELD = "image"
+# query parameter choosing how binary EXIF values over EXIF_BINARY_LIMIT_BYTES are handled
+BINARY_PARAM = "binary"
+# query parameter listing the EXIF tags and presets to extract, comma separated
+TAGS_PARAM = "tags"
+# query parameter choosing between metadata json files per image and a single manifest
+OUTPUT_PARAM = "output"
+# query parameter turning the pixel statistics of each image on or off
+STATS_PARAM = "stats"
+BOOLEAN_PARAMS = {"true": True, "1": True, "false": False, "0": False}
+
+
+@app.before_request
+def assign_request_id():
+    """
+    Assigns an id to every request, used in logs including those of database operations.
+    """
+    set_request_id(str(uuid.uuid4()))
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Returns this worker process's latency histograms.
+    """
+    return jsonify(metrics.snapshot()), 200
 
 
 @app.route("/profile", methods=["GET"])
@@ -137,103 +239,591 @@ def get_profile():
     return jsonify(message=f"Hello, {user_id}!"), 200
 
 
+def admission_required(cost: Callable[..., int]):
+    """
+    Decorator admitting requests to a view through upload_admission. Requests that are not
+    admitted get a 503 response with a Retry-After header.
+
+    Args:
+        cost (Callable[..., int]): returns the size in bytes of a request, called with the
+            view's arguments
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                nbytes = cost(*args, **kwargs)
+                fast_lane = processing_scheduler.is_fast_lane(nbytes)
+                with upload_admission.admit(nbytes, fast_lane):
+                    return view(*args, **kwargs)
+            except AdmissionRejectedError as e:
+                log.warning(f"request {get_request_id()}: {e}, retry after {e.retry_after}s")
+                return (
+                    jsonify(message=ERR_UPLOAD_BUSY[0]),
+                    ERR_UPLOAD_BUSY[1],
+                    {"Retry-After": str(e.retry_after)},
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def _upload_cost() -> int:
+    # requests without a Content-Length are charged the largest size they may have
+    return request.content_length or ZIP_SIZE_LIMIT_MB * 1000000
+
+
+def _session_cost(upload_id: str) -> int:
+    try:
+        return get_session(upload_id, get_jwt_identity(), workspaces.root)["size"]
+    except SessionNotFoundError:
+        return 0
+
+
+def _extract_options() -> dict:
+    """
+    Returns the keyword arguments of extract_image_metadata for the current request. Binary
+    EXIF values over EXIF_BINARY_LIMIT_BYTES are handled by EXIF_BINARY_POLICY, unless the
+    request chooses another policy with the binary query parameter. All EXIF tags are
+    extracted, unless the request lists tags and presets with the tags query parameter.
+    Metadata json files are not written if the request's metadata goes to a manifest, and
+    floats are kept for manifests typing their values. Pixel statistics are computed if
+    IMAGE_STATS_ENABLED, unless the request turns them on or off with the stats query parameter.
+
+    Raises:
+        ValueError: if a query parameter is invalid
+    """
+    output = _metadata_output()
+    stats = app.config["IMAGE_STATS_ENABLED"]
+    if STATS_PARAM in request.args:
+        stats = BOOLEAN_PARAMS.get(request.args[STATS_PARAM].lower())
+        if stats is None:
+            raise ValueError(f"'{STATS_PARAM}' must be one of {', '.join(BOOLEAN_PARAMS)}")
+    binary_policy = request.args.get(BINARY_PARAM, app.config["EXIF_BINARY_POLICY"])
+    if binary_policy not in BINARY_POLICIES:
+        raise ValueError(f"'{BINARY_PARAM}' must be one of {', '.join(BINARY_POLICIES)}")
+    options = {
+        "binary_limit": app.config["EXIF_BINARY_LIMIT_BYTES"],
+        "binary_policy": binary_policy,
+        "write_json": output == METADATA_FILES,
+        "keep_floats": output in TABLE_OUTPUTS,
+        "stats": stats,
+    }
+    tags = request.args.get(TAGS_PARAM)
+    if tags is not None:
+        options["tags"] = resolve_tags(name.strip() for name in tags.split(",") if name.strip())
+    return options
+
+
+def _metadata_output() -> str:
+    """
+    Returns where the current request's metadata is written, one of METADATA_OUTPUTS. This is
+    METADATA_OUTPUT, unless the request chooses another output with the output query parameter.
+
+    Raises:
+        ValueError: if the output query parameter is invalid
+    """
+    output = request.args.get(OUTPUT_PARAM, app.config["METADATA_OUTPUT"])
+    if output not in METADATA_OUTPUTS:
+        raise ValueError(f"'{OUTPUT_PARAM}' must be one of {', '.join(METADATA_OUTPUTS)}")
+    return output
+
+
 @app.route("/upload", methods=["POST"])
 @jwt_required()
+@admission_required(_upload_cost)
 def handle_upload():
     """
     Handles image processing requests.
     """
-    req_id = str(uuid.uuid4())
+    req_id = get_request_id()
     log.info(f"Received new upload, assigning request_id {req_id}")
 
-    if not request.files:
+    try:
+        options = _extract_options()
+    except ValueError as e:
+        log.error(f"request {req_id}: invalid extraction options -> {e}")
+        return f"{ERR_EXTRACT_OPTIONS[0]}: {e}", ERR_EXTRACT_OPTIONS[1]
+
+    boundary = get_boundary(request.content_type)
+    if boundary is None:
         log.error(f"request {req_id}: request contains no files")
         return ERR_NO_FILES
 
-    file = request.files.get("file")
-
-    if file is None:
-        log.error(f"request {req_id}: expected file named 'file' not present")
-        return ERR_FILE_NAME
-
-    if file.mimetype != "application/zip":
-        return ERR_NO_ZIP
-
     try:
         log.info(f"request {req_id}: creating temp folder")
-        base_folder, imgs_folder = create_temp_folder(req_id)
+        base_folder, imgs_folder = workspaces.create(req_id)
+    except WorkspaceQuotaError as e:
+        log.error(f"request {req_id}: workspace quota exceeded -> {e}")
+        return ERR_WORKSPACE_FULL
     except CreateTempFolderError as e:
         log.error(f"request {req_id}: could not create temp folder -> {e}")
         return ERR_TEMP_FOLDER
 
+    # images are processed as soon as they are saved, while later parts are still arriving
+    image_futures = {}
+    fast_lane = processing_scheduler.is_fast_lane(request.content_length)
+    body_reservation = None
+    try:
+        # fail before receiving the body if the disk cannot hold it
+        body_reservation = workspaces.reserve(_upload_cost())
+
+        zip_path = None
+        has_files = False
+        for part in MultipartReader(request.stream, boundary, ZIP_SIZE_LIMIT_MB * 1000000):
+            if part.filename is None:
+                continue
+            has_files = True
+
+            if part.name == ZIP_FIELD and zip_path is None and not image_futures:
+                if part.mimetype != "application/zip":
+                    return ERR_NO_ZIP
+                log.info(f"request {req_id}: saving zipfile to temp folder")
+                try:
+                    zip_path = save_stream(part.iter_chunks(), part.filename, base_folder)
+                except LargeUploadError as e:
+                    raise LargeZipError(str(e)) from e
+            elif part.name == IMAGE_FIELD and zip_path is None:
+                validate_image_filename(part.filename)
+                chunks = validate_image_stream(part.iter_chunks(), part.filename)
+                image_path = save_stream(chunks, part.filename, imgs_folder)
+                log.debug(f"request {req_id}: received image {image_path}")
+                image_futures[os.path.basename(image_path)] = processing_scheduler.submit(
+                    get_jwt_identity(),
+                    extract_image_metadata,
+                    image_path,
+                    fast_lane=fast_lane,
+                    **options,
+                )
+            elif part.name in (ZIP_FIELD, IMAGE_FIELD):
+                log.error(f"request {req_id}: request mixes zipfile and image files")
+                return ERR_FILE_NAME
+
+        body_reservation.release()
+        if zip_path is not None:
+            response = _process_zip(req_id, zip_path, imgs_folder, options)
+        elif image_futures:
+            log.info(f"request {req_id}: extracting metadata of {len(image_futures)} images")
+            metadata = _gather_metadata(image_futures, imgs_folder, _metadata_output())
+            response = _process_images(req_id, imgs_folder, metadata)
+        elif has_files:
+            log.error(f"request {req_id}: expected file named 'file' or 'image' not present")
+            return ERR_FILE_NAME
+        else:
+            log.error(f"request {req_id}: request contains no files")
+            return ERR_NO_FILES
+    except UPLOAD_ERRORS as e:
+        response = _upload_error_response(req_id, e)
+    finally:
+        if body_reservation is not None:
+            body_reservation.release()
+        for future in image_futures.values():
+            future.cancel()
+        concurrent.futures.wait(image_futures.values())
+        log.info(f"request {req_id}: releasing temp folder")
+        workspaces.release(base_folder)
+
+    log.info(f"request {req_id}: sending response")
+    return response
+
+
+# pipeline exceptions, with the log message and response for each
+UPLOAD_ERROR_RESPONSES = [
+    (LargeZipError, "zipfile exceeds size limit", ERR_ZIP_SIZE_LIMIT),
+    (InsufficientSpaceError, "not enough disk space", ERR_INSUFFICIENT_STORAGE),
+    (LargeUploadError, "upload exceeds size limit", ERR_UPLOAD_SIZE_LIMIT),
+    (MalformedMultipartError, "malformed multipart body", ERR_MALFORMED_UPLOAD),
+    (InvalidFileError, "found disallowed file type in zipfile", ERR_NON_IMAGE_FILE),
+    (zipfile.BadZipFile, "zipfile is corrupted", ERR_ZIP_CORRUPT),
+    (SaveFileError, "failed to save uploaded file", ERR_SAVE_FILE),
+    (UnzipError, "error occured while unzipping", ERR_UNZIP_FILE),
+    (ZipError, "error occured while zipping/unzipping", ERR_ZIP_TO_MEMORY),
+    (ExtractMetaError, "failed to extract metadata from images", ERR_EXTRACT_META),
+]
+UPLOAD_ERRORS = tuple(error for error, _, _ in UPLOAD_ERROR_RESPONSES)
+
+
+def _upload_error_response(req_id: str, e: Exception):
+    """
+    Logs a pipeline exception and returns the matching endpoint response.
+    """
+    for error, message, response in UPLOAD_ERROR_RESPONSES:
+        if isinstance(e, error):
+            log.error(f"request {req_id}: {message} -> {e}")
+            return response
+    raise e
+
+
+def _process_zip(req_id: str, zip_path: str, imgs_folder: str, options: dict):
+    """
+    Runs the image processing pipeline on a zipfile saved to disk, and returns the response
+    containing the processed images. Members are validated as they are extracted, in a single
+    pass over the zipfile. options are passed to extract_image_metadata.
+
+    Raises:
+        InvalidFileError: if a member is not an image file, by its extension or its content
+        UnzipError, ZipError, ExtractMetaError: if a pipeline step fails
+    """
+    log.info(f"request {req_id}: unzipping images")
+    with workspaces.reserve(get_uncompressed_size(zip_path)):
+        image_paths = unzip_file(zip_path, imgs_folder, validate_image_file)
+
+    log.info(f"request {req_id}: extracting image metadata")
+    fast_lane = processing_scheduler.is_fast_lane(os.path.getsize(zip_path))
+    futures = {
+        os.path.basename(path): processing_scheduler.submit(
+            get_jwt_identity(), extract_image_metadata, path, fast_lane=fast_lane, **options
+        )
+        for path in image_paths
+    }
+    metadata = _gather_metadata(futures, imgs_folder, _metadata_output())
+
+    return _process_images(req_id, imgs_folder, metadata)
+
+
+def _gather_metadata(
+    futures: dict[str, concurrent.futures.Future], imgs_folder: str, output: str
+) -> dict[str, dict]:
+    """
+    Waits for the metadata extraction of each image. As images complete, their metadata is
+    added to the upload's summary, written to SUMMARY_NAME in imgs_folder, and unless output is
+    METADATA_FILES, to a manifest in imgs_folder. If one fails, the others are cancelled or
+    waited for before the exception is raised, so the temp folder can be deleted safely.
+
+    Raises:
+        ExtractMetaError: if the metadata of an image cannot be extracted
+    """
+    manifest = None
+    try:
+        if output != METADATA_FILES:
+            manifest = MetadataManifest(imgs_folder, output)
+        summary = UploadSummary()
+        names = {future: name for name, future in futures.items()}
+        for future in concurrent.futures.as_completed(names):
+            metadata = future.result()
+            summary.add(metadata)
+            if manifest is not None:
+                manifest.add(names[future], metadata)
+        summary.write(os.path.join(imgs_folder, SUMMARY_NAME))
+        return {name: future.result() for name, future in futures.items()}
+    finally:
+        if manifest is not None:
+            manifest.close()
+        for future in futures.values():
+            future.cancel()
+        concurrent.futures.wait(futures.values())
+
+
+def _process_images(req_id: str, imgs_folder: str, metadata: dict[str, dict]):
+    """
+    Stores the metadata of processed images, and returns the response containing the images.
+
+    Raises:
+        ZipError: if the images cannot be zipped
+    """
+    _save_metadata(req_id, metadata)
+
+    log.info(f"request {req_id}: zipping processed images")
+    zip_buffer = zip_files(imgs_folder)
+
+    _save_result(req_id, zip_buffer)
+
+    response = make_response(
+        send_file(
+            zip_buffer,
+            as_attachment=True,
+            mimetype="application/zip",
+            download_name=ZIP_NAME,
+        ),
+        200,
+    )
+    response.headers["X-Request-Id"] = req_id
+    response.headers["Access-Control-Expose-Headers"] = "X-Request-Id"
+    return response
+
+
+def _save_metadata(req_id: str, metadata: dict[str, dict]) -> None:
+    """
+    Stores the extracted metadata of an upload for later retrieval. A failure to store metadata
+    is logged but does not fail the upload, since the response already contains the metadata.
+    """
+    try:
+        log.info(f"request {req_id}: storing metadata of {len(metadata)} images")
+        metadata_store.save_upload(get_jwt_identity(), req_id, metadata)
+    except Exception as e:
+        log.error(f"request {req_id}: failed to store metadata -> {e}")
+
+
+def _save_result(req_id: str, zip_buffer: BytesIO) -> None:
+    """
+    Queues the result zip of an upload to be stored in the background, so it can be downloaded
+    again from /results. A failure to store the result is logged but does not fail the upload.
+    Rewinds zip_buffer for the response.
+    """
     try:
-        zip_buffer = BytesIO(file.read())
-        log.info(f"request {req_id}: checking zipfile size")
-        check_zip_size(zip_buffer)
+        log.info(f"request {req_id}: queueing result zipfile for storage")
+        zip_buffer.seek(0)
+        result_store.save(get_jwt_identity(), req_id, zip_buffer)
+    except Exception as e:
+        log.error(f"request {req_id}: failed to store result zipfile -> {e}")
+    finally:
+        zip_buffer.seek(0)
+
+
+# /uploads (resumable upload) endpoint responses
+UPLOAD_OFFSET_HEADER = "Upload-Offset"
+ERR_UPLOAD_SIZE = "Expected json with the zipfile size in bytes as 'size'", 400
+ERR_UPLOAD_OFFSET = f"Expected chunk offset in bytes as '{UPLOAD_OFFSET_HEADER}' header", 400
+ERR_LENGTH_REQUIRED = "Chunk requests must have a Content-Length", 411
+ERR_CHUNK_TOO_LARGE = "Chunk is too large", 413
+ERR_SESSION_NOT_FOUND = "Upload session not found", 404
+ERR_OFFSET_MISMATCH = "Chunk offset does not match the received offset", 409
+ERR_SESSION_BUSY = "Upload session is receiving another chunk", 409
+ERR_UPLOAD_INCOMPLETE = "Upload session has not received all bytes", 409
 
-        log.info(f"request {req_id}: validating zipfile contents")
-        validate_zip_contents(zip_buffer)
+RESUMABLE_SIZE_LIMIT = app.config["RESUMABLE_UPLOAD_SIZE_LIMIT_MB"] * 1000000
+RESUMABLE_CHUNK_LIMIT = app.config["RESUMABLE_UPLOAD_CHUNK_LIMIT_MB"] * 1000000
 
-        zip_buffer.close()
-        file.seek(0)
 
-        log.info(f"request {req_id}: saving zipfile to temp folder")
-        zip_path = save_file(file, base_folder)
+@app.route("/uploads", methods=["POST"])
+@jwt_required()
+def create_upload_session():
+    """
+    Creates a resumable upload session for a zipfile of the given size. The zipfile is then
+    sent in chunks with PUT /uploads/<upload_id>, and processed with
+    POST /uploads/<upload_id>/complete.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        return ERR_NO_JSON
 
-        log.info(f"request {req_id}: unzipping images")
-        unzip_file(zip_path, imgs_folder)
+    size = data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool):
+        return jsonify(message=ERR_UPLOAD_SIZE[0]), ERR_UPLOAD_SIZE[1]
 
-        log.info(f"request {req_id}: restricting execute permissions")
-        restrict_file_permissions(imgs_folder)
+    session_id = get_request_id()
+    try:
+        workspaces.check_quota()
+        workspaces.check_space(size)
+        session = create_session(
+            session_id, get_jwt_identity(), size, RESUMABLE_SIZE_LIMIT, workspaces.root
+        )
+    except InvalidSessionError as e:
+        return jsonify(message=str(e)), ERR_UPLOAD_SIZE[1]
+    except WorkspaceQuotaError as e:
+        log.error(f"request {session_id}: workspace quota exceeded -> {e}")
+        return ERR_WORKSPACE_FULL
+    except InsufficientSpaceError as e:
+        log.error(f"request {session_id}: not enough disk space -> {e}")
+        return jsonify(message=ERR_INSUFFICIENT_STORAGE[0]), ERR_INSUFFICIENT_STORAGE[1]
+    except CreateTempFolderError as e:
+        log.error(f"request {session_id}: could not create temp folder -> {e}")
+        return ERR_TEMP_FOLDER
 
-        log.info(f"request {req_id}: extracting image metadata")
-        extract_metadata(imgs_folder)
+    log.info(f"request {session_id}: created upload session for {size} bytes")
+    response = _session_response(session, 201)
+    response.headers["Location"] = f"/uploads/{session_id}"
+    return response
 
-        log.info(f"request {req_id}: zipping processed images")
-        zip_buffer = zip_files(imgs_folder)
 
-        response = (
-            send_file(
-                zip_buffer,
-                as_attachment=True,
-                mimetype="application/zip",
-                download_name=ZIP_NAME,
-            ),
-            200,
+@app.route("/uploads/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_upload_session(upload_id: str):
+    """
+    Returns the number of bytes an upload session received, to resume from after a failure.
+    """
+    try:
+        session = get_session(upload_id, get_jwt_identity(), workspaces.root)
+    except SessionNotFoundError:
+        return jsonify(message=ERR_SESSION_NOT_FOUND[0]), ERR_SESSION_NOT_FOUND[1]
+    return _session_response(session, 200)
+
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+@jwt_required()
+def put_upload_chunk(upload_id: str):
+    """
+    Appends the request body to an upload session's zipfile at the offset given in the
+    Upload-Offset header, which must equal the number of bytes received so far.
+    """
+    offset = request.headers.get(UPLOAD_OFFSET_HEADER, type=int)
+    if offset is None or offset < 0:
+        return jsonify(message=ERR_UPLOAD_OFFSET[0]), ERR_UPLOAD_OFFSET[1]
+    if request.content_length is None:
+        return jsonify(message=ERR_LENGTH_REQUIRED[0]), ERR_LENGTH_REQUIRED[1]
+
+    user = get_jwt_identity()
+    try:
+        with workspaces.reserve(request.content_length):
+            write_chunk(
+                upload_id,
+                user,
+                offset,
+                request.stream,
+                request.content_length,
+                RESUMABLE_CHUNK_LIMIT,
+                workspaces.root,
+            )
+        session = get_session(upload_id, user, workspaces.root)
+    except InsufficientSpaceError as e:
+        log.error(f"request {upload_id}: not enough disk space -> {e}")
+        return jsonify(message=ERR_INSUFFICIENT_STORAGE[0]), ERR_INSUFFICIENT_STORAGE[1]
+    except SessionNotFoundError:
+        return jsonify(message=ERR_SESSION_NOT_FOUND[0]), ERR_SESSION_NOT_FOUND[1]
+    except InvalidSessionError as e:
+        return jsonify(message=f"{ERR_CHUNK_TOO_LARGE[0]}: {e}"), ERR_CHUNK_TOO_LARGE[1]
+    except OffsetMismatchError as e:
+        return (
+            jsonify(message=ERR_OFFSET_MISMATCH[0], offset=e.expected_offset),
+            ERR_OFFSET_MISMATCH[1],
+            {UPLOAD_OFFSET_HEADER: str(e.expected_offset)},
+        )
+    except SessionBusyError:
+        return jsonify(message=ERR_SESSION_BUSY[0]), ERR_SESSION_BUSY[1]
+
+    return _session_response(session, 200)
+
+
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+@jwt_required()
+@admission_required(_session_cost)
+def complete_upload_session(upload_id: str):
+    """
+    Processes the zipfile of an upload session that received all bytes, and returns the same
+    response as /upload.
+    """
+    req_id = get_request_id()
+    try:
+        options = _extract_options()
+    except ValueError as e:
+        log.error(f"request {req_id}: invalid extraction options -> {e}")
+        return jsonify(message=f"{ERR_EXTRACT_OPTIONS[0]}: {e}"), ERR_EXTRACT_OPTIONS[1]
+
+    try:
+        base_folder, imgs_folder, zip_path = finalize_session(
+            upload_id, get_jwt_identity(), workspaces.root
         )
+    except SessionNotFoundError:
+        return jsonify(message=ERR_SESSION_NOT_FOUND[0]), ERR_SESSION_NOT_FOUND[1]
+    except IncompleteUploadError as e:
+        log.error(f"request {req_id}: {e}")
+        return jsonify(message=ERR_UPLOAD_INCOMPLETE[0]), ERR_UPLOAD_INCOMPLETE[1]
 
-        response = make_response(response)
-        response.headers["X-Request-Id"] = req_id
-        response.headers["Access-Control-Expose-Headers"] = "X-Request-Id"
-    except LargeZipError as e:
-        log.error(f"request {req_id}: zipfile exceeds size limit -> {e}")
-        return ERR_ZIP_SIZE_LIMIT
-    except InvalidFileError as e:
-        log.error(f"request {req_id}: found disallowed file type in zipfile -> {e}")
-        return ERR_NON_IMAGE_FILE
-    except zipfile.BadZipFile as e:
-        log.error(f"request {req_id}: zipfile {file} is corrupted -> {e}")
-        return ERR_ZIP_CORRUPT
-    except SaveZipFileError as e:
-        log.error(f"request {req_id}: failed to save zipfile -> {e}")
-        return ERR_SAVE_ZIP
-    except UnzipError as e:
-        log.error(f"request {req_id}: error occured while unzipping -> {e}")
-        return ERR_UNZIP_FILE
-    except ZipError as e:
-        log.error(f"request {req_id}: error occured while zipping/unzipping -> {e}")
-        response = ERR_ZIP_TO_MEMORY
-    except ExtractMetaError as e:
-        log.error(f"request {req_id}: failed to extract metadata from images -> {e}")
-        response = ERR_EXTRACT_META
+    log.info(f"request {req_id}: processing upload session {upload_id}")
+    try:
+        response = _process_zip(req_id, zip_path, imgs_folder, options)
+    except UPLOAD_ERRORS as e:
+        response = _upload_error_response(req_id, e)
     finally:
-        log.info(f"request {req_id}: cleaning up temp folder")
-        shutil.rmtree(base_folder)
+        log.info(f"request {req_id}: releasing temp folder")
+        workspaces.release(base_folder)
 
     log.info(f"request {req_id}: sending response")
     return response
 
 
+@app.route("/uploads/<upload_id>", methods=["DELETE"])
+@jwt_required()
+def delete_upload_session(upload_id: str):
+    """
+    Abandons an upload session and deletes the bytes it received.
+    """
+    try:
+        delete_session(upload_id, get_jwt_identity(), workspaces.root)
+    except SessionNotFoundError:
+        return jsonify(message=ERR_SESSION_NOT_FOUND[0]), ERR_SESSION_NOT_FOUND[1]
+    return "", 204
+
+
+def _session_response(session: dict, status: int):
+    response = make_response(
+        jsonify(upload_id=session["id"], size=session["size"], offset=session["offset"]), status
+    )
+    response.headers[UPLOAD_OFFSET_HEADER] = str(session["offset"])
+    response.headers["Access-Control-Expose-Headers"] = UPLOAD_OFFSET_HEADER
+    return response
+
+
+# /results endpoint responses
+ERR_RESULT_NOT_FOUND = "No stored result for this upload, it may have expired", 404
+
+
+@app.route("/results/<upload_id>", methods=["GET"])
+@jwt_required()
+def download_result(upload_id: str):
+    """
+    Returns the stored result zip of one of the current user's uploads. Supports Range and
+    If-Range requests, so interrupted downloads can be resumed.
+    """
+    result = result_store.open(get_jwt_identity(), upload_id)
+    if result is None:
+        return jsonify(message=ERR_RESULT_NOT_FOUND[0]), ERR_RESULT_NOT_FOUND[1]
+    stream, length = result
+
+    response = Response(
+        wrap_file(request.environ, stream),
+        mimetype="application/zip",
+        direct_passthrough=True,
+    )
+    response.headers.set("Content-Disposition", "attachment", filename=ZIP_NAME)
+    response.content_length = length
+    response.accept_ranges = "bytes"
+    # stored results never change, so the upload id and length identify the content
+    response.set_etag(f"{upload_id}-{length}")
+    return response.make_conditional(request, accept_ranges=True, complete_length=length)
+
+
+# /metadata endpoint responses
+ERR_UPLOAD_NOT_FOUND = "No stored metadata for this upload", 404
+ERR_INVALID_SEARCH = "Invalid search parameters", 400
+
+
+@app.route("/metadata", methods=["GET"])
+@jwt_required()
+def search_metadata():
+    """
+    Searches the current user's stored image metadata.
+
+    Query parameters filter on make, model, lens_model, iso, focal_length (exact), iso_min,
+    iso_max, focal_length_min, focal_length_max, start/end (capture time, ISO 8601 without a
+    timezone), near and radius ("<lat>,<lon>" and meters) and bbox
+    ("<min_lon>,<min_lat>,<max_lon>,<max_lat>").
+    Results are ordered by capture time; pass the returned next_cursor as cursor to get the
+    next page.
+    """
+    try:
+        filters = parse_search_filters(request.args)
+        limit = parse_page_size(request.args.get(LIMIT_PARAM))
+        documents, next_cursor = metadata_store.search(
+            get_jwt_identity(), filters, limit, request.args.get(CURSOR_PARAM)
+        )
+    except ValueError as e:
+        log.error(f"request {get_request_id()}: invalid metadata search -> {e}")
+        return jsonify(message=f"{ERR_INVALID_SEARCH[0]}: {e}"), ERR_INVALID_SEARCH[1]
+
+    return jsonify(images=[to_response(doc) for doc in documents], next_cursor=next_cursor), 200
+
+
+@app.route("/metadata/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_upload_metadata(upload_id: str):
+    """
+    Returns the stored metadata of one of the current user's uploads, and its summary.
+    """
+    documents = metadata_store.get_upload(get_jwt_identity(), upload_id)
+    if not documents:
+        return jsonify(message=ERR_UPLOAD_NOT_FOUND[0]), ERR_UPLOAD_NOT_FOUND[1]
+
+    summary = UploadSummary()
+    images = []
+    for doc in documents:
+        summary.add(doc[METADATA_FIELD])
+        images.append(to_response(doc))
+    return jsonify(upload_id=upload_id, images=images, summary=summary.to_dict()), 200
+
+
 ERR_MISSING_CREDENTIALS = "Missing username or password", 400
 ERR_USER_NOT_EXIST = "User does not exist", 400
 ERR_WRONG_PASSWORD = "Wrong password", 401
@@ -241,6 +831,8 @@ ERR_CREATE_JWT = "JWT creation failed", 500
 ERR_USER_EXISTS = "User already exists", 409
 ERR_CREATE_USER = "Failed to create new user", 500
 ERR_INTERNAL = "Login failed due to internal error", 500
+ERR_AUTH_BUSY = "Server is busy, try again later", 503
+AUTH_RETRY_AFTER_S = 1
 
 REGISTER_SUCCESS = "User registration successful", 201
 LOGIN_SUCCESS = "User login successful", 200
@@ -257,18 +849,22 @@ def login():
         if username is None or password is None:
             return jsonify(message=ERR_MISSING_CREDENTIALS[0]), ERR_MISSING_CREDENTIALS[1]
 
-        user = get_user(users, username)
+        user = user_store.get_user(username)
 
         if not user:
             return jsonify(message=ERR_USER_NOT_EXIST[0]), ERR_USER_NOT_EXIST[1]
 
         try:
-            is_valid_password = bcrypt.check_password_hash(user[PASSWORD_FIELD], password)
+            is_valid_password = password_hasher.check_password_hash(user[PASSWORD_FIELD], password)
+        except HasherBusyError:
+            return _auth_busy_response()
         except ValueError as e:
             log.error(f"Failed to decode hashed password for user {user} --> {e}")
             return jsonify(message=ERR_INTERNAL[0]), ERR_INTERNAL[1]
 
         if is_valid_password:
+            if password_hasher.needs_rehash(user[PASSWORD_FIELD]):
+                _rehash_password(username, password)
             try:
                 response = jsonify(message=LOGIN_SUCCESS[0])
                 access_token = create_access_token(identity=user[USERNAME_FIELD])
@@ -290,19 +886,44 @@ def register():
         if username is None or password is None:
             return jsonify(message=ERR_MISSING_CREDENTIALS[0]), ERR_MISSING_CREDENTIALS[1]
 
-        if get_user(users, username):
-            return jsonify(message=ERR_USER_EXISTS[0]), ERR_USER_EXISTS[1]
-
         try:
-            hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
+            hashed_password = password_hasher.generate_password_hash(password)
             user = User(username=username, password=hashed_password)
-            add_user(users, user.username, user.password)
+            user_store.add_user(user.username, user.password)
+        except HasherBusyError:
+            return _auth_busy_response()
+        except UserExistsError:
+            return jsonify(message=ERR_USER_EXISTS[0]), ERR_USER_EXISTS[1]
         except Exception:
             return jsonify(message=ERR_CREATE_USER[0]), ERR_CREATE_USER[1]
 
         return jsonify(message=REGISTER_SUCCESS[0]), REGISTER_SUCCESS[1]
 
 
+def _auth_busy_response():
+    """
+    Response for auth requests rejected because the password hashing pool is saturated.
+    """
+    log.warning("Rejecting auth request: password hashing pool saturated")
+    return (
+        jsonify(message=ERR_AUTH_BUSY[0]),
+        ERR_AUTH_BUSY[1],
+        {"Retry-After": str(AUTH_RETRY_AFTER_S)},
+    )
+
+
+def _rehash_password(username: str, password: str) -> None:
+    """
+    Rehashes a user's password with the current cost factor after a successful login.
+    Failures are logged and do not fail the login; the rehash is retried on the next login.
+    """
+    try:
+        user_store.update_password(username, password_hasher.generate_password_hash(password))
+        log.info(f"Rehashed password of user '{username}' with current cost factor")
+    except Exception as e:
+        log.warning(f"Failed to rehash password of user '{username}' -> {e}")
+
+
 @app.route("/logout", methods=["GET"])
 @jwt_required()
 def logout():
@@ -331,7 +952,7 @@ def refresh_expiring_jwts(response):
 @app.teardown_appcontext
 def clean_up_resources(exception):
     if isinstance(exception, KeyboardInterrupt):
-        close_connection(mongo_client)
+        mongo.close()
 
 
 if __name__ == "__main__":
@@ -3,6 +3,14 @@ USERNAME_FIELD = "username"
 PASSWORD_FIELD = "password"
 
 
+class UserExistsError(Exception):
+    """
+    Exception raised when adding a user whose username is already taken.
+    """
+
+    pass
+
+
 class User:
     def __init__(self, username, password):
         self.username = username
@@ -4,20 +4,26 @@ Integration tests for authentication endpoints.
 
 import pytest
 from datetime import timedelta
+from unittest.mock import patch
+
+import bcrypt
 
 from flask_jwt_extended import create_access_token, decode_token
 
 from exif import (
     app,
-    users,
+    user_store,
+    password_hasher,
     REGISTER_SUCCESS,
     LOGIN_SUCCESS,
     ERR_WRONG_PASSWORD,
     ERR_USER_NOT_EXIST,
+    ERR_USER_EXISTS,
+    ERR_AUTH_BUSY,
     LOGOUT_SUCCESS,
 )
-from utils.mongo_utils import delete_user, add_user
 from models.users import USERNAME_FIELD, PASSWORD_FIELD
+from utils.password_hashing import HasherBusyError
 
 
 REGISTER_ENDPOINT = "/register"
@@ -35,19 +41,29 @@ TEST_CREDENTIALS = {USERNAME_FIELD: "test_user", PASSWORD_FIELD: "test_password"
 
 def test_registration_success(client):
     # make sure user doesn't already exist
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
     response = client.post("/register", json=TEST_CREDENTIALS)
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
 
     assert response.status_code == REGISTER_SUCCESS[1]
     data = response.get_json()
     assert data["message"] == REGISTER_SUCCESS[0]
 
 
+def test_registration_user_exists(client):
+    client.post("/register", json=TEST_CREDENTIALS)
+    response = client.post("/register", json=TEST_CREDENTIALS)
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
+
+    assert response.status_code == ERR_USER_EXISTS[1]
+    data = response.get_json()
+    assert data["message"] == ERR_USER_EXISTS[0]
+
+
 def test_login_success(client):
     client.post("/register", json=TEST_CREDENTIALS)
     response = client.post("/login", json=TEST_CREDENTIALS)
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
     print(response)
 
     assert response.status_code == LOGIN_SUCCESS[1]
@@ -56,6 +72,37 @@ def test_login_success(client):
     assert response.headers.get("Set-Cookie") is not None
 
 
+def test_login_rehashes_outdated_cost(client):
+    username = TEST_CREDENTIALS[USERNAME_FIELD]
+    outdated_rounds = 4 if password_hasher.log_rounds != 4 else 5
+    outdated_hash = bcrypt.hashpw(
+        TEST_CREDENTIALS[PASSWORD_FIELD].encode("utf-8"), bcrypt.gensalt(rounds=outdated_rounds)
+    ).decode("utf-8")
+    user_store.delete_user(username)
+    user_store.add_user(username, outdated_hash)
+
+    response = client.post("/login", json=TEST_CREDENTIALS)
+    new_hash = user_store.get_user(username)[PASSWORD_FIELD]
+    user_store.delete_user(username)
+
+    assert response.status_code == LOGIN_SUCCESS[1]
+    assert new_hash != outdated_hash
+    assert not password_hasher.needs_rehash(new_hash)
+
+
+@pytest.mark.parametrize("endpoint", ["/login", "/register"])
+def test_auth_busy(client, endpoint: str):
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.add_user(TEST_CREDENTIALS[USERNAME_FIELD], "$2b$04$hash")
+    with patch.object(password_hasher, "_run", side_effect=HasherBusyError()):
+        response = client.post(endpoint, json=TEST_CREDENTIALS)
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
+
+    assert response.status_code == ERR_AUTH_BUSY[1]
+    assert response.get_json()["message"] == ERR_AUTH_BUSY[0]
+    assert response.headers.get("Retry-After") is not None
+
+
 def test_login_wrong_password(client):
     client.post("/register", json=TEST_CREDENTIALS)
     invalid_login_data = {
@@ -63,7 +110,7 @@ def test_login_wrong_password(client):
         PASSWORD_FIELD: "wrong_password",
     }
     response = client.post("/login", json=invalid_login_data)
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
 
     assert response.status_code == ERR_WRONG_PASSWORD[1]
     data = response.get_json()
@@ -88,7 +135,7 @@ def test_logout_success(client):
     auth_token = response.headers["Set-Cookie"].split(";")[0].split("=")[1]
     auth_header = {"Authorization": f"Bearer {auth_token}"}
     response = client.get("/logout", headers=auth_header)
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
 
     assert response.status_code == LOGOUT_SUCCESS[1]
     data = response.get_json()
@@ -107,7 +154,7 @@ def test_protected_route_with_auth(client):
     auth_header = {"Authorization": f"Bearer {auth_token}"}
 
     response = client.get("/profile", headers=auth_header)
-    delete_user(users, TEST_CREDENTIALS[USERNAME_FIELD])
+    user_store.delete_user(TEST_CREDENTIALS[USERNAME_FIELD])
 
     assert response.status_code == 200
     assert response.get_json() == {"message": f"Hello, {TEST_CREDENTIALS[USERNAME_FIELD]}!"}
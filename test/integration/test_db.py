@@ -7,7 +7,7 @@ from utils.mongo_utils import (
     get_user,
     delete_user,
 )
-from exif import app, mongo_client, DB_NAME, USERS_COLLECTION
+from exif import app, mongo, DB_NAME, USERS_COLLECTION
 
 
 @pytest.fixture(name="client")
@@ -20,6 +20,7 @@ TEST_USER = "test_user"
 TEST_PASSWORD = "test_password"
 
 def test_db_connection():
+    mongo_client = mongo.client
     test_db = create_db(mongo_client, DB_NAME)
     test_collection = create_collection(test_db, USERS_COLLECTION)
     add_user(test_collection, TEST_USER, TEST_PASSWORD)
@@ -0,0 +1,25 @@
+"""
+Integration tests for the /metrics endpoint.
+"""
+
+import pytest
+
+from exif import app
+from utils import metrics
+
+
+@pytest.fixture(name="client")
+def create_app():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_metrics(client):
+    metrics.histogram("test.ms").observe(3)
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["test.ms"]["count"] >= 1
+    metrics.reset()
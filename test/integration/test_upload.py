@@ -9,13 +9,18 @@ from io import BytesIO
 from unittest.mock import patch
 from datetime import timedelta
 
+import csv
+import io
+import json
+
 import pytest
 from flask.testing import FlaskClient
+from PIL import Image
 from flask_jwt_extended import create_access_token
 
 from exif import (
     app,
-    users,
+    user_store,
     ERR_NO_ZIP,
     ERR_NON_IMAGE_FILE,
     ERR_FILE_NAME,
@@ -25,11 +30,25 @@ from exif import (
     ERR_TEMP_FOLDER,
     ERR_UNZIP_FILE,
     ERR_EXTRACT_META,
+    ERR_UPLOAD_NOT_FOUND,
+    ERR_INVALID_SEARCH,
+    ERR_RESULT_NOT_FOUND,
+    ERR_OFFSET_MISMATCH,
+    ERR_UPLOAD_INCOMPLETE,
+    ERR_SESSION_NOT_FOUND,
+    UPLOAD_OFFSET_HEADER,
+    ERR_UPLOAD_BUSY,
+    ERR_INSUFFICIENT_STORAGE,
+    ERR_EXTRACT_OPTIONS,
+    upload_admission,
+    workspaces,
 )
 from test.testing_utils import create_file_of_size
 from utils.upload_utils import ZIP_SIZE_LIMIT_MB
 from utils.constants import UPLOAD_FOLDER
-from utils.mongo_utils import add_user, delete_user
+from utils.extract_meta import TAG_PRESETS, MANIFEST_NAMES
+from utils.columnar import read_columnar
+from utils.summary import SUMMARY_NAME
 
 
 UPLOAD_ENDPOINT = "/upload"
@@ -53,8 +72,8 @@ def create_app():
             "username": "test_user",
             "password": "test_password",
         }
-        delete_user(users, test_user["username"])
-        add_user(users, test_user["username"], test_user["password"])
+        user_store.delete_user(test_user["username"])
+        user_store.add_user(test_user["username"], test_user["password"])
         with app.app_context():
             access_token = create_access_token(
                 identity=test_user["username"],
@@ -62,7 +81,7 @@ def create_app():
             )
 
         yield client, access_token
-        delete_user(users, test_user["username"])
+        user_store.delete_user(test_user["username"])
 
 
 @pytest.mark.parametrize("file_path", [TEST_IMAGE_1])
@@ -88,9 +107,116 @@ def test_upload_file_no_zip(client: FlaskClient, file_path: str):
     assert ERR_NO_ZIP[0] in str(response.data)
 
 
+def post_images(
+    client: FlaskClient, folder_path: str, field: str = "image", query_string: dict | None = None
+):
+    """
+    Posts the files of a folder as separate multipart parts to the upload endpoint.
+
+    Args:
+        client (FlaskClient): Flask test client
+        folder_path (str): path to folder with the files to post
+        field (str): multipart field name of the files
+        query_string (dict | None): query parameters of the request
+
+    Returns:
+        TestResponse: response
+    """
+    client, access_token = client
+    files = []
+    for filename in sorted(os.listdir(folder_path)):
+        with open(os.path.join(folder_path, filename), "rb") as f:
+            files.append((BytesIO(f.read()), filename, "image/jpeg"))
+
+    return client.post(
+        UPLOAD_ENDPOINT,
+        data={field: files},
+        content_type="multipart/form-data",
+        headers={"Authorization": f"Bearer {access_token}"},
+        query_string=query_string,
+    )
+
+
+def test_upload_images(client: FlaskClient):
+    """
+    Test that images posted without a zipfile are processed like a zipped upload.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = post_images(client, TEST_VALID_MULTIPLE)
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        names = set(zip_ref.namelist())
+    for filename in os.listdir(TEST_VALID_MULTIPLE):
+        assert filename in names
+        assert f"{os.path.splitext(filename)[0]}_meta.json" in names
+
+
+@pytest.mark.parametrize("folder_path", [TEST_INVALID_ONLY, TEST_INVALID_MIX])
+def test_upload_invalid_images(client: FlaskClient, folder_path: str):
+    """
+    Test that non-image files posted as images are rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+        folder_path (str): path to folder with the files to post
+    """
+    response = post_images(client, folder_path)
+
+    assert response.status_code == ERR_NON_IMAGE_FILE[1]
+    assert ERR_NON_IMAGE_FILE[0] in str(response.data)
+
+
+def test_upload_renamed_image(client: FlaskClient):
+    """
+    Test that an image part whose content does not match its extension is rejected before it
+    is saved.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    client, access_token = client
+    with open(TEST_IMAGE_1, "rb") as file:
+        response = client.post(
+            UPLOAD_ENDPOINT,
+            data={"image": (file, "image.png", "image/png")},
+            content_type="multipart/form-data",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+    assert response.status_code == ERR_NON_IMAGE_FILE[1]
+    assert ERR_NON_IMAGE_FILE[0] in str(response.data)
+
+
+def test_upload_zip_and_images(client: FlaskClient):
+    """
+    Test that a request containing both a zipfile and images is rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    client, access_token = client
+    with open(TEST_IMAGE_1, "rb") as file:
+        response = client.post(
+            UPLOAD_ENDPOINT,
+            data={
+                "image": (file, "image.jpg", "image/jpeg"),
+                "file": (zip_folder(TEST_VALID_SINGLE), "images.zip", "application/zip"),
+            },
+            content_type="multipart/form-data",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+    assert response.status_code == ERR_FILE_NAME[1]
+    assert ERR_FILE_NAME[0] in str(response.data)
+
+
 def test_upload_misnamed_file(client: FlaskClient):
     """
-    Test that the upload endpoint returns an error if the posted file's name is not "file".
+    Test that the upload endpoint returns an error if the posted file's name is not "file" or
+    "image".
 
     Args:
         client (FlaskClient): Flask test client
@@ -100,7 +226,7 @@ def test_upload_misnamed_file(client: FlaskClient):
     with open(TEST_IMAGE_1, "rb") as file:
         response = client.post(
             UPLOAD_ENDPOINT,
-            data={"image": (file, "image.jpg", "image/jpeg")},
+            data={"photo": (file, "image.jpg", "image/jpeg")},
             content_type="multipart/form-data",
             headers={"Authorization": f"Bearer {access_token}"},
         )
@@ -124,16 +250,15 @@ def test_upload_missing_files(client: FlaskClient):
     assert ERR_NO_FILES[0] in str(response.data)
 
 
-def zip_folder_and_post(client: FlaskClient, folder_path: str) -> BytesIO:
+def zip_folder(folder_path: str) -> BytesIO:
     """
-    Zips a folder and posts it to the upload endpoint.
+    Zips a folder into memory.
 
     Args:
-        client (FlaskClient): Flask test client
         folder_path (str): path to folder to zip
 
     Returns:
-        BytesIO: response data
+        BytesIO: zipfile, positioned at the start
     """
     zip_buffer = BytesIO()
     with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
@@ -144,6 +269,24 @@ def zip_folder_and_post(client: FlaskClient, folder_path: str) -> BytesIO:
                 zipf.write(file_path, arcname)
 
     zip_buffer.seek(0)
+    return zip_buffer
+
+
+def zip_folder_and_post(
+    client: FlaskClient, folder_path: str, query_string: dict | None = None
+) -> BytesIO:
+    """
+    Zips a folder and posts it to the upload endpoint.
+
+    Args:
+        client (FlaskClient): Flask test client
+        folder_path (str): path to folder to zip
+        query_string (dict | None): query parameters of the request
+
+    Returns:
+        BytesIO: response data
+    """
+    zip_buffer = zip_folder(folder_path)
 
     client, access_token = client
 
@@ -152,6 +295,7 @@ def zip_folder_and_post(client: FlaskClient, folder_path: str) -> BytesIO:
         data={"file": (zip_buffer, "images.zip", "application/zip")},
         content_type="multipart/form-data",
         headers={"Authorization": f"Bearer {access_token}"},
+        query_string=query_string,
     )
 
     return response
@@ -180,12 +324,149 @@ def test_upload_valid_zipped(client: FlaskClient, folder_path: str):
     assert response.headers.get("X-Request-ID") is not None
 
     with zipfile.ZipFile(BytesIO(response.data)) as zip_file:
-        assert len(zip_file.namelist()) == len(os.listdir(folder_path)) * 2
+        assert len(zip_file.namelist()) == len(os.listdir(folder_path)) * 2 + 1
+        assert SUMMARY_NAME in zip_file.namelist()
         for file in os.listdir(folder_path):
             assert file in zip_file.namelist()
             assert f"{file.split('.')[0]}_meta.json" in zip_file.namelist()
 
 
+def test_upload_metadata_refetch(client: FlaskClient):
+    """
+    Test that the metadata of an upload can be fetched again after the upload completed.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_MULTIPLE)
+    assert response.status_code == 200
+    upload_id = response.headers["X-Request-Id"]
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        summary = json.loads(zip_ref.read(SUMMARY_NAME))
+
+    client, access_token = client
+    response = client.get(
+        f"/metadata/{upload_id}", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["upload_id"] == upload_id
+    assert sorted(image["filename"] for image in data["images"]) == sorted(
+        os.listdir(TEST_VALID_MULTIPLE)
+    )
+    assert data["summary"] == summary
+    assert summary["images"] == len(os.listdir(TEST_VALID_MULTIPLE))
+
+
+def test_upload_metadata_not_found(client: FlaskClient):
+    """
+    Test that fetching the metadata of an unknown upload returns an error.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    client, access_token = client
+    response = client.get(
+        "/metadata/unknown-upload", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+    assert response.status_code == ERR_UPLOAD_NOT_FOUND[1]
+    assert ERR_UPLOAD_NOT_FOUND[0] in str(response.data)
+
+
+def test_upload_result_download(client: FlaskClient):
+    """
+    Test that the result zip of an upload can be downloaded again, in full and by range.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    upload_response = zip_folder_and_post(client, TEST_VALID_MULTIPLE)
+    assert upload_response.status_code == 200
+    upload_id = upload_response.headers["X-Request-Id"]
+
+    client, access_token = client
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.get(f"/results/{upload_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.data == upload_response.data
+
+    response = client.get(f"/results/{upload_id}", headers={**headers, "Range": "bytes=100-"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == (
+        f"bytes 100-{len(upload_response.data) - 1}/{len(upload_response.data)}"
+    )
+    assert response.data == upload_response.data[100:]
+
+
+def test_upload_result_not_found(client: FlaskClient):
+    """
+    Test that downloading the result of an unknown upload returns an error.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    client, access_token = client
+    response = client.get(
+        "/results/unknown-upload", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+    assert response.status_code == ERR_RESULT_NOT_FOUND[1]
+    assert ERR_RESULT_NOT_FOUND[0] in str(response.data)
+
+
+def test_search_metadata(client: FlaskClient):
+    """
+    Test that uploaded images can be searched by camera and ISO, one page at a time.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_MULTIPLE)
+    assert response.status_code == 200
+    upload_id = response.headers["X-Request-Id"]
+
+    client, access_token = client
+    headers = {"Authorization": f"Bearer {access_token}"}
+    query = {"make": "NIKON CORPORATION", "iso_max": "200", "limit": "4"}
+
+    filenames = []
+    while True:
+        response = client.get("/metadata", query_string=query, headers=headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        filenames.extend(img["filename"] for img in data["images"] if img["upload_id"] == upload_id)
+        if data["next_cursor"] is None:
+            break
+        query["cursor"] = data["next_cursor"]
+
+    assert sorted(filenames) == [f"DSC_{n}.jpg" for n in (2241, 2250, 2254, 2264, 2270, 2282)]
+
+
+@pytest.mark.parametrize(
+    "query", [{"iso_min": "high"}, {"start": "2021-01-01T00:00:00Z"}, {"cursor": "not-a-cursor"}]
+)
+def test_search_metadata_invalid(client: FlaskClient, query: dict):
+    """
+    Test that a search with invalid parameters returns an error.
+
+    Args:
+        client (FlaskClient): Flask test client
+        query (dict): invalid search parameters
+    """
+    client, access_token = client
+    response = client.get(
+        "/metadata",
+        query_string=query,
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+    assert response.status_code == ERR_INVALID_SEARCH[1]
+
+
 @pytest.mark.parametrize("folder_path", [TEST_INVALID_ONLY, TEST_INVALID_MIX])
 def test_upload_invalid_zipped(client: FlaskClient, folder_path: str):
     """
@@ -283,7 +564,8 @@ def test_upload_empty_zip(client: FlaskClient):
 
 def test_upload_invalid_image_file(client: FlaskClient):
     """
-    Test that the upload endpoint correctly handles an invalid image file.
+    Test that the upload endpoint rejects an image file whose content does not match its
+    extension.
 
     Args:
         client (FlaskClient): Flask test client
@@ -304,5 +586,297 @@ def test_upload_invalid_image_file(client: FlaskClient):
         headers={"Authorization": f"Bearer {access_token}"},
     )
 
+    assert response.status_code == ERR_NON_IMAGE_FILE[1]
+    assert ERR_NON_IMAGE_FILE[0] in str(response.data)
+
+
+def test_upload_corrupt_image_file(client: FlaskClient):
+    """
+    Test that the upload endpoint correctly handles an image file that starts like a JPEG but
+    cannot be decoded.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("corrupt_image.jpg", b"\xff\xd8\xffinvalid image data")
+
+    zip_buffer.seek(0)
+
+    client, access_token = client
+
+    response = client.post(
+        UPLOAD_ENDPOINT,
+        data={"file": (zip_buffer, "images.zip", "application/zip")},
+        content_type="multipart/form-data",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
     assert response.status_code == ERR_EXTRACT_META[1]
     assert ERR_EXTRACT_META[0] in str(response.data)
+
+
+def test_resumable_upload(client: FlaskClient):
+    """
+    Test that a zipfile sent in chunks to an upload session is processed like a regular upload,
+    and that the received offset can be queried between chunks.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    data = zip_folder(TEST_VALID_MULTIPLE).getvalue()
+    client, access_token = client
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.post("/uploads", json={"size": len(data)}, headers=headers)
+    assert response.status_code == 201
+    session_url = response.headers["Location"]
+
+    half = len(data) // 2
+    for offset, chunk in [(0, data[:half]), (half, data[half:])]:
+        response = client.get(session_url, headers=headers)
+        assert response.get_json()["offset"] == offset
+
+        response = client.put(
+            session_url, data=chunk, headers={**headers, UPLOAD_OFFSET_HEADER: str(offset)}
+        )
+        assert response.status_code == 200
+        assert response.headers[UPLOAD_OFFSET_HEADER] == str(offset + len(chunk))
+
+    response = client.post(f"{session_url}/complete", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/zip"
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        assert set(os.listdir(TEST_VALID_MULTIPLE)) <= set(zip_ref.namelist())
+
+    response = client.get(session_url, headers=headers)
+    assert response.status_code == ERR_SESSION_NOT_FOUND[1]
+
+
+def test_resumable_upload_offset_mismatch(client: FlaskClient):
+    """
+    Test that chunks at the wrong offset are rejected with the offset to resume from, and that
+    an incomplete session cannot be completed.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    client, access_token = client
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.post("/uploads", json={"size": 10}, headers=headers)
+    session_url = response.headers["Location"]
+
+    try:
+        client.put(session_url, data=b"12345", headers={**headers, UPLOAD_OFFSET_HEADER: "0"})
+        response = client.put(
+            session_url, data=b"12345", headers={**headers, UPLOAD_OFFSET_HEADER: "0"}
+        )
+        assert response.status_code == ERR_OFFSET_MISMATCH[1]
+        assert response.get_json()["offset"] == 5
+
+        response = client.post(f"{session_url}/complete", headers=headers)
+        assert response.status_code == ERR_UPLOAD_INCOMPLETE[1]
+    finally:
+        assert client.delete(session_url, headers=headers).status_code == 204
+
+
+def test_upload_rejected_when_busy(client: FlaskClient):
+    """
+    Test that uploads beyond the admission budget are rejected with a Retry-After header.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    with patch.multiple(
+        upload_admission, max_in_flight=1, max_in_flight_bytes=1, queue_limit=0
+    ), upload_admission.admit(1):
+        response = zip_folder_and_post(client, TEST_VALID_SINGLE)
+
+    assert response.status_code == ERR_UPLOAD_BUSY[1]
+    assert ERR_UPLOAD_BUSY[0] in str(response.data)
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_upload_insufficient_storage(client: FlaskClient):
+    """
+    Test that uploads are rejected before being received when the disk cannot hold them.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    free = shutil.disk_usage(workspaces.root).free
+    with patch.object(workspaces, "disk_headroom_bytes", free):
+        response = zip_folder_and_post(client, TEST_VALID_SINGLE)
+
+    assert response.status_code == ERR_INSUFFICIENT_STORAGE[1]
+    assert ERR_INSUFFICIENT_STORAGE[0] in str(response.data)
+
+
+def test_upload_binary_sidecar(client: FlaskClient, tmp_path):
+    """
+    Test that binary EXIF values over the size limit are written to sidecar files when the
+    upload requests it, and summarized in the metadata.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    maker_note = bytes(range(256)) * 8
+    exif = Image.Exif()
+    exif[0x8769] = {0x927C: maker_note}
+    Image.new("RGB", (10, 10)).save(os.path.join(tmp_path, "image.jpg"), exif=exif)
+
+    response = zip_folder_and_post(client, str(tmp_path), {"binary": "sidecar"})
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        assert zip_ref.read("image_MakerNote.bin") == maker_note
+        metadata = json.loads(zip_ref.read("image_meta.json"))
+    assert metadata["exif"]["MakerNote"]["length"] == len(maker_note)
+    assert metadata["exif"]["MakerNote"]["file"] == "image_MakerNote.bin"
+
+
+def test_upload_invalid_binary_policy(client: FlaskClient):
+    """
+    Test that an unknown binary value policy is rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_SINGLE, {"binary": "everything"})
+
+    assert response.status_code == ERR_EXTRACT_OPTIONS[1]
+    assert ERR_EXTRACT_OPTIONS[0] in str(response.data)
+
+
+def test_upload_tags(client: FlaskClient):
+    """
+    Test that only the requested EXIF tags are written to the metadata.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_SINGLE, {"tags": "basic, FNumber"})
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        metadata = json.loads(zip_ref.read("DSC_2233_meta.json"))
+    assert "FNumber" in metadata["exif"]
+    assert "Make" in metadata["exif"]
+    assert set(metadata["exif"]) <= TAG_PRESETS["basic"] | {"FNumber"}
+
+
+def test_upload_invalid_tags(client: FlaskClient):
+    """
+    Test that unknown EXIF tags and presets are rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_SINGLE, {"tags": "basic,everything"})
+
+    assert response.status_code == ERR_EXTRACT_OPTIONS[1]
+    assert ERR_EXTRACT_OPTIONS[0] in str(response.data)
+
+
+@pytest.mark.parametrize("post", [zip_folder_and_post, post_images])
+@pytest.mark.parametrize("output", ["json", "jsonl"])
+def test_upload_manifest(client: FlaskClient, post, output: str):
+    """
+    Test that metadata is written to a single manifest instead of a json file per image.
+
+    Args:
+        client (FlaskClient): Flask test client
+        post (Callable): posts the images as a zipfile or as separate images
+        output (str): manifest format
+    """
+    response = post(client, TEST_VALID_MULTIPLE, query_string={"output": output})
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        assert sorted(zip_ref.namelist()) == sorted(
+            os.listdir(TEST_VALID_MULTIPLE) + [MANIFEST_NAMES[output], SUMMARY_NAME]
+        )
+        manifest = zip_ref.read(MANIFEST_NAMES[output]).decode()
+    if output == "jsonl":
+        lines = [json.loads(line) for line in manifest.splitlines()]
+        metadata = {line["file"]: line["metadata"] for line in lines}
+    else:
+        metadata = json.loads(manifest)
+    assert sorted(metadata) == sorted(os.listdir(TEST_VALID_MULTIPLE))
+    assert all("size" in image for image in metadata.values())
+    assert "\n " not in manifest
+
+
+@pytest.mark.parametrize("post", [zip_folder_and_post, post_images])
+def test_upload_columnar(client: FlaskClient, post):
+    """
+    Test that metadata is written to a typed table, as CSV and in the binary columnar format.
+
+    Args:
+        client (FlaskClient): Flask test client
+        post (Callable): posts the images as a zipfile or as separate images
+    """
+    tables = {}
+    for output in ("csv", "columnar"):
+        response = post(client, TEST_VALID_MULTIPLE, query_string={"output": output})
+        assert response.status_code == 200
+        with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+            assert MANIFEST_NAMES[output] in zip_ref.namelist()
+            assert not [name for name in zip_ref.namelist() if name.endswith("_meta.json")]
+            tables[output] = zip_ref.read(MANIFEST_NAMES[output])
+
+    columns = read_columnar(tables["columnar"])
+    assert sorted(columns["file"]) == sorted(os.listdir(TEST_VALID_MULTIPLE))
+    assert all(isinstance(width, int) for width in columns["size.0"])
+    assert any(isinstance(f_number, float) for f_number in columns["exif.FNumber"])
+    assert any("T" in date for date in columns["exif.DateTimeOriginal"] if date)
+
+    rows = list(csv.DictReader(io.StringIO(tables["csv"].decode())))
+    assert sorted(rows[0]) == sorted(columns)
+    assert sorted(row["file"] for row in rows) == sorted(columns["file"])
+
+
+def test_upload_stats(client: FlaskClient):
+    """
+    Test that the pixel statistics of each image are added to its metadata when requested.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_MULTIPLE, {"stats": "true"})
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.data)) as zip_ref:
+        for filename in os.listdir(TEST_VALID_MULTIPLE):
+            metadata = json.loads(zip_ref.read(f"{os.path.splitext(filename)[0]}_meta.json"))
+            assert sum(metadata["stats"]["luminance"]["histogram"]) == (
+                metadata["stats"]["size"][0] * metadata["stats"]["size"][1]
+            )
+
+
+def test_upload_invalid_stats(client: FlaskClient):
+    """
+    Test that an invalid stats query parameter is rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_SINGLE, {"stats": "maybe"})
+
+    assert response.status_code == ERR_EXTRACT_OPTIONS[1]
+    assert ERR_EXTRACT_OPTIONS[0] in str(response.data)
+
+
+def test_upload_invalid_output(client: FlaskClient):
+    """
+    Test that an unknown metadata output is rejected.
+
+    Args:
+        client (FlaskClient): Flask test client
+    """
+    response = zip_folder_and_post(client, TEST_VALID_SINGLE, {"output": "xml"})
+
+    assert response.status_code == ERR_EXTRACT_OPTIONS[1]
+    assert ERR_EXTRACT_OPTIONS[0] in str(response.data)
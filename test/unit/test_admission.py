@@ -0,0 +1,105 @@
+"""
+Unit tests for admission.py
+"""
+
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from utils import metrics
+from utils.admission import AdmissionController, AdmissionRejectedError, MAX_RETRY_AFTER_S
+
+
+def create_controller(**config) -> AdmissionController:
+    app = Flask(__name__)
+    app.config.update(
+        UPLOAD_MAX_IN_FLIGHT=2,
+        UPLOAD_MAX_IN_FLIGHT_MB=10,
+        UPLOAD_ADMISSION_QUEUE_LIMIT=4,
+        UPLOAD_ADMISSION_TIMEOUT_S=0.05,
+    )
+    app.config.update(config)
+    return AdmissionController(app, "upload")
+
+
+def test_admit_within_budget():
+    controller = create_controller()
+    with controller.admit(4000000), controller.admit(4000000):
+        assert controller.in_flight == (2, 8000000)
+    assert controller.in_flight == (0, 0)
+
+
+@pytest.mark.parametrize("sizes", [[1, 1], [8000000, 4000000]])
+def test_reject_over_budget(sizes: list[int]):
+    controller = create_controller()
+    with controller.admit(sizes[0]):
+        with pytest.raises(AdmissionRejectedError) as e:
+            with controller.admit(sizes[1]):
+                with controller.admit(sizes[1]):
+                    pass
+    assert 1 <= e.value.retry_after <= MAX_RETRY_AFTER_S
+
+
+def test_oversized_request_admitted_alone():
+    controller = create_controller()
+    with controller.admit(50000000):
+        assert controller.in_flight == (1, 50000000)
+
+
+def test_reject_when_queue_full():
+    controller = create_controller(UPLOAD_MAX_IN_FLIGHT=1, UPLOAD_ADMISSION_QUEUE_LIMIT=0)
+    with controller.admit(1):
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejectedError):
+            with controller.admit(1):
+                pass
+        assert time.monotonic() - start < 0.05
+
+
+def test_queued_request_admitted_on_release():
+    controller = create_controller(UPLOAD_MAX_IN_FLIGHT=1, UPLOAD_ADMISSION_TIMEOUT_S=5)
+    admitted = threading.Event()
+
+    def wait_for_admission():
+        with controller.admit(1):
+            admitted.set()
+
+    with controller.admit(1):
+        thread = threading.Thread(target=wait_for_admission)
+        thread.start()
+        assert not admitted.wait(0.05)
+    thread.join(5)
+    assert admitted.is_set()
+
+
+def test_wait_metric():
+    metrics.reset()
+    controller = create_controller()
+    with controller.admit(1):
+        pass
+    assert metrics.snapshot()["upload.admission.wait.ms"]["count"] == 1
+
+
+def test_retry_after_from_throughput():
+    controller = create_controller(UPLOAD_MAX_IN_FLIGHT=1, UPLOAD_ADMISSION_QUEUE_LIMIT=0)
+    for _ in range(10):
+        with controller.admit(1000000):
+            pass
+    with controller.admit(1000000):
+        with pytest.raises(AdmissionRejectedError) as e:
+            with controller.admit(1000000):
+                pass
+    # 10 MB completed in well under a second: the 2 MB backlog drains in the minimum delay
+    assert e.value.retry_after == 1
+
+
+def test_fast_lane_bypasses_request_limit():
+    controller = create_controller(UPLOAD_MAX_IN_FLIGHT=1, UPLOAD_ADMISSION_QUEUE_LIMIT=0)
+    with controller.admit(8000000):
+        with controller.admit(1000000, fast_lane=True):
+            assert controller.in_flight == (2, 9000000)
+        with pytest.raises(AdmissionRejectedError):
+            with controller.admit(4000000, fast_lane=True):
+                pass
@@ -0,0 +1,147 @@
+"""
+Unit tests for utils.columnar.py
+"""
+
+import csv
+import math
+import os
+
+import pytest
+
+from utils.columnar import (
+    ColumnarTable,
+    flatten_metadata,
+    read_columnar,
+    ColumnarFormatError,
+    COLUMNAR_MAGIC,
+    INT64,
+    FLOAT64,
+    STRING,
+    TIMESTAMP,
+)
+
+
+METADATA = [
+    {
+        "format": "JPEG",
+        "size": (4000, 3000),
+        "exif": {
+            "Make": "NIKON",
+            "FNumber": 2.8,
+            "ISOSpeedRatings": 100,
+            "DateTimeOriginal": "2020:01:02 03:04:05",
+            "MakerNote": {"length": 1000, "sha256": "ab"},
+        },
+        "gps": {"latitude": -33.86, "longitude": 151.21},
+    },
+    {
+        "format": "PNG",
+        "size": (10, 20),
+        "exif": {"Make": "ÜNIKON", "FNumber": 4, "ISOSpeedRatings": "(100, 200)"},
+    },
+    {"format": "JPEG", "size": (1, 1)},
+]
+
+
+def create_table() -> ColumnarTable:
+    table = ColumnarTable()
+    for i, metadata in enumerate(METADATA):
+        table.add_row({"file": f"image_{i}.jpg", **flatten_metadata(metadata)})
+    return table
+
+
+def test_flatten_metadata():
+    assert flatten_metadata(METADATA[0]) == {
+        "format": "JPEG",
+        "size.0": 4000,
+        "size.1": 3000,
+        "exif.Make": "NIKON",
+        "exif.FNumber": 2.8,
+        "exif.ISOSpeedRatings": 100,
+        "exif.DateTimeOriginal": "2020:01:02 03:04:05",
+        "exif.MakerNote.length": 1000,
+        "exif.MakerNote.sha256": "ab",
+        "gps.latitude": -33.86,
+        "gps.longitude": 151.21,
+    }
+
+
+def test_column_types():
+    assert create_table().columns() == {
+        "file": STRING,
+        "format": STRING,
+        "size.0": INT64,
+        "size.1": INT64,
+        "exif.Make": STRING,
+        "exif.FNumber": FLOAT64,
+        "exif.ISOSpeedRatings": STRING,
+        "exif.DateTimeOriginal": TIMESTAMP,
+        "exif.MakerNote.length": INT64,
+        "exif.MakerNote.sha256": STRING,
+        "gps.latitude": FLOAT64,
+        "gps.longitude": FLOAT64,
+    }
+
+
+def test_read_columnar(tmp_path):
+    table = create_table()
+    file_path = os.path.join(tmp_path, "metadata.cols")
+    table.write(file_path)
+
+    for source in (file_path, table.to_bytes()):
+        columns = read_columnar(source)
+        assert list(columns) == list(table.columns())
+        assert columns["file"] == ["image_0.jpg", "image_1.jpg", "image_2.jpg"]
+        assert columns["size.0"] == [4000, 10, 1]
+        assert columns["exif.Make"] == ["NIKON", "ÜNIKON", None]
+        assert columns["exif.FNumber"] == [2.8, 4.0, None]
+        assert columns["exif.ISOSpeedRatings"] == ["100", "(100, 200)", None]
+        assert columns["exif.DateTimeOriginal"] == ["2020-01-02T03:04:05", None, None]
+        assert columns["gps.latitude"] == [-33.86, None, None]
+
+
+def test_read_columnar_nan():
+    table = ColumnarTable()
+    table.add_row({"value": float("nan")})
+    table.add_row({})
+
+    value = read_columnar(table.to_bytes())["value"]
+    assert math.isnan(value[0])
+    assert value[1] is None
+
+
+def test_read_columnar_empty():
+    table = ColumnarTable()
+    assert read_columnar(table.to_bytes()) == {}
+
+    table.add_row({"value": None})
+    assert read_columnar(table.to_bytes()) == {"value": [None]}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"not columnar",
+        COLUMNAR_MAGIC,
+        COLUMNAR_MAGIC + b"\x05\x00\x00\x00{rows",
+        create_table().to_bytes()[:-10],
+    ],
+)
+def test_read_columnar_invalid(data: bytes):
+    with pytest.raises(ColumnarFormatError):
+        read_columnar(data)
+
+
+def test_write_csv(tmp_path):
+    file_path = os.path.join(tmp_path, "metadata.csv")
+    create_table().write_csv(file_path)
+
+    with open(file_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(METADATA)
+    assert rows[0]["exif.FNumber"] == "2.8"
+    assert rows[0]["exif.DateTimeOriginal"] == "2020-01-02T03:04:05"
+    assert rows[1]["exif.Make"] == "ÜNIKON"
+    assert rows[2]["exif.Make"] == ""
+    assert rows[2]["size.1"] == "1"
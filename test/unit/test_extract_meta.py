@@ -2,6 +2,7 @@
 Unit tests for extract_meta.py
 """
 
+import hashlib
 import pytest
 import os
 import json
@@ -13,10 +14,20 @@ from PIL import Image
 from test.testing_utils import create_image_files
 from test.integration.test_upload import TEST_VALID_MULTIPLE
 from utils.extract_meta import (
-    _extract_metadata,
+    extract_image_metadata,
     _remove_exif,
     _write_to_json,
     extract_metadata,
+    load_image_plugins,
+    IMAGE_FORMATS,
+    BINARY_OMIT,
+    BINARY_SUMMARY,
+    BINARY_SIDECAR,
+    TAG_PRESETS,
+    METADATA_JSON,
+    METADATA_JSONL,
+    MetadataManifest,
+    resolve_tags,
     ExtractMetaError,
 )
 
@@ -119,7 +130,7 @@ def test_extract_metadata_creates_meta_file():
         cpy_dest = os.path.join(TEST_FOLDER, test_img_name)
         shutil.copy(TEST_IMG_1, cpy_dest)
 
-        _extract_metadata(cpy_dest)
+        extract_image_metadata(cpy_dest)
 
         meta_file = os.path.join(TEST_FOLDER, f"{test_img_name_no_ext}_meta.json")
         assert os.path.isfile(meta_file)
@@ -129,6 +140,214 @@ def test_extract_metadata_creates_meta_file():
         shutil.rmtree(TEST_FOLDER)
 
 
+def test_extract_metadata_decodes_gps():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "gps.jpg")
+        exif = Image.Exif()
+        exif[0x8825] = {1: "S", 2: (33.0, 51.0, 36.0), 3: "E", 4: (151.0, 12.0, 36.0)}
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+
+        metadata = extract_image_metadata(file_path)
+
+        assert metadata["exif"]["GPSInfo"]["GPSLatitudeRef"] == "S"
+        assert metadata["exif"]["GPSInfo"]["GPSLatitude"] == [33.0, 51.0, 36.0]
+        assert metadata["gps"]["latitude"] == pytest.approx(-33.86)
+        assert metadata["gps"]["longitude"] == pytest.approx(151.21)
+        with open(os.path.join(TEST_FOLDER, "gps_meta.json")) as meta_file:
+            assert json.load(meta_file)["gps"] == metadata["gps"]
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_load_image_plugins():
+    load_image_plugins()
+    for image_format in IMAGE_FORMATS:
+        assert image_format in Image.OPEN
+        assert image_format in Image.SAVE
+
+
+def test_extract_metadata_rejects_other_formats():
+    os.mkdir(TEST_FOLDER)
+    try:
+        # a GIF named like a JPEG is not opened, although Pillow could read it
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        Image.new("RGB", (10, 10)).save(file_path, "GIF")
+
+        with pytest.raises(ExtractMetaError):
+            extract_image_metadata(file_path)
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_extract_metadata_truncated_scan():
+    os.mkdir(TEST_FOLDER)
+    try:
+        # the header and EXIF data are intact, the pixels end shortly after the start of scan
+        with open(TEST_IMG_1, "rb") as f:
+            data = f.read()
+        file_path = os.path.join(TEST_FOLDER, "truncated.jpg")
+        with open(file_path, "wb") as f:
+            f.write(data[: data.rindex(b"\xff\xda") + 5000])
+
+        with pytest.raises(ExtractMetaError):
+            extract_image_metadata(file_path)
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_extract_metadata_keep_floats():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        exif = Image.Exif()
+        exif[0x8769] = {0x829D: 2.8, 0x8827: 100, 0x9286: b"comment"}
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+
+        metadata = extract_image_metadata(file_path, keep_floats=True)
+
+        assert metadata["exif"]["FNumber"] == 2.8
+        assert metadata["exif"]["ISOSpeedRatings"] == 100
+        assert metadata["exif"]["UserComment"] == str(b"comment")
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_extract_metadata_stats():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        shutil.copy(TEST_IMG_1, file_path)
+
+        metadata = extract_image_metadata(file_path, stats=True)
+
+        assert set(metadata["stats"]["mean"]) == {"R", "G", "B"}
+        with open(os.path.join(TEST_FOLDER, "image_meta.json")) as meta_file:
+            assert json.load(meta_file)["stats"] == metadata["stats"]
+        assert "stats" not in extract_image_metadata(file_path)
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_resolve_tags():
+    assert resolve_tags(["gps"]) == {"GPSInfo"}
+    assert resolve_tags(["basic", "FNumber"]) == TAG_PRESETS["basic"] | {"FNumber"}
+    assert resolve_tags([]) == frozenset()
+    with pytest.raises(ValueError):
+        resolve_tags(["basic", "NotATag"])
+
+
+def test_extract_metadata_tags():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        exif = Image.Exif()
+        exif[0x010F] = "Maker"
+        exif[0x0131] = "Software"
+        exif[0x8769] = {0x829D: 2.8, 0x8827: 100}
+        exif[0x8825] = {1: "S", 2: (33.0, 51.0, 36.0), 3: "E", 4: (151.0, 12.0, 36.0)}
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+
+        metadata = extract_image_metadata(file_path, tags=["Make", "FNumber"])
+        assert metadata["exif"] == {"Make": "Maker", "FNumber": "2.8"}
+        assert "gps" not in metadata
+
+        # extracting removed the EXIF data from the image
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+        metadata = extract_image_metadata(file_path, tags=resolve_tags(["gps"]))
+        assert list(metadata["exif"]) == ["GPSInfo"]
+        assert metadata["gps"]["latitude"] == pytest.approx(-33.86)
+        with open(os.path.join(TEST_FOLDER, "image_meta.json")) as meta_file:
+            assert json.load(meta_file)["exif"] == metadata["exif"]
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+@pytest.mark.parametrize("count", [0, 1, 3])
+@pytest.mark.parametrize("output", [METADATA_JSON, METADATA_JSONL])
+def test_metadata_manifest(tmp_path, output: str, count: int):
+    metadata = {
+        f"image_{i}.jpg": {"format": "JPEG", "exif": {"Make": f"Maker {i}"}} for i in range(count)
+    }
+
+    with MetadataManifest(str(tmp_path), output) as manifest:
+        for filename, image_metadata in metadata.items():
+            manifest.add(filename, image_metadata)
+
+    with open(manifest.path) as f:
+        if output == METADATA_JSONL:
+            lines = [json.loads(line) for line in f]
+            assert {line["file"]: line["metadata"] for line in lines} == metadata
+        else:
+            assert json.load(f) == metadata
+    assert os.listdir(tmp_path) == [os.path.basename(manifest.path)]
+
+
+def test_metadata_manifest_invalid_output(tmp_path):
+    with pytest.raises(ValueError):
+        MetadataManifest(str(tmp_path), "files")
+
+
+def test_extract_metadata_without_json():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        shutil.copy(TEST_IMG_1, file_path)
+
+        metadata = extract_image_metadata(file_path, write_json=False)
+
+        assert metadata["exif"]
+        assert os.listdir(TEST_FOLDER) == ["image.jpg"]
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+@pytest.mark.parametrize("binary_policy", [BINARY_OMIT, BINARY_SUMMARY, BINARY_SIDECAR])
+def test_extract_metadata_binary_limit(binary_policy: str):
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        maker_note = b"\x01" * 1000
+        exif = Image.Exif()
+        exif[0x8769] = {0x927C: maker_note, 0x9000: b"0232"}
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+
+        metadata = extract_image_metadata(file_path, 100, binary_policy)
+
+        # values under the limit are kept as before
+        assert metadata["exif"]["ExifVersion"] == str(b"0232")
+        sidecar = os.path.join(TEST_FOLDER, "image_MakerNote.bin")
+        if binary_policy == BINARY_OMIT:
+            assert "MakerNote" not in metadata["exif"]
+        else:
+            summary = metadata["exif"]["MakerNote"]
+            assert summary["length"] == 1000
+            assert summary["sha256"] == hashlib.sha256(maker_note).hexdigest()
+        if binary_policy == BINARY_SIDECAR:
+            assert summary["file"] == "image_MakerNote.bin"
+            with open(sidecar, "rb") as f:
+                assert f.read() == maker_note
+        else:
+            assert not os.path.exists(sidecar)
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_extract_metadata_no_binary_limit():
+    os.mkdir(TEST_FOLDER)
+    try:
+        file_path = os.path.join(TEST_FOLDER, "image.jpg")
+        exif = Image.Exif()
+        exif[0x8769] = {0x927C: b"\x01" * 1000}
+        Image.new("RGB", (10, 10)).save(file_path, exif=exif)
+
+        metadata = extract_image_metadata(file_path, None)
+
+        assert metadata["exif"]["MakerNote"] == str(b"\x01" * 1000)
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
 @pytest.mark.parametrize(
     "arg",
     [
@@ -138,7 +357,7 @@ def test_extract_metadata_creates_meta_file():
 )
 def test_extract_metadata_raises(arg):
     with pytest.raises(ExtractMetaError):
-        _extract_metadata(arg)
+        extract_image_metadata(arg)
 
 
 @pytest.mark.parametrize(
@@ -152,7 +371,7 @@ def test_extract_metadata_raises(arg):
     ],
 )
 def test_extract_metadata_folder(folder_contents: list):
-    with patch("utils.extract_meta._extract_metadata") as mock_extract, patch(
+    with patch("utils.extract_meta.extract_image_metadata") as mock_extract, patch(
         "os.listdir"
     ) as mock_listdir:
         mock_listdir.return_value = folder_contents
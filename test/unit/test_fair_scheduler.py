@@ -0,0 +1,88 @@
+"""
+Unit tests for fair_scheduler.py
+"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from utils.fair_scheduler import FairScheduler
+
+
+def create_scheduler(**config) -> FairScheduler:
+    app = Flask(__name__)
+    app.config.update(PROCESSING_WORKERS=1, PROCESSING_FAST_LANE_WORKERS=1)
+    app.config.update(config)
+    return FairScheduler(app)
+
+
+def run_order(scheduler: FairScheduler, tasks: list[tuple[str, str]]) -> list[str]:
+    """
+    Queues tasks while the only worker is blocked, and returns the order they ran in.
+    """
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit("blocker", gate.wait)
+    futures = [scheduler.submit(user, order.append, name) for user, name in tasks]
+    gate.set()
+    blocker.result(5)
+    for future in futures:
+        future.result(5)
+    return order
+
+
+TASKS = [("a", "a1"), ("a", "a2"), ("a", "a3"), ("a", "a4"), ("b", "b1"), ("b", "b2")]
+
+
+@pytest.mark.parametrize(
+    "weights, expected",
+    [
+        ({}, ["a1", "b1", "a2", "b2", "a3", "a4"]),
+        ({"a": 2}, ["a1", "a2", "b1", "a3", "a4", "b2"]),
+    ],
+)
+def test_weighted_round_robin(weights: dict, expected: list[str]):
+    scheduler = create_scheduler(PROCESSING_USER_WEIGHTS=weights)
+    assert run_order(scheduler, TASKS) == expected
+
+
+def test_fast_lane_runs_while_workers_are_busy():
+    scheduler = create_scheduler()
+    gate = threading.Event()
+    blocker = scheduler.submit("heavy_user", gate.wait)
+    try:
+        assert scheduler.submit("light_user", sum, [1, 2], fast_lane=True).result(5) == 3
+    finally:
+        gate.set()
+    blocker.result(5)
+
+
+def test_fast_lane_round_robin_between_users():
+    scheduler = create_scheduler(PROCESSING_FAST_LANE_WORKERS=0)
+    started, gate = threading.Event(), threading.Event()
+    order = []
+    blocker = scheduler.submit("blocker", lambda: started.set() or gate.wait())
+    assert started.wait(5)
+    flood = [scheduler.submit("flooder", order.append, f"f{i}", fast_lane=True) for i in range(5)]
+    light = scheduler.submit("light_user", order.append, "l1", fast_lane=True)
+    assert scheduler.pending() == {"": 6}
+    gate.set()
+    blocker.result(5)
+    for future in (*flood, light):
+        future.result(5)
+    assert order == ["f0", "l1", "f1", "f2", "f3", "f4"]
+
+
+def test_exceptions_are_set_on_future():
+    scheduler = create_scheduler()
+    future = scheduler.submit("user", int, "not a number")
+    with pytest.raises(ValueError):
+        future.result(5)
+
+
+@pytest.mark.parametrize("nbytes, expected", [(1, True), (10000000, True), (10000001, False)])
+def test_is_fast_lane(nbytes: int, expected: bool):
+    scheduler = create_scheduler(PROCESSING_FAST_LANE_MB=10)
+    assert scheduler.is_fast_lane(nbytes) == expected
+    assert not scheduler.is_fast_lane(None)
@@ -0,0 +1,73 @@
+"""
+Unit tests for gps.py
+"""
+
+import pytest
+from PIL.TiffImagePlugin import IFDRational
+
+from utils.gps import decode_gps_info, get_coordinates, to_decimal_degrees, haversine_distance_m
+
+
+TEST_GPS_INFO = {
+    0: b"\x02\x02\x00\x00",
+    1: "N\x00",
+    2: (IFDRational(48), IFDRational(51), IFDRational(59, 2)),
+    3: "W",
+    4: (IFDRational(2), IFDRational(17), IFDRational(40)),
+    5: b"\x01",
+    6: IFDRational(71, 2),
+}
+
+
+def test_decode_gps_info():
+    gps = decode_gps_info(TEST_GPS_INFO)
+    assert gps == {
+        "GPSVersionID": [2, 2, 0, 0],
+        "GPSLatitudeRef": "N",
+        "GPSLatitude": [48.0, 51.0, 29.5],
+        "GPSLongitudeRef": "W",
+        "GPSLongitude": [2.0, 17.0, 40.0],
+        "GPSAltitudeRef": [1],
+        "GPSAltitude": 35.5,
+    }
+
+
+def test_get_coordinates():
+    coordinates = get_coordinates(decode_gps_info(TEST_GPS_INFO))
+    assert coordinates["latitude"] == pytest.approx(48.858194, abs=1e-6)
+    assert coordinates["longitude"] == pytest.approx(-2.294444, abs=1e-6)
+    assert coordinates["altitude"] == -35.5
+
+
+@pytest.mark.parametrize(
+    "gps",
+    [
+        {},
+        {"GPSLatitudeRef": "N", "GPSLatitude": [48.0, 51.0, 29.5]},
+        {"GPSLatitude": [95.0, 0, 0], "GPSLongitude": [2.0, 0, 0]},
+        {"GPSLatitude": "garbage", "GPSLongitude": [2.0, 0, 0]},
+    ],
+)
+def test_get_coordinates_invalid(gps: dict):
+    assert get_coordinates(gps) is None
+
+
+@pytest.mark.parametrize(
+    "dms, ref, expected",
+    [
+        ((10, 30, 0), "N", 10.5),
+        ((10, 30, 0), "S", -10.5),
+        ((0, 0, 36), "E", 0.01),
+        ((0, 0, 36), "W", -0.01),
+        ((1, 2), "N", None),
+        (None, "N", None),
+    ],
+)
+def test_to_decimal_degrees(dms, ref: str, expected):
+    assert to_decimal_degrees(dms, ref) == (pytest.approx(expected) if expected else expected)
+
+
+def test_haversine_distance_m():
+    assert haversine_distance_m(0, 0, 0, 0) == 0
+    # one degree of latitude is about 111 km
+    assert haversine_distance_m(0, 0, 0, 1) == pytest.approx(111_319, rel=1e-3)
@@ -0,0 +1,192 @@
+"""
+Unit tests for utils.image_header.py
+"""
+
+import glob
+import io
+import os
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, PngImagePlugin
+
+from utils import image_header
+from utils.image_header import read_image_header, parse_exif, ImageHeaderError
+
+
+TEST_FILES = glob.glob(os.path.join("test", "testing_files", "valid_*", "*"))
+
+
+def create_exif() -> Image.Exif:
+    exif = Image.Exif()
+    exif[0x010F] = "Maker"
+    exif[0x0110] = "Model\x00"
+    # XResolution is a single value tag, Pillow keeps only the first of the two values
+    exif[0x011A] = (72.0, 1.0)
+    exif[0x8769] = {
+        0x9003: "2020:01:01 00:00:00",
+        0x927C: b"\x00\x01" * 100,
+        0x829A: 0.004,
+        0x9201: -3.5,
+        0x8827: (100, 200),
+    }
+    exif[0x8825] = {1: "S", 2: (33.0, 51.0, 36.0), 3: "E", 4: (151.0, 12.0, 36.0), 0: b"\x02\x02"}
+    return exif
+
+
+def as_strings(tags: dict) -> dict:
+    """
+    Converts tag values to strings, as they are written to the metadata files.
+    """
+    return {k: as_strings(v) if isinstance(v, dict) else str(v) for k, v in tags.items()}
+
+
+def assert_matches_pillow(data: bytes):
+    with Image.open(io.BytesIO(data)) as img:
+        header = read_image_header(data)
+        assert (header.format, header.mode, header.size) == (img.format, img.mode, img.size)
+        exif = img._getexif()
+        if exif is None:
+            assert header.exif is None
+        else:
+            assert as_strings(parse_exif(header.exif)) == as_strings(exif)
+
+
+@pytest.mark.parametrize("file_path", TEST_FILES)
+def test_read_test_files(file_path: str):
+    with open(file_path, "rb") as f:
+        assert_matches_pillow(f.read())
+
+
+@pytest.mark.parametrize(
+    "image_format, mode",
+    [("JPEG", mode) for mode in ("RGB", "L", "CMYK")]
+    + [("PNG", mode) for mode in ("RGB", "RGBA", "L", "LA", "P", "1", "I")],
+)
+def test_read_exif(image_format: str, mode: str):
+    buffer = io.BytesIO()
+    Image.new(mode, (17, 9)).save(buffer, image_format, exif=create_exif())
+    assert_matches_pillow(buffer.getvalue())
+
+
+def test_read_without_exif():
+    buffer = io.BytesIO()
+    Image.new("RGB", (17, 9)).save(buffer, "JPEG")
+    header = read_image_header(buffer.getvalue())
+    assert header.exif is None
+    assert header.size == (17, 9)
+
+
+def test_read_png_exif_after_pixels():
+    buffer = io.BytesIO()
+    Image.new("RGB", (17, 9)).save(buffer, "PNG")
+    # eXIf chunks hold the EXIF data without the "Exif\0\0" header
+    exif = create_exif().tobytes()[6:]
+    chunk = PngImagePlugin.putchunk
+    data = buffer.getvalue()
+    # move the IEND chunk behind an eXIf chunk
+    out = io.BytesIO()
+    out.write(data[:-12])
+    chunk(out, b"eXIf", exif)
+    out.write(data[-12:])
+
+    assert read_image_header(out.getvalue()).exif is not None
+    assert_matches_pillow(out.getvalue())
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_read_png_raw_profile_exif(compressed: bool):
+    exif = create_exif().tobytes()
+    text = f"\nexif\n{len(exif):8d}\n{exif.hex()}\n"
+    info = PngImagePlugin.PngInfo()
+    if compressed:
+        info.add_text("Raw profile type exif", text, zip=True)
+    else:
+        info.add_text("Raw profile type exif", text)
+    buffer = io.BytesIO()
+    Image.new("RGB", (17, 9)).save(buffer, "PNG", pnginfo=info)
+
+    assert read_image_header(buffer.getvalue()).exif is not None
+    assert_matches_pillow(buffer.getvalue())
+
+
+def test_read_sources(tmp_path):
+    file_path = os.path.join(tmp_path, "image.jpg")
+    Image.new("RGB", (17, 9)).save(file_path, exif=create_exif())
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    for source in (file_path, data, io.BytesIO(data)):
+        header = read_image_header(source)
+        assert header.format == "JPEG"
+        assert parse_exif(header.exif)[0x010F] == "Maker"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"GIF89a",
+        b"",
+        b"\xff\xd8\xffinvalid image data",
+        b"\xff\xd8\xff\xe0\x00\x10JFIF",
+        b"\xff\xd8\xff\xd9",
+        b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR",
+    ],
+)
+def test_read_invalid(data: bytes):
+    with pytest.raises(ImageHeaderError):
+        read_image_header(data)
+
+
+@pytest.mark.parametrize(
+    "tags",
+    [
+        [0x010F],
+        [0x010F, 0x829A],
+        [0x829A, 0x8825],
+        [0x8825],
+        [0x8769],
+        [0x0131],
+        [],
+    ],
+)
+def test_parse_exif_tags(tags: list[int]):
+    data = create_exif().tobytes()
+    all_tags = parse_exif(data)
+
+    assert parse_exif(data, tags) == {tag: all_tags[tag] for tag in tags if tag in all_tags}
+
+
+@pytest.mark.parametrize(
+    "tags, ifds",
+    [
+        ([0x010F], 1),
+        ([0x010F, 0x829A], 2),
+        ([0x8825], 2),
+        ([0x010F, 0x8825], 2),
+        ([0x829A, 0x8825], 3),
+        (None, 3),
+    ],
+)
+def test_parse_exif_tags_skips_ifds(tags: list[int] | None, ifds: int):
+    data = create_exif().tobytes()
+    with patch("utils.image_header._parse_ifd", wraps=image_header._parse_ifd) as parse_ifd:
+        parse_exif(data, tags)
+    assert parse_ifd.call_count == ifds
+
+
+def test_parse_corrupt_exif():
+    data = bytearray(create_exif().tobytes()[6:])
+    byte_order = "little" if data.startswith(b"II") else "big"
+    # make the EXIF IFD pointer point past the end of the data
+    entry = (0x8769).to_bytes(2, byte_order) + (4).to_bytes(2, byte_order)
+    pointer = data.index(entry) + 8
+    data[pointer : pointer + 4] = (len(data) + 100).to_bytes(4, byte_order)
+
+    tags = parse_exif(bytes(data))
+    assert tags[0x010F] == "Maker"
+    assert 0x9003 not in tags
+
+    assert parse_exif(b"") == {}
+    assert parse_exif(b"Exif\x00\x00not tiff") == {}
+    assert parse_exif(b"II*\x00\xff\xff\x00\x00") == {}
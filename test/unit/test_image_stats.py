@@ -0,0 +1,72 @@
+"""
+Unit tests for utils.image_stats.py
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from utils.image_stats import compute_image_stats, HISTOGRAM_BINS, STATS_SIZE
+
+
+def open_image(img: Image.Image, image_format: str) -> Image.Image:
+    buffer = io.BytesIO()
+    img.save(buffer, image_format)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+@pytest.mark.parametrize("image_format", ["PNG", "JPEG"])
+def test_uniform_image(image_format: str):
+    img = open_image(Image.new("RGB", (64, 32), (255, 255, 255)), image_format)
+
+    stats = compute_image_stats(img)
+
+    assert stats["size"] == [64, 32]
+    assert stats["mean"] == {"R": 255, "G": 255, "B": 255}
+    assert stats["variance"] == {"R": 0, "G": 0, "B": 0}
+    assert stats["luminance"]["mean"] == pytest.approx(255)
+    assert sum(stats["luminance"]["histogram"]) == 64 * 32
+    assert max(stats["luminance"]["histogram"]) == 64 * 32
+    assert stats["clipping"]["highlights"] == pytest.approx(1)
+    assert stats["clipping"]["shadows"] == 0
+
+
+def test_png_image():
+    # left half black, right half white
+    img = Image.new("RGB", (100, 50))
+    img.paste((255, 255, 255), (50, 0, 100, 50))
+
+    stats = compute_image_stats(open_image(img, "PNG"))
+
+    assert stats["mean"] == {"R": 127.5, "G": 127.5, "B": 127.5}
+    assert stats["variance"]["R"] == pytest.approx(127.5**2)
+    histogram = stats["luminance"]["histogram"]
+    assert len(histogram) == HISTOGRAM_BINS
+    assert histogram[0] == histogram[-1] == 50 * 50
+    assert stats["clipping"] == {"shadows": 0.5, "highlights": 0.5}
+
+
+@pytest.mark.parametrize("mode", ["L", "1", "LA"])
+def test_grayscale_image(mode: str):
+    img = open_image(Image.new(mode, (20, 20), 0), "PNG")
+
+    stats = compute_image_stats(img)
+
+    assert stats["mean"] == {"L": 0}
+    assert stats["variance"] == {"L": 0}
+    assert stats["clipping"] == {"shadows": 1, "highlights": 0}
+
+
+@pytest.mark.parametrize("image_format", ["PNG", "JPEG"])
+def test_large_image_is_reduced(image_format: str):
+    side = STATS_SIZE * 8
+    img = open_image(Image.linear_gradient("L").resize((side, side)).convert("RGB"), image_format)
+
+    stats = compute_image_stats(img)
+
+    # JPEG images are scaled while decoding, others are reduced after decoding
+    assert stats["size"] == [STATS_SIZE, STATS_SIZE]
+    assert stats["mean"]["R"] == pytest.approx(127.5, abs=2)
+    assert sum(stats["luminance"]["histogram"]) == STATS_SIZE**2
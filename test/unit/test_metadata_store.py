@@ -0,0 +1,390 @@
+"""
+Unit tests for metadata_store.py
+"""
+
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.metadata_store import (
+    create_metadata_store,
+    decode_cursor,
+    encode_cursor,
+    get_search_fields,
+    parse_page_size,
+    parse_search_filters,
+    create_documents,
+    parse_exif_datetime,
+    get_capture_time,
+    to_response,
+    InMemoryMetadataStore,
+    MetadataStore,
+    MongoMetadataStore,
+)
+
+
+TEST_USER = "test_user"
+TEST_UPLOAD = "test_upload"
+
+
+def create_metadata(num_images: int) -> dict[str, dict]:
+    return {
+        f"image_{i}.jpg": {
+            "format": "JPEG",
+            "exif": {"Make": "Camera", "DateTimeOriginal": f"2022:01:{i + 1:02d} 12:00:00"},
+        }
+        for i in range(num_images)
+    }
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2022:01:01 12:00:00", datetime.datetime(2022, 1, 1, 12, 0, 0)),
+        ("2022:01:01 12:00:00\x00", datetime.datetime(2022, 1, 1, 12, 0, 0)),
+        ("0000:00:00 00:00:00", None),
+        ("not a date", None),
+        (None, None),
+        (1, None),
+    ],
+)
+def test_parse_exif_datetime(value, expected):
+    assert parse_exif_datetime(value) == expected
+
+
+def test_get_capture_time_prefers_original():
+    metadata = {
+        "exif": {"DateTime": "2023:01:01 00:00:00", "DateTimeOriginal": "2022:01:01 00:00:00"}
+    }
+    assert get_capture_time(metadata) == datetime.datetime(2022, 1, 1)
+    assert get_capture_time({"format": "PNG"}) is None
+
+
+def test_create_documents():
+    documents = create_documents(TEST_USER, TEST_UPLOAD, create_metadata(2))
+    assert len(documents) == 2
+    assert documents[0]["user"] == TEST_USER
+    assert documents[0]["upload_id"] == TEST_UPLOAD
+    assert documents[0]["filename"] == "image_0.jpg"
+    assert documents[0]["captured_at"] == datetime.datetime(2022, 1, 1, 12, 0, 0)
+
+
+def test_in_memory_save_and_get():
+    store = InMemoryMetadataStore()
+    assert store.save_upload(TEST_USER, TEST_UPLOAD, create_metadata(3)) == 3
+    store.save_upload("other_user", TEST_UPLOAD, create_metadata(1))
+
+    documents = store.get_upload(TEST_USER, TEST_UPLOAD)
+    assert [doc["filename"] for doc in documents] == ["image_0.jpg", "image_1.jpg", "image_2.jpg"]
+    assert store.get_upload(TEST_USER, "missing_upload") == []
+
+    response = to_response(documents[0])
+    assert response["captured_at"] == "2022-01-01T12:00:00"
+    assert response["metadata"]["exif"]["Make"] == "Camera"
+
+
+def create_camera_metadata(make, model, iso, focal_length, captured_at) -> dict:
+    exif = {"Make": make, "Model": model, "ISOSpeedRatings": iso, "FocalLength": focal_length}
+    if captured_at:
+        exif["DateTimeOriginal"] = captured_at
+    return {"format": "JPEG", "exif": exif}
+
+
+@pytest.fixture(name="search_store")
+def search_store_fixture():
+    store = InMemoryMetadataStore()
+    store.save_upload(
+        TEST_USER,
+        TEST_UPLOAD,
+        {
+            "a.jpg": create_camera_metadata("NIKON", "D3000", 200, "50.0", "2009:12:23 20:48:38"),
+            "b.jpg": create_camera_metadata("NIKON", "D3000", 400, "35.0", "2009:12:24 10:00:00"),
+            "c.jpg": create_camera_metadata("Canon", "EOS", 100, "50.0", "2010:01:01 09:00:00"),
+            "d.jpg": create_camera_metadata("NIKON", "D3000", 800, "50.0", None),
+            "e.png": {"format": "PNG"},
+        },
+    )
+    store.save_upload(
+        "other_user",
+        TEST_UPLOAD,
+        {"x.jpg": create_camera_metadata("NIKON", "D3000", 200, "50.0", "2009:12:23 20:48:38")},
+    )
+    return store
+
+
+def create_located_metadata(latitude: float, longitude: float) -> dict:
+    return {"format": "JPEG", "gps": {"latitude": latitude, "longitude": longitude}}
+
+
+@pytest.fixture(name="geo_store")
+def geo_store_fixture():
+    store = InMemoryMetadataStore()
+    store.save_upload(
+        TEST_USER,
+        TEST_UPLOAD,
+        {
+            "eiffel.jpg": create_located_metadata(48.8584, 2.2945),
+            "louvre.jpg": create_located_metadata(48.8606, 2.3376),
+            "london.jpg": create_located_metadata(51.5007, -0.1246),
+            "no_gps.jpg": {"format": "JPEG"},
+        },
+    )
+    return store
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"near": (2.2945, 48.8584), "radius": 1000.0}, ["eiffel.jpg"]),
+        ({"near": (2.2945, 48.8584), "radius": 5000.0}, ["eiffel.jpg", "louvre.jpg"]),
+        (
+            {"near": (2.2945, 48.8584), "radius": 400_000.0},
+            ["eiffel.jpg", "london.jpg", "louvre.jpg"],
+        ),
+        ({"bbox": (-1.0, 50.0, 1.0, 52.0)}, ["london.jpg"]),
+        ({"bbox": (2.0, 48.0, 3.0, 49.0)}, ["eiffel.jpg", "louvre.jpg"]),
+        ({"bbox": (10.0, 10.0, 11.0, 11.0)}, []),
+    ],
+)
+def test_in_memory_location_search(geo_store: InMemoryMetadataStore, filters: dict, expected):
+    documents, _ = geo_store.search(TEST_USER, filters)
+    assert sorted(doc["filename"] for doc in documents) == expected
+
+
+def test_location_field():
+    fields = get_search_fields(create_located_metadata(48.8584, 2.2945))
+    assert fields["location"] == {"type": "Point", "coordinates": [2.2945, 48.8584]}
+    assert "location" not in get_search_fields({"format": "JPEG"})
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ({"near": "48.8584,2.2945", "radius": "500"}, {"near": (2.2945, 48.8584), "radius": 500.0}),
+        ({"bbox": "-1,50,1,52"}, {"bbox": (-1.0, 50.0, 1.0, 52.0)}),
+    ],
+)
+def test_parse_location_filters(args: dict, expected: dict):
+    assert parse_search_filters(args) == expected
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"near": "48.8584,2.2945"},
+        {"near": "48.8584,2.2945", "radius": "-1"},
+        {"near": "95,2", "radius": "10"},
+        {"near": "48.8584", "radius": "10"},
+        {"bbox": "1,52,-1,50"},
+        {"bbox": "-1,50,1"},
+        {"bbox": "nan,50,1,52"},
+    ],
+)
+def test_parse_location_filters_invalid(args: dict):
+    with pytest.raises(ValueError):
+        parse_search_filters(args)
+
+
+def test_mongo_location_query():
+    mongo = MagicMock()
+    mongo.collection.return_value.find.return_value = []
+    store = MongoMetadataStore(mongo, "metadata")
+    store.search(TEST_USER, {"near": (2.0, 48.0), "radius": 6378.1, "bbox": (1.0, 47.0, 3.0, 49.0)})
+
+    query = mongo.collection.return_value.find.call_args.args[0]["$and"][0]
+    near, bbox = query["$and"]
+    assert near["location"]["$geoWithin"]["$centerSphere"] == [[2.0, 48.0], pytest.approx(0.001)]
+    assert bbox["location"]["$geoWithin"]["$geometry"]["type"] == "Polygon"
+
+
+def test_get_search_fields():
+    fields = get_search_fields(create_camera_metadata("NIKON\x00", "D3000 ", 200, "50.0", None))
+    assert fields == {
+        "make": "NIKON",
+        "model": "D3000",
+        "lens_model": None,
+        "iso": 200.0,
+        "focal_length": 50.0,
+    }
+
+
+@pytest.mark.parametrize("iso", ["nan", "inf", float("nan"), (float("inf"),)])
+def test_get_search_fields_non_finite(iso):
+    assert (
+        get_search_fields(create_camera_metadata("NIKON", "D3000", iso, None, None))["iso"] is None
+    )
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ({}, {}),
+        ({"make": "NIKON", "unknown": "x"}, {"make": "NIKON"}),
+        ({"iso_min": "100", "focal_length": "50"}, {"iso_min": 100.0, "focal_length": 50.0}),
+        ({"start": "2009-12-23"}, {"start": datetime.datetime(2009, 12, 23)}),
+    ],
+)
+def test_parse_search_filters(args: dict, expected: dict):
+    assert parse_search_filters(args) == expected
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"iso": "high"},
+        {"iso_min": "nan"},
+        {"focal_length_max": "inf"},
+        {"near": "0,0", "radius": "inf"},
+        {"start": "yesterday"},
+        {"start": "2021-01-01T00:00:00Z"},
+        {"end": "2021-01-01T00:00:00+00:00"},
+    ],
+)
+def test_parse_search_filters_invalid(args: dict):
+    with pytest.raises(ValueError):
+        parse_search_filters(args)
+
+
+@pytest.mark.parametrize("value, expected", [(None, 50), ("1", 1), ("500", 500)])
+def test_parse_page_size(value, expected: int):
+    assert parse_page_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "501", "ten"])
+def test_parse_page_size_invalid(value):
+    with pytest.raises(ValueError):
+        parse_page_size(value)
+
+
+@pytest.mark.parametrize(
+    "captured_at, doc_id",
+    [(datetime.datetime(2009, 12, 23, 20, 48, 38), "64b0f0c2a1b2c3d4e5f60718"), (None, "7")],
+)
+def test_cursor_round_trip(captured_at, doc_id: str):
+    assert decode_cursor(encode_cursor(captured_at, doc_id)) == (captured_at, doc_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30=", ""])
+def test_decode_cursor_invalid(cursor: str):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({}, ["d.jpg", "e.png", "a.jpg", "b.jpg", "c.jpg"]),
+        ({"make": "NIKON"}, ["d.jpg", "a.jpg", "b.jpg"]),
+        ({"make": "NIKON", "iso_min": 300.0}, ["d.jpg", "b.jpg"]),
+        ({"focal_length": 50.0}, ["d.jpg", "a.jpg", "c.jpg"]),
+        ({"start": datetime.datetime(2009, 12, 24)}, ["b.jpg", "c.jpg"]),
+        ({"end": datetime.datetime(2009, 12, 31), "iso_max": 300.0}, ["a.jpg"]),
+        ({"model": "Unknown"}, []),
+    ],
+)
+def test_in_memory_search(search_store: InMemoryMetadataStore, filters: dict, expected: list):
+    documents, next_cursor = search_store.search(TEST_USER, filters)
+    assert [doc["filename"] for doc in documents] == expected
+    assert next_cursor is None
+
+
+def test_in_memory_search_pagination(search_store: InMemoryMetadataStore):
+    filenames, cursor = [], None
+    while True:
+        documents, cursor = search_store.search(TEST_USER, {}, limit=2, cursor=cursor)
+        assert len(documents) <= 2
+        filenames.extend(doc["filename"] for doc in documents)
+        if cursor is None:
+            break
+    assert filenames == ["d.jpg", "e.png", "a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_mongo_search_query():
+    mongo = MagicMock()
+    mongo.collection.return_value.find.return_value = []
+    store = MongoMetadataStore(mongo, "metadata")
+    cursor = encode_cursor(datetime.datetime(2009, 12, 23), "64b0f0c2a1b2c3d4e5f60718")
+
+    documents, next_cursor = store.search(
+        TEST_USER, {"make": "NIKON", "iso_min": 100.0}, limit=10, cursor=cursor
+    )
+
+    assert documents == [] and next_cursor is None
+    query = mongo.collection.return_value.find.call_args.args[0]
+    assert query["$and"][0]["user"] == TEST_USER
+    assert query["$and"][0]["make"] == "NIKON"
+    assert query["$and"][0]["$and"] == [{"iso": {"$gte": 100.0}}]
+    assert "$or" in query["$and"][1]
+    assert mongo.collection.return_value.find.call_args.kwargs["limit"] == 11
+
+
+def test_mongo_search_invalid_cursor():
+    store = MongoMetadataStore(MagicMock(), "metadata")
+    with pytest.raises(ValueError):
+        store.search(TEST_USER, {}, cursor=encode_cursor(None, "not-an-object-id"))
+
+
+AWARE_TIME = datetime.datetime(2009, 12, 24, tzinfo=datetime.timezone.utc)
+
+
+def test_in_memory_search_aware_cursor(search_store: InMemoryMetadataStore):
+    with pytest.raises(ValueError):
+        search_store.search(TEST_USER, {}, cursor=encode_cursor(AWARE_TIME, "1"))
+
+
+def test_mongo_search_aware_cursor():
+    mongo = MagicMock()
+    store = MongoMetadataStore(mongo, "metadata")
+    with pytest.raises(ValueError):
+        store.search(TEST_USER, {}, cursor=encode_cursor(AWARE_TIME, "64b0f0c2a1b2c3d4e5f60718"))
+    mongo.collection.return_value.find.assert_not_called()
+
+
+def test_mongo_indexes():
+    mongo_client = MagicMock()
+    store = MongoMetadataStore(MagicMock(db_name="exif"), "metadata")
+    store._ensure_indexes(mongo_client)
+
+    create_index = mongo_client["exif"]["metadata"].create_index
+    indexes = [[key for key, _ in call.args[0]] for call in create_index.call_args_list]
+    sort_key = ["captured_at", "_id"]
+    assert ["user", "model", *sort_key] in indexes
+    assert ["user", *sort_key, "iso"] in indexes
+    assert ["user", *sort_key, "focal_length"] in indexes
+
+
+@pytest.mark.parametrize(
+    "num_images, batch_size, expected_calls",
+    [(0, 2, 0), (1, 2, 1), (4, 2, 2), (5, 2, 3)],
+)
+def test_mongo_save_upload_batches(num_images: int, batch_size: int, expected_calls: int):
+    mongo = MagicMock()
+    store = MongoMetadataStore(mongo, "metadata", batch_size=batch_size)
+    assert store.save_upload(TEST_USER, TEST_UPLOAD, create_metadata(num_images)) == num_images
+
+    insert_many = mongo.collection.return_value.insert_many
+    assert insert_many.call_count == expected_calls
+    assert sum(len(call.args[0]) for call in insert_many.call_args_list) == num_images
+
+
+@pytest.mark.parametrize(
+    "backend, expected",
+    [("mongo", MongoMetadataStore), ("memory", InMemoryMetadataStore)],
+)
+def test_create_metadata_store(backend: str, expected: type):
+    assert isinstance(create_metadata_store(backend, MagicMock(), "metadata"), expected)
+
+
+def test_create_metadata_store_unknown_backend():
+    with pytest.raises(ValueError):
+        create_metadata_store("redis", MagicMock(), "metadata")
+
+
+def test_incomplete_metadata_store_cannot_be_created():
+    class IncompleteMetadataStore(MetadataStore):
+        def get_upload(self, user: str, upload_id: str) -> list[dict]:
+            return []
+
+    with pytest.raises(TypeError):
+        IncompleteMetadataStore()
@@ -0,0 +1,47 @@
+"""
+Unit tests for metrics.py
+"""
+
+import pytest
+
+from utils import metrics
+from utils.metrics import Histogram
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_empty():
+    hist = Histogram(buckets=(1, 10))
+    snapshot = hist.snapshot()
+    assert snapshot["count"] == 0
+    assert snapshot["p50"] == 0.0
+    assert snapshot["buckets"] == {"1": 0, "10": 0, "+Inf": 0}
+
+
+def test_histogram_observe():
+    hist = Histogram(buckets=(1, 10, 100))
+    for value in [0.5, 5, 5, 50, 500]:
+        hist.observe(value)
+
+    snapshot = hist.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["sum"] == 560.5
+    assert snapshot["max"] == 500
+    assert snapshot["buckets"] == {"1": 1, "10": 3, "100": 4, "+Inf": 5}
+    assert hist.quantile(0.5) == 10
+    assert hist.quantile(1.0) == 500
+
+
+def test_histogram_registry():
+    hist = metrics.histogram("test.ms")
+    assert metrics.histogram("test.ms") is hist
+    hist.observe(3)
+    assert metrics.snapshot()["test.ms"]["count"] == 1
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
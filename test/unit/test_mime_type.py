@@ -14,6 +14,10 @@ from utils.mime_type import get_mime_type, MIME_TYPES
         ("test.jpeg", MIME_TYPES["jpeg"]),
         ("test.png", MIME_TYPES["png"]),
         ("test.json", MIME_TYPES["json"]),
+        ("metadata.jsonl", MIME_TYPES["jsonl"]),
+        ("metadata.csv", MIME_TYPES["csv"]),
+        ("metadata.cols", MIME_TYPES["cols"]),
+        ("test_MakerNote.bin", MIME_TYPES["bin"]),
     ],
 )
 def test_get_mime_type_legal(file_path: str, expected_mime_type: str):
@@ -0,0 +1,69 @@
+"""
+Unit tests for mongo_monitoring.py
+"""
+
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils import metrics
+from utils.mongo_monitoring import (
+    CommandLatencyListener,
+    PoolCheckoutListener,
+    create_event_listeners,
+    command_metric,
+    POOL_CHECKOUT_METRIC,
+)
+from utils.request_context import set_request_id
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def create_command_event(command_name: str, duration_ms: float) -> MagicMock:
+    event = MagicMock()
+    event.command_name = command_name
+    event.duration_micros = int(duration_ms * 1000)
+    return event
+
+
+def test_command_latency_recorded():
+    listener = CommandLatencyListener(slow_op_threshold_ms=100)
+    listener.succeeded(create_command_event("find", 2))
+    listener.failed(create_command_event("find", 4))
+    listener.succeeded(create_command_event("insert", 1))
+
+    snapshot = metrics.snapshot()
+    assert snapshot[command_metric("find")]["count"] == 2
+    assert snapshot[command_metric("insert")]["count"] == 1
+
+
+@pytest.mark.parametrize("duration_ms, logged", [(5, False), (100, True), (250, True)])
+def test_slow_command_logged_with_request_id(caplog, duration_ms: float, logged: bool):
+    set_request_id("req-123")
+    listener = CommandLatencyListener(slow_op_threshold_ms=100)
+    with caplog.at_level(logging.WARNING, logger="utils.mongo_monitoring"):
+        listener.succeeded(create_command_event("find", duration_ms))
+
+    assert ("req-123" in caplog.text) == logged
+
+
+def test_pool_checkout_wait_recorded():
+    listener = PoolCheckoutListener()
+    listener.connection_check_out_started(MagicMock())
+    listener.connection_checked_out(MagicMock())
+    # a checked out event without a matching start is ignored
+    listener.connection_checked_out(MagicMock())
+
+    assert metrics.snapshot()[POOL_CHECKOUT_METRIC]["count"] == 1
+
+
+def test_create_event_listeners():
+    listeners = create_event_listeners(50)
+    assert any(isinstance(listener, CommandLatencyListener) for listener in listeners)
+    assert any(isinstance(listener, PoolCheckoutListener) for listener in listeners)
@@ -3,7 +3,7 @@ Unit tests for mongo_utils.py
 """
 
 import os
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from contextlib import nullcontext as does_not_raise
 
 import pytest
@@ -11,17 +11,20 @@ import dotenv
 from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
-from pymongo.errors import ServerSelectionTimeoutError, InvalidOperation
+from pymongo.errors import ServerSelectionTimeoutError, InvalidOperation, DuplicateKeyError
 
 from utils.mongo_utils import (
+    MongoConnection,
     create_mongo_client,
     create_db,
     create_collection,
+    create_user_indexes,
     add_user,
     get_user,
     delete_user,
     close_connection,
     _is_connected_to_server,
+    UserExistsError,
 )
 from exif import DB_NAME, USERS_COLLECTION
 
@@ -101,6 +104,19 @@ def test_add_user(mongo_client, username, password):
     assert USERS_COLLECTION in collection_list
 
 
+def test_create_user_indexes():
+    mock_collection = MagicMock()
+    create_user_indexes(mock_collection)
+    mock_collection.create_index.assert_called_once_with("username", unique=True)
+
+
+def test_add_user_duplicate_raises():
+    mock_collection = MagicMock()
+    mock_collection.insert_one.side_effect = DuplicateKeyError("E11000 duplicate key error")
+    with pytest.raises(UserExistsError):
+        add_user(mock_collection, TEST_USER_1, "test_password")
+
+
 @pytest.mark.parametrize(
     "username",
     [
@@ -118,6 +134,79 @@ def test_delete_user(mongo_client, username):
     assert user is None
 
 
+def test_create_mongo_client_unverified_does_not_block():
+    mongo_client = create_mongo_client(
+        "mongodb://unreachable.invalid:27017", verify_connection=False
+    )
+    assert isinstance(mongo_client, MongoClient)
+    mongo_client.close()
+
+
+def create_mock_app(**config):
+    app = MagicMock()
+    app.config = {"MONGO_URI": MONGO_URL, "DB_NAME": DB_NAME, **config}
+    app.extensions = {}
+    return app
+
+
+def test_mongo_connection_is_lazy():
+    with patch("utils.mongo_utils.create_mongo_client") as mock_create:
+        mongo = MongoConnection(create_mock_app(MONGO_MAX_POOL_SIZE=7, MONGO_MIN_POOL_SIZE=2))
+        mock_create.assert_not_called()
+
+        assert mongo.client is mock_create.return_value
+        assert mongo.client is mock_create.return_value
+        mock_create.assert_called_once_with(
+            MONGO_URL,
+            max_pool_size=7,
+            min_pool_size=2,
+            verify_connection=False,
+            slow_op_threshold_ms=100,
+        )
+
+
+def test_mongo_connection_runs_connect_callbacks_once():
+    callback = MagicMock()
+    with patch("utils.mongo_utils.create_mongo_client") as mock_create:
+        mongo = MongoConnection(create_mock_app())
+        mongo.on_connect(callback)
+        mongo.collection(USERS_COLLECTION)
+        mongo.collection(USERS_COLLECTION)
+        callback.assert_called_once_with(mock_create.return_value)
+
+
+def test_mongo_connection_closes_client_when_callback_fails():
+    callback = MagicMock(side_effect=[ServerSelectionTimeoutError("down"), None])
+    with patch("utils.mongo_utils.create_mongo_client") as mock_create:
+        failed_client, client = MagicMock(), MagicMock()
+        mock_create.side_effect = [failed_client, client]
+        mongo = MongoConnection(create_mock_app())
+        mongo.on_connect(callback)
+
+        with pytest.raises(ServerSelectionTimeoutError):
+            mongo.client
+        failed_client.close.assert_called_once()
+
+        assert mongo.client is client
+        client.close.assert_not_called()
+
+
+def test_mongo_connection_recreates_client_after_fork():
+    with patch("utils.mongo_utils.create_mongo_client") as mock_create, patch(
+        "os.getpid"
+    ) as mock_getpid:
+        mock_create.side_effect = [MagicMock(), MagicMock()]
+        mongo = MongoConnection(create_mock_app())
+        mock_getpid.return_value = 100
+        parent_client = mongo.client
+        mock_getpid.return_value = 101
+        child_client = mongo.client
+
+        assert child_client is not parent_client
+        assert mock_create.call_count == 2
+        parent_client.close.assert_not_called()
+
+
 def test_close_connection():
     mongo_client = create_mongo_client(MONGO_URL)
     assert mongo_client is not None
@@ -0,0 +1,82 @@
+"""
+Unit tests for multipart.py
+"""
+
+from io import BytesIO
+
+import pytest
+
+from utils.multipart import (
+    get_boundary,
+    MultipartReader,
+    MalformedMultipartError,
+    LargeUploadError,
+)
+
+
+BOUNDARY = b"test-boundary"
+
+
+def create_body(parts: list[tuple[str, str | None, bytes]]) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += b"--" + BOUNDARY + b"\r\n"
+        body += f"Content-Disposition: {disposition}\r\n".encode()
+        body += b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
+    return body + b"--" + BOUNDARY + b"--\r\n"
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ("multipart/form-data; boundary=test-boundary", BOUNDARY),
+        ("multipart/form-data", None),
+        ("application/zip", None),
+        (None, None),
+    ],
+)
+def test_get_boundary(content_type, expected):
+    assert get_boundary(content_type) == expected
+
+
+def test_read_parts():
+    body = create_body(
+        [("image", "a.jpg", b"a" * 200000), ("note", None, b"text"), ("image", "b.jpg", b"")]
+    )
+    reader = MultipartReader(BytesIO(body), BOUNDARY, len(body))
+
+    parts = [
+        (part.name, part.filename, part.mimetype, b"".join(part.iter_chunks())) for part in reader
+    ]
+
+    assert parts == [
+        ("image", "a.jpg", "image/jpeg", b"a" * 200000),
+        ("note", None, "image/jpeg", b"text"),
+        ("image", "b.jpg", "image/jpeg", b""),
+    ]
+
+
+def test_unread_parts_are_skipped():
+    body = create_body([("skipped", "a.jpg", b"a" * 200000), ("image", "b.jpg", b"b")])
+    reader = MultipartReader(BytesIO(body), BOUNDARY, len(body))
+
+    parts = list(reader)
+
+    assert [part.filename for part in parts] == ["a.jpg", "b.jpg"]
+
+
+def test_truncated_body():
+    body = create_body([("image", "a.jpg", b"a" * 1000)])[:500]
+    with pytest.raises(MalformedMultipartError):
+        for part in MultipartReader(BytesIO(body), BOUNDARY, len(body)):
+            b"".join(part.iter_chunks())
+
+
+def test_size_limit():
+    body = create_body([("image", "a.jpg", b"a" * 200000)])
+    with pytest.raises(LargeUploadError):
+        for part in MultipartReader(BytesIO(body), BOUNDARY, 100000):
+            b"".join(part.iter_chunks())
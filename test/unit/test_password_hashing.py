@@ -0,0 +1,88 @@
+"""
+Unit tests for password_hashing.py
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from utils.password_hashing import PasswordHasher, HasherBusyError
+
+
+TEST_PASSWORD = "test_password"
+TEST_ROUNDS = 4
+
+
+@pytest.fixture(name="hasher")
+def password_hasher_fixture():
+    app = MagicMock()
+    app.config = {
+        "BCRYPT_LOG_ROUNDS": TEST_ROUNDS,
+        "PASSWORD_HASH_WORKERS": 1,
+        "PASSWORD_HASH_QUEUE_LIMIT": 1,
+    }
+    app.extensions = {}
+    return PasswordHasher(app)
+
+
+def test_hash_and_check(hasher: PasswordHasher):
+    pw_hash = hasher.generate_password_hash(TEST_PASSWORD)
+    assert isinstance(pw_hash, str)
+    assert hasher.check_password_hash(pw_hash, TEST_PASSWORD)
+    assert not hasher.check_password_hash(pw_hash, "wrong_password")
+
+
+def test_hash_uses_configured_rounds(hasher: PasswordHasher):
+    pw_hash = hasher.generate_password_hash(TEST_PASSWORD)
+    assert pw_hash.split("$")[2] == f"{TEST_ROUNDS:02d}"
+    assert not hasher.needs_rehash(pw_hash)
+
+
+@pytest.mark.parametrize(
+    "pw_hash, expected",
+    [
+        ("$2b$04$abcdefghijklmnopqrstuv", False),
+        ("$2b$12$abcdefghijklmnopqrstuv", True),
+        ("$2b$05$abcdefghijklmnopqrstuv", True),
+        ("not_a_hash", True),
+    ],
+)
+def test_needs_rehash(hasher: PasswordHasher, pw_hash: str, expected: bool):
+    assert hasher.needs_rehash(pw_hash) == expected
+
+
+def test_check_invalid_hash_raises(hasher: PasswordHasher):
+    with pytest.raises(ValueError):
+        hasher.check_password_hash("not_a_hash", TEST_PASSWORD)
+
+
+def test_rejects_when_saturated(hasher: PasswordHasher):
+    """
+    With one worker and a queue limit of one, a third concurrent call is rejected.
+    """
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_hash(password, rounds):
+        started.set()
+        release.wait(timeout=5)
+        return b"$2b$04$hash"
+
+    with patch.object(hasher.bcrypt, "generate_password_hash", side_effect=slow_hash):
+        threads = [
+            threading.Thread(target=hasher.generate_password_hash, args=(TEST_PASSWORD,))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        started.wait(timeout=5)
+
+        with pytest.raises(HasherBusyError):
+            hasher.generate_password_hash(TEST_PASSWORD)
+
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    assert hasher.check_password_hash(hasher.generate_password_hash(TEST_PASSWORD), TEST_PASSWORD)
@@ -0,0 +1,128 @@
+"""
+Unit tests for result_store.py
+"""
+
+import datetime
+import threading
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from utils.result_store import (
+    create_result_store,
+    GridFSResultStore,
+    InMemoryResultStore,
+    ResultStore,
+)
+
+
+TEST_USER = "test_user"
+TEST_UPLOAD_ID = "upload-1"
+TEST_DATA = b"zipped images"
+
+
+def test_in_memory_save_and_open():
+    store = InMemoryResultStore()
+    assert store.open(TEST_USER, TEST_UPLOAD_ID) is None
+
+    store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+    stream, length = store.open(TEST_USER, TEST_UPLOAD_ID)
+    assert length == len(TEST_DATA)
+    assert stream.read() == TEST_DATA
+
+
+def test_in_memory_results_are_per_user():
+    store = InMemoryResultStore()
+    store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+    assert store.open("other_user", TEST_UPLOAD_ID) is None
+
+
+def test_in_memory_result_is_stored_in_background():
+    store = InMemoryResultStore()
+    with patch.object(store, "_save", wraps=store._save) as save:
+        store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+        store.flush()
+    save.assert_called_once()
+    assert store._pending == {}
+    stream, _ = store.open(TEST_USER, TEST_UPLOAD_ID)
+    assert stream.read() == TEST_DATA
+
+
+def test_pending_result_is_served_until_stored():
+    store = InMemoryResultStore()
+    stored = threading.Event()
+    with patch.object(store, "_save", side_effect=lambda *args: stored.wait(timeout=5)):
+        store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+        stream, length = store.open(TEST_USER, TEST_UPLOAD_ID)
+        stored.set()
+        store.flush()
+    assert length == len(TEST_DATA)
+    assert stream.read() == TEST_DATA
+
+
+def test_failed_save_is_not_served():
+    store = InMemoryResultStore()
+    with patch.object(store, "_save", side_effect=OSError("disk full")):
+        store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+        store.flush()
+    assert store.open(TEST_USER, TEST_UPLOAD_ID) is None
+
+
+def test_in_memory_expired_results_are_purged():
+    store = InMemoryResultStore(ttl=datetime.timedelta(seconds=-1))
+    store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+    assert store.open(TEST_USER, TEST_UPLOAD_ID) is None
+    store.flush()
+    assert store.purge_expired() == 1
+
+
+def test_expired_results_are_purged_in_background():
+    store = InMemoryResultStore(purge_interval_s=0.05)
+    purged = threading.Event()
+    with patch.object(store, "purge_expired", side_effect=lambda: purged.set() or 0):
+        store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+        assert purged.wait(timeout=5)
+
+
+def test_gridfs_save_stores_owner_and_expiry():
+    mongo = MagicMock()
+    store = GridFSResultStore(mongo, "results", purge_interval_s=3600)
+    with patch("utils.result_store.GridFSBucket") as bucket:
+        store.save(TEST_USER, TEST_UPLOAD_ID, BytesIO(TEST_DATA))
+        store.flush()
+
+    (
+        _,
+        data,
+    ) = bucket.return_value.upload_from_stream.call_args.args
+    metadata = bucket.return_value.upload_from_stream.call_args.kwargs["metadata"]
+    assert data.read() == TEST_DATA
+    assert metadata["user"] == TEST_USER
+    assert metadata["upload_id"] == TEST_UPLOAD_ID
+    assert metadata["expires_at"] > datetime.datetime.utcnow()
+
+
+def test_gridfs_purge_deletes_files_with_chunks():
+    mongo = MagicMock()
+    mongo.db.__getitem__.return_value.find.return_value = [{"_id": 1}, {"_id": 2}]
+    store = GridFSResultStore(mongo, "results")
+    with patch("utils.result_store.GridFSBucket") as bucket:
+        assert store.purge_expired() == 2
+
+    deleted = [call.args[0] for call in bucket.return_value.delete.call_args_list]
+    assert deleted == [1, 2]
+
+
+def test_create_result_store_unknown_backend():
+    with pytest.raises(ValueError):
+        create_result_store("unknown", MagicMock(), "results")
+
+
+def test_incomplete_result_store_cannot_be_created():
+    class IncompleteResultStore(ResultStore):
+        def open(self, user: str, upload_id: str):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteResultStore(datetime.timedelta(minutes=1), 60)
@@ -0,0 +1,98 @@
+"""
+Unit tests for resumable_upload.py
+"""
+
+import os
+import shutil
+from io import BytesIO
+
+import pytest
+
+from utils.constants import UPLOAD_FOLDER
+from utils.resumable_upload import (
+    create_session,
+    get_session,
+    write_chunk,
+    finalize_session,
+    delete_session,
+    SessionNotFoundError,
+    InvalidSessionError,
+    OffsetMismatchError,
+    IncompleteUploadError,
+)
+
+
+TEST_SESSION_ID = "test-resumable-session"
+TEST_USER = "test_user"
+TEST_DATA = b"0123456789"
+SIZE_LIMIT = 100
+CHUNK_LIMIT = 6
+
+
+@pytest.fixture(name="session")
+def create_test_session():
+    session = create_session(TEST_SESSION_ID, TEST_USER, len(TEST_DATA), SIZE_LIMIT)
+    yield session
+    shutil.rmtree(os.path.join(UPLOAD_FOLDER, TEST_SESSION_ID), ignore_errors=True)
+
+
+def write(offset: int, data: bytes) -> int:
+    return write_chunk(TEST_SESSION_ID, TEST_USER, offset, BytesIO(data), len(data), CHUNK_LIMIT)
+
+
+def test_create_session(session: dict):
+    assert session["offset"] == 0
+    assert get_session(TEST_SESSION_ID, TEST_USER) == session
+
+
+@pytest.mark.parametrize("size", [0, -1, SIZE_LIMIT + 1])
+def test_create_session_invalid_size(size: int):
+    with pytest.raises(InvalidSessionError):
+        create_session(TEST_SESSION_ID, TEST_USER, size, SIZE_LIMIT)
+
+
+def test_write_chunks_and_finalize(session: dict):
+    assert write(0, TEST_DATA[:5]) == 5
+    assert get_session(TEST_SESSION_ID, TEST_USER)["offset"] == 5
+    assert write(5, TEST_DATA[5:]) == len(TEST_DATA)
+
+    _, _, zip_path = finalize_session(TEST_SESSION_ID, TEST_USER)
+    with open(zip_path, "rb") as f:
+        assert f.read() == TEST_DATA
+
+    with pytest.raises(SessionNotFoundError):
+        finalize_session(TEST_SESSION_ID, TEST_USER)
+
+
+def test_write_chunk_offset_mismatch(session: dict):
+    write(0, TEST_DATA[:5])
+    with pytest.raises(OffsetMismatchError) as e:
+        write(0, TEST_DATA[:5])
+    assert e.value.expected_offset == 5
+
+
+@pytest.mark.parametrize("offset, data", [(0, TEST_DATA), (8, b"abc")])
+def test_write_chunk_too_large(session: dict, offset: int, data: bytes):
+    with pytest.raises(InvalidSessionError):
+        write(offset, data)
+
+
+def test_finalize_incomplete(session: dict):
+    write(0, TEST_DATA[:5])
+    with pytest.raises(IncompleteUploadError):
+        finalize_session(TEST_SESSION_ID, TEST_USER)
+
+
+def test_session_of_other_user(session: dict):
+    with pytest.raises(SessionNotFoundError):
+        get_session(TEST_SESSION_ID, "other_user")
+
+
+def test_invalid_session_id():
+    with pytest.raises(SessionNotFoundError):
+        get_session("../escape", TEST_USER)
+
+
+def test_delete_session(session: dict):
+    delete_session(TEST_SESSION_ID, TEST_USER)
+    assert not os.path.exists(os.path.join(UPLOAD_FOLDER, TEST_SESSION_ID))
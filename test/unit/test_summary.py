@@ -0,0 +1,85 @@
+"""
+Unit tests for utils.summary.py
+"""
+
+import json
+import os
+
+import pytest
+
+from utils.summary import UploadSummary, _camera_name
+
+
+def create_metadata(
+    make: str = None, model: str = None, iso=None, captured: str = None, gps: tuple = None
+) -> dict:
+    exif = {}
+    if make is not None:
+        exif["Make"] = make
+    if model is not None:
+        exif["Model"] = model
+    if iso is not None:
+        exif["ISOSpeedRatings"] = iso
+    if captured is not None:
+        exif["DateTimeOriginal"] = captured
+    metadata = {"format": "JPEG", "mode": "RGB", "size": (10, 10), "exif": exif}
+    if gps is not None:
+        metadata["gps"] = {"latitude": gps[0], "longitude": gps[1]}
+    return metadata
+
+
+def test_summary():
+    summary = UploadSummary()
+    summary.add(create_metadata("NIKON CORPORATION", "NIKON D750", 200, "2020:05:01 10:00:00"))
+    summary.add(
+        create_metadata("Canon", "EOS R5", 100, "2019:01:01 00:00:00", gps=(-33.86, 151.21))
+    )
+    summary.add(create_metadata("NIKON CORPORATION", "NIKON D750", "200", gps=(51.5, -0.12)))
+    summary.add(create_metadata(iso=(1600, 3200), captured="not a date"))
+    summary.add({"format": "PNG", "mode": "RGBA", "size": (1, 1)})
+
+    assert summary.images == 5
+    assert summary.to_dict() == {
+        "images": 5,
+        "cameras": {"NIKON D750": 2, "Canon EOS R5": 1},
+        "iso": {"100": 1, "200": 2, "1600": 1},
+        "captured": {"images": 2, "first": "2019-01-01T00:00:00", "last": "2020-05-01T10:00:00"},
+        "gps": {"images": 2, "bbox": [-0.12, -33.86, 151.21, 51.5]},
+    }
+
+
+def test_summary_skips_non_finite_iso():
+    summary = UploadSummary()
+    for iso in ("nan", "inf", "-Infinity", 400):
+        summary.add(create_metadata(iso=iso))
+    assert summary.to_dict()["iso"] == {"400": 1}
+
+
+def test_empty_summary(tmp_path):
+    summary = UploadSummary()
+    file_path = os.path.join(tmp_path, "summary.json")
+    summary.write(file_path)
+
+    with open(file_path) as f:
+        assert json.load(f) == {
+            "images": 0,
+            "cameras": {},
+            "iso": {},
+            "captured": {"images": 0, "first": None, "last": None},
+            "gps": {"images": 0, "bbox": None},
+        }
+
+
+@pytest.mark.parametrize(
+    "make, model, expected",
+    [
+        ("NIKON CORPORATION", "NIKON D750", "NIKON D750"),
+        ("Canon", "Canon EOS R5", "Canon EOS R5"),
+        ("SONY", "ILCE-7M3", "SONY ILCE-7M3"),
+        (None, "ILCE-7M3", "ILCE-7M3"),
+        ("SONY", None, "SONY"),
+        (None, None, None),
+    ],
+)
+def test_camera_name(make: str, model: str, expected: str):
+    assert _camera_name(make, model) == expected
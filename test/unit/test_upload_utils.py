@@ -5,28 +5,26 @@ Unit tests for upload_utils.py.
 import os
 import io
 import shutil
-import zipfile
 from contextlib import nullcontext as does_not_raise
-from unittest.mock import patch
 
 import pytest
 
 from werkzeug.datastructures import FileStorage
-from test.testing_utils import (
-    create_text_files,
-    create_image_files,
-    create_mixed_files,
-    create_file_of_size,
-)
+from test.testing_utils import create_file_of_size
 from utils.upload_utils import (
     save_file,
+    save_stream,
     check_zip_size,
-    validate_zip_contents,
+    validate_image_filename,
+    validate_image_content,
+    validate_image_file,
+    validate_image_stream,
     create_temp_folder,
     _sanitize_filename,
     InvalidFileError,
     LargeZipError,
     CreateTempFolderError,
+    SaveFileError,
     SaveZipFileError,
 )
 
@@ -82,6 +80,103 @@ def test_save_file_no_folder():
         save_file(file, TEST_FOLDER)
 
 
+def test_save_stream():
+    """
+    Tests that save_stream saves streamed data under the sanitized filename, without
+    overwriting existing files.
+    """
+    os.mkdir(TEST_FOLDER)
+    try:
+        first = save_stream([b"test", b"ing"], "../test file.jpg", TEST_FOLDER)
+        second = save_stream([b"other"], "../test file.jpg", TEST_FOLDER)
+        assert first == os.path.join(TEST_FOLDER, "testfile.jpg")
+        assert second == os.path.join(TEST_FOLDER, "testfile_1.jpg")
+        with open(first, "rb") as f:
+            assert f.read() == b"testing"
+    finally:
+        shutil.rmtree(TEST_FOLDER)
+
+
+def test_save_stream_no_folder():
+    """
+    Tests that save_stream raises an error if the folder does not exist.
+    """
+    with pytest.raises(SaveFileError):
+        save_stream([b"testing"], "test_file.jpg", TEST_FOLDER)
+
+
+@pytest.mark.parametrize(
+    "filename, err",
+    [
+        ("image.jpg", does_not_raise()),
+        ("image.png", does_not_raise()),
+        ("image.exe", pytest.raises(InvalidFileError)),
+        ("image", pytest.raises(InvalidFileError)),
+    ],
+)
+def test_validate_image_filename(filename: str, err):
+    """
+    Tests that validate_image_filename only accepts image file extensions.
+    """
+    with err:
+        validate_image_filename(filename)
+
+
+@pytest.mark.parametrize(
+    "filename, header, err",
+    [
+        ("image.jpg", b"\xff\xd8\xff\xe1Exif", does_not_raise()),
+        ("image.JPEG", b"\xff\xd8\xff\xdb", does_not_raise()),
+        ("image.png", b"\x89PNG\r\n\x1a\n\x00", does_not_raise()),
+        ("image.png", b"\xff\xd8\xff\xe0", pytest.raises(InvalidFileError)),
+        ("image.jpg", b"testing", pytest.raises(InvalidFileError)),
+        ("image.jpg", b"", pytest.raises(InvalidFileError)),
+        ("image.exe", b"\xff\xd8\xff", pytest.raises(InvalidFileError)),
+    ],
+)
+def test_validate_image_content(filename: str, header: bytes, err):
+    """
+    Tests that validate_image_content only accepts files starting with the signature of their
+    extension's image format.
+    """
+    with err:
+        validate_image_content(filename, header)
+
+
+def test_validate_image_stream():
+    """
+    Tests that validate_image_stream validates data split over chunks, reads only the chunks
+    needed for validation, and returns the complete data.
+    """
+    chunks = [b"\x89PN", b"G\r\n", b"\x1a\n\x00\x00", b"rest"]
+    read = []
+    stream = validate_image_stream((read.append(chunk) or chunk for chunk in chunks), "a.png")
+    assert len(read) == 3
+    assert b"".join(stream) == b"".join(chunks)
+
+    with pytest.raises(InvalidFileError):
+        validate_image_stream([b"\x89PN", b"testing"], "a.png")
+    with pytest.raises(InvalidFileError):
+        validate_image_stream([], "a.jpg")
+
+
+@pytest.mark.parametrize(
+    "filename, header, err",
+    [
+        ("image.jpg", b"\xff\xd8\xff\xe1Exif", does_not_raise()),
+        ("image.JPEG", b"\xff\xd8\xff\xdb", pytest.raises(InvalidFileError)),
+        ("image.png", b"\xff\xd8\xff\xe0", pytest.raises(InvalidFileError)),
+        ("notes.txt", b"\xff\xd8\xff\xe0", pytest.raises(InvalidFileError)),
+    ],
+)
+def test_validate_image_file(filename: str, header: bytes, err):
+    """
+    Tests that validate_image_file checks both the extension and the content of a file.
+    """
+    with err:
+        validate_image_file(filename, header)
+
+
 @pytest.mark.parametrize(
     "file_size, err",
     [
@@ -123,56 +218,6 @@ def test_create_temp_folder_raises():
     shutil.rmtree(base_folder)
 
 
-@pytest.mark.parametrize(
-    "create_files, num_files, err",
-    [
-        (create_text_files, 0, does_not_raise()),
-        (create_image_files, 0, does_not_raise()),
-        (create_mixed_files, 0, does_not_raise()),
-        (create_image_files, 1, does_not_raise()),
-        (create_text_files, 1, pytest.raises(InvalidFileError)),
-        (create_mixed_files, 1, pytest.raises(InvalidFileError)),
-    ],
-)
-def test_validate_zip_contents(create_files, num_files: int, err):
-    """
-    Tests that validate_zip_contents correctly validates a zipfile.
-    """
-    os.mkdir(TEST_FOLDER)
-
-    try:
-        create_files(num_files, TEST_FOLDER)
-
-        zip_file = io.BytesIO()
-        with zipfile.ZipFile(zip_file, "w") as zip:
-            for file in os.listdir(TEST_FOLDER):
-                zip.write(os.path.join(TEST_FOLDER, file), file)
-
-        zip_file.seek(0)
-
-        with err:
-            validate_zip_contents(zip_file)
-
-        zip_file.close()
-    finally:
-        shutil.rmtree(TEST_FOLDER)
-
-
-def test_validate_bad_zipfile():
-    """
-    Tests that validate_zip_contents correctly validates a zipfile.
-    """
-    os.mkdir(TEST_FOLDER)
-    try:
-        with patch('zipfile.ZipFile', side_effect=zipfile.BadZipFile()):
-            corrupted_zip_file = io.BytesIO(b"Corrupted Zip Data")
-
-            with pytest.raises(zipfile.BadZipFile):
-                validate_zip_contents(corrupted_zip_file)
-    finally:
-        shutil.rmtree(TEST_FOLDER)
-
-
 @pytest.mark.parametrize(
     "filename, expected",
     [
@@ -0,0 +1,110 @@
+"""
+Unit tests for user_store.py
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from models.users import USERNAME_FIELD, PASSWORD_FIELD, UserExistsError
+from utils.user_store import (
+    create_user_store,
+    InMemoryUserStore,
+    MongoUserStore,
+    UserStore,
+)
+
+
+TEST_USER = "test_user"
+TEST_PASSWORD = "test_password"
+
+
+def test_in_memory_add_get_delete():
+    store = InMemoryUserStore()
+    assert store.get_user(TEST_USER) is None
+
+    store.add_user(TEST_USER, TEST_PASSWORD)
+    user = store.get_user(TEST_USER)
+    assert user[USERNAME_FIELD] == TEST_USER
+    assert user[PASSWORD_FIELD] == TEST_PASSWORD
+
+    store.delete_user(TEST_USER)
+    assert store.get_user(TEST_USER) is None
+
+
+def test_in_memory_usernames_are_unique():
+    store = InMemoryUserStore()
+    store.add_user(TEST_USER, TEST_PASSWORD)
+    with pytest.raises(UserExistsError):
+        store.add_user(TEST_USER, "other_password")
+    assert store.get_user(TEST_USER)[PASSWORD_FIELD] == TEST_PASSWORD
+
+
+def test_in_memory_get_user_returns_copy():
+    store = InMemoryUserStore()
+    store.add_user(TEST_USER, TEST_PASSWORD)
+    store.get_user(TEST_USER)[PASSWORD_FIELD] = "tampered"
+    assert store.get_user(TEST_USER)[PASSWORD_FIELD] == TEST_PASSWORD
+
+
+def test_in_memory_update_password():
+    store = InMemoryUserStore()
+    store.add_user(TEST_USER, TEST_PASSWORD)
+    store.update_password(TEST_USER, "new_password")
+    assert store.get_user(TEST_USER)[PASSWORD_FIELD] == "new_password"
+
+    store.update_password("missing_user", "new_password")
+    assert store.get_user("missing_user") is None
+
+
+def test_in_memory_delete_missing_user():
+    store = InMemoryUserStore()
+    store.delete_user(TEST_USER)
+
+
+def test_mongo_store_delegates_to_collection():
+    mongo = MagicMock()
+    store = MongoUserStore(mongo, "users")
+    mongo.on_connect.assert_called_once()
+
+    with patch("utils.user_store.add_user") as mock_add, patch(
+        "utils.user_store.get_user"
+    ) as mock_get, patch("utils.user_store.update_user_password") as mock_update, patch(
+        "utils.user_store.delete_user"
+    ) as mock_delete:
+        store.add_user(TEST_USER, TEST_PASSWORD)
+        store.get_user(TEST_USER)
+        store.update_password(TEST_USER, "new_password")
+        store.delete_user(TEST_USER)
+
+    collection = mongo.collection.return_value
+    mongo.collection.assert_called_with("users")
+    mock_add.assert_called_once_with(collection, TEST_USER, TEST_PASSWORD)
+    mock_get.assert_called_once_with(collection, TEST_USER)
+    mock_update.assert_called_once_with(collection, TEST_USER, "new_password")
+    mock_delete.assert_called_once_with(collection, TEST_USER)
+
+
+@pytest.mark.parametrize(
+    "backend, expected",
+    [
+        ("mongo", MongoUserStore),
+        ("memory", InMemoryUserStore),
+    ],
+)
+def test_create_user_store(backend: str, expected: type):
+    assert isinstance(create_user_store(backend, MagicMock(), "users"), expected)
+
+
+def test_create_user_store_unknown_backend():
+    with pytest.raises(ValueError):
+        create_user_store("redis", MagicMock(), "users")
+
+
+def test_incomplete_user_store_cannot_be_created():
+    class IncompleteUserStore(UserStore):
+        def get_user(self, username: str) -> dict | None:
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteUserStore()
@@ -0,0 +1,179 @@
+"""
+Unit tests for workspace.py
+"""
+
+import os
+import subprocess
+import sys
+import shutil
+import time
+import uuid
+from collections import namedtuple
+
+import pytest
+from flask import Flask
+
+from utils.workspace import WorkspaceManager, WorkspaceQuotaError, InsufficientSpaceError
+from utils.workspace import OWNER_FILE, PROCESSES_FOLDER, RESERVATIONS_FOLDER
+
+
+@pytest.fixture(name="workspaces")
+def create_workspaces(tmp_path) -> WorkspaceManager:
+    app = Flask(__name__)
+    app.config.update(
+        WORKSPACE_ROOT=str(tmp_path),
+        WORKSPACE_QUOTA_MB=1,
+        WORKSPACE_SESSION_TTL_MINS=60,
+        WORKSPACE_SWEEP_INTERVAL_S=3600,
+        WORKSPACE_DISK_HEADROOM_MB=1,
+    )
+    return WorkspaceManager(app)
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_create_records_owner(workspaces: WorkspaceManager):
+    base_folder, imgs_folder = workspaces.create("req")
+    assert os.path.isdir(imgs_folder)
+    with open(os.path.join(base_folder, OWNER_FILE)) as f:
+        pid, boot_token = f.read().split(" ")
+    assert int(pid) == os.getpid()
+    with open(os.path.join(workspaces.root, PROCESSES_FOLDER, pid)) as f:
+        assert f.read() == boot_token
+
+
+def test_release_deletes_in_background(workspaces: WorkspaceManager):
+    base_folder, _ = workspaces.create("req")
+    workspaces.release(base_folder)
+    assert not os.path.exists(base_folder)
+
+    # the name can be reused at once, while the old folder is deleted in the background
+    workspaces.create("req")
+    deadline = time.monotonic() + 5
+    while os.listdir(os.path.join(workspaces.root, ".trash")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.listdir(os.path.join(workspaces.root, ".trash")) == []
+
+
+def test_sweep_orphaned_workspaces(workspaces: WorkspaceManager):
+    live_folder, _ = workspaces.create("live")
+    orphan_folder, _ = workspaces.create("orphan")
+    with open(os.path.join(orphan_folder, OWNER_FILE), "w") as f:
+        f.write(str(dead_pid()))
+
+    assert workspaces.sweep() == 1
+    assert os.path.exists(live_folder)
+    assert not os.path.exists(orphan_folder)
+
+
+def test_sweep_workspaces_of_earlier_process_with_same_pid(workspaces: WorkspaceManager):
+    live_folder, _ = workspaces.create("live")
+    earlier_folder, _ = workspaces.create("earlier")
+    # e.g. left behind by a worker of a previous container run that had the same pid
+    with open(os.path.join(earlier_folder, OWNER_FILE), "w") as f:
+        f.write(f"{os.getpid()} {uuid.uuid4().hex}")
+    ledger = os.path.join(workspaces.root, RESERVATIONS_FOLDER)
+    with open(os.path.join(ledger, f"{os.getpid()}-{uuid.uuid4().hex}-abc"), "w") as f:
+        f.write("1500000")
+
+    assert workspaces.sweep() == 1
+    assert os.path.exists(live_folder)
+    assert not os.path.exists(earlier_folder)
+    assert not [name for name in os.listdir(ledger) if not name.startswith(".")]
+
+
+def test_sweep_expired_sessions(workspaces: WorkspaceManager):
+    active = os.path.join(workspaces.root, "active-session")
+    expired = os.path.join(workspaces.root, "expired-session")
+    for folder in (active, expired):
+        os.makedirs(folder)
+        with open(os.path.join(folder, "upload.zip"), "wb") as f:
+            f.write(b"data")
+    old = time.time() - 2 * 3600
+    os.utime(os.path.join(expired, "upload.zip"), (old, old))
+    os.utime(expired, (old, old))
+
+    assert workspaces.sweep() == 1
+    assert os.path.exists(active)
+    assert not os.path.exists(expired)
+
+
+def test_quota(workspaces: WorkspaceManager):
+    base_folder, imgs_folder = workspaces.create("req")
+    with open(os.path.join(imgs_folder, "large.jpg"), "wb") as f:
+        f.write(b"0" * 1000000)
+
+    workspaces.sweep()
+    assert workspaces.usage > 1000000
+    with pytest.raises(WorkspaceQuotaError):
+        workspaces.create("other")
+
+
+def test_quota_counts_writes_since_sweep(workspaces: WorkspaceManager):
+    workspaces.sweep()
+    for req_id in ("first", "second"):
+        base_folder, imgs_folder = workspaces.create(req_id)
+        with workspaces.reserve(600000):
+            with open(os.path.join(imgs_folder, "image.jpg"), "wb") as f:
+                f.write(b"0" * 600000)
+
+    assert workspaces.usage == 0
+    with pytest.raises(WorkspaceQuotaError):
+        workspaces.create("third")
+
+    # once swept, the written bytes are counted by the measured usage instead
+    workspaces.release(base_folder)
+    time.sleep(0.01)
+    workspaces.sweep()
+    assert 600000 < workspaces.usage < 1000000
+    workspaces.create("third")
+
+
+def test_quota_counts_reservations(workspaces: WorkspaceManager):
+    workspaces.create("req")
+    with workspaces.reserve(1000000):
+        with pytest.raises(WorkspaceQuotaError):
+            workspaces.check_quota()
+    # released bytes count until a sweep measures what was written
+    with pytest.raises(WorkspaceQuotaError):
+        workspaces.check_quota()
+    time.sleep(0.01)
+    workspaces.sweep()
+    workspaces.check_quota()
+
+
+@pytest.fixture(name="free_space")
+def patch_free_space(monkeypatch):
+    usage = namedtuple("usage", "total used free")
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: usage(10000000, 7000000, 3000000))
+
+
+def test_reserve(workspaces: WorkspaceManager, free_space):
+    # 3 MB free less 1 MB headroom
+    first = workspaces.reserve(1500000)
+    with pytest.raises(InsufficientSpaceError):
+        workspaces.reserve(1000000)
+    with pytest.raises(InsufficientSpaceError):
+        workspaces.check_space(1000000)
+
+    first.release()
+    with workspaces.reserve(2000000):
+        pass
+    workspaces.check_space(2000000)
+
+
+def test_sweep_dead_reservations(workspaces: WorkspaceManager, free_space):
+    ledger = os.path.join(workspaces.root, RESERVATIONS_FOLDER)
+    workspaces.reserve(500000)
+    with open(os.path.join(ledger, f"{dead_pid()}-abc"), "w") as f:
+        f.write("1500000")
+    with pytest.raises(InsufficientSpaceError):
+        workspaces.check_space(1000000)
+
+    workspaces.sweep()
+    workspaces.check_space(1000000)
+    assert len([name for name in os.listdir(ledger) if not name.startswith(".")]) == 1
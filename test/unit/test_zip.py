@@ -10,8 +10,9 @@ from io import BytesIO
 from contextlib import nullcontext as does_not_raise
 
 from test.testing_utils import create_text_files, create_image_files, create_mixed_files
-from utils.zip import zip_files, unzip_file
+from utils.zip import zip_files, unzip_file, get_uncompressed_size
 from utils.zip import ZipError, UnzipError
+from utils.upload_utils import validate_image_content, validate_image_file, InvalidFileError
 
 
 TEST_FILES_FOLDER = "test_zip"
@@ -176,3 +177,75 @@ def test_unzip_sanitization(file_names: list[str], expected: list[str]):
         raise e
     finally:
         shutil.rmtree(TEST_FILES_FOLDER)
+
+
+def test_unzip_manifest(tmp_path):
+    """
+    Test that unzip_file returns the extracted files, renames members whose sanitized names
+    collide, skips directories and restricts permissions.
+    """
+    zip_path = os.path.join(tmp_path, "test.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("dir/", b"")
+        zip_ref.writestr("dir/a b.jpg", b"first")
+        zip_ref.writestr("ab.jpg", b"second")
+        info = zipfile.ZipInfo("run.sh")
+        info.external_attr = 0o755 << 16
+        zip_ref.writestr(info, b"#!/bin/sh")
+
+    extract_dir = os.path.join(tmp_path, ZIP_EXTRACTION_FOLDER)
+    paths = unzip_file(zip_path, extract_dir)
+
+    assert [os.path.relpath(path, extract_dir) for path in paths] == [
+        "ab.jpg",
+        "ab_1.jpg",
+        "run.sh",
+    ]
+    assert sorted(os.listdir(extract_dir)) == ["ab.jpg", "ab_1.jpg", "run.sh"]
+    with open(paths[1], "rb") as f:
+        assert f.read() == b"second"
+    for path in paths:
+        assert os.stat(path).st_mode & 0o777 == 0o644
+
+
+def test_unzip_validate(tmp_path):
+    """
+    Test that unzip_file stops at the first member rejected by the validate callback.
+    """
+    zip_path = os.path.join(tmp_path, "test.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("valid.jpg", b"\xff\xd8\xff\xe0data")
+        zip_ref.writestr("renamed.jpg", b"MZ\x90\x00")
+        zip_ref.writestr("later.jpg", b"\xff\xd8\xff\xe0data")
+
+    extract_dir = os.path.join(tmp_path, ZIP_EXTRACTION_FOLDER)
+    with pytest.raises(InvalidFileError):
+        unzip_file(zip_path, extract_dir, validate_image_content)
+    assert os.listdir(extract_dir) == ["valid.jpg"]
+
+
+@pytest.mark.parametrize("create_files", [create_text_files, create_mixed_files])
+def test_unzip_validate_non_images(tmp_path, create_files):
+    """
+    Test that unzip_file with validate_image_file rejects members without an image extension.
+    """
+    files_dir = os.path.join(tmp_path, TEST_FILES_FOLDER)
+    os.mkdir(files_dir)
+    create_files(1, files_dir)
+    zip_path = os.path.join(tmp_path, "test.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        for file in os.listdir(files_dir):
+            zip_ref.write(os.path.join(files_dir, file), file)
+
+    with pytest.raises(InvalidFileError):
+        unzip_file(zip_path, os.path.join(tmp_path, ZIP_EXTRACTION_FOLDER), validate_image_file)
+
+
+def test_get_uncompressed_size(tmp_path):
+    zip_path = os.path.join(tmp_path, "test.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr("a.txt", b"0" * 100000)
+        zip_ref.writestr("b.txt", b"1" * 2345)
+
+    assert get_uncompressed_size(zip_path) == 102345
+    assert os.path.getsize(zip_path) < 102345
@@ -0,0 +1,221 @@
+"""
+Admission control for expensive requests.
+
+Each admitted request holds one in-flight slot and a share of an in-flight byte budget until it
+completes. Requests that do not fit wait in a short FIFO queue; when the queue is full or the
+wait times out they are rejected with a retry delay estimated from recent throughput, instead
+of letting every thread unzip and decode at once.
+
+Classes:
+    AdmissionController: Flask extension limiting in-flight requests and bytes
+
+Exceptions:
+    AdmissionRejectedError(Exception)
+"""
+
+import collections
+import contextlib
+import math
+import os
+import threading
+import time
+from typing import Iterator
+
+from utils import metrics
+
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_IN_FLIGHT_BYTES = 400 * 1000000
+DEFAULT_QUEUE_LIMIT = 16
+DEFAULT_QUEUE_TIMEOUT_S = 5.0
+
+# bounds of the Retry-After estimate, and the value used before any request completed
+MIN_RETRY_AFTER_S = 1
+MAX_RETRY_AFTER_S = 60
+DEFAULT_RETRY_AFTER_S = 5
+# completions older than this are not used to estimate throughput
+THROUGHPUT_WINDOW_S = 60.0
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Exception raised when a request cannot be admitted.
+
+    Attributes:
+        retry_after (int): seconds after which the client should retry
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class AdmissionController:
+    """
+    Limits the number of in-flight requests and the sum of their sizes.
+
+    A request larger than the whole byte budget is admitted once nothing else is in flight, so
+    it cannot wait forever. Waiting requests are admitted in arrival order. Fast lane requests,
+    i.e. small ones, only need room in the byte budget, so they are not held up by the count of
+    large requests in flight.
+    """
+
+    def __init__(self, app=None, name: str = "upload"):
+        """
+        Args:
+            app (Flask): Flask app to read the budgets from
+            name (str): name of the controlled requests, used as prefix of the config keys
+                (<NAME>_MAX_IN_FLIGHT, <NAME>_MAX_IN_FLIGHT_MB, <NAME>_ADMISSION_QUEUE_LIMIT,
+                <NAME>_ADMISSION_TIMEOUT_S) and of the exported metrics
+        """
+        self.name = name
+        self.max_in_flight = DEFAULT_MAX_IN_FLIGHT
+        self.max_in_flight_bytes = DEFAULT_MAX_IN_FLIGHT_BYTES
+        self.queue_limit = DEFAULT_QUEUE_LIMIT
+        self.queue_timeout_s = DEFAULT_QUEUE_TIMEOUT_S
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Reads the budgets from the app config.
+
+        Args:
+            app (Flask): Flask app whose config may define the budgets
+        """
+        prefix = self.name.upper()
+        self.max_in_flight = app.config.get(f"{prefix}_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)
+        max_in_flight_mb = app.config.get(f"{prefix}_MAX_IN_FLIGHT_MB")
+        if max_in_flight_mb is not None:
+            self.max_in_flight_bytes = max_in_flight_mb * 1000000
+        self.queue_limit = app.config.get(f"{prefix}_ADMISSION_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+        self.queue_timeout_s = app.config.get(
+            f"{prefix}_ADMISSION_TIMEOUT_S", DEFAULT_QUEUE_TIMEOUT_S
+        )
+        app.extensions[f"{self.name}_admission"] = self
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        self._queue = collections.deque()
+        self._queued_bytes = 0
+        self._completions = collections.deque()
+
+    @contextlib.contextmanager
+    def admit(self, nbytes: int, fast_lane: bool = False) -> Iterator[None]:
+        """
+        Holds an in-flight slot and nbytes of the byte budget while the context is active.
+
+        Args:
+            nbytes (int): size of the request in bytes
+            fast_lane (bool): whether the request is small enough to bypass the in-flight
+                request limit
+
+        Raises:
+            AdmissionRejectedError: if the queue is full or the request waited longer than
+                the queue timeout
+        """
+        nbytes = max(0, nbytes)
+        start = time.monotonic()
+        self._acquire(nbytes, fast_lane, start)
+        metrics.histogram(f"{self.name}.admission.wait.ms").observe(
+            (time.monotonic() - start) * 1000
+        )
+        try:
+            yield
+        finally:
+            self._release(nbytes)
+
+    def _fits(self, nbytes: int, fast_lane: bool) -> bool:
+        if self._in_flight >= self.max_in_flight and not fast_lane:
+            return False
+        return self._in_flight == 0 or self._in_flight_bytes + nbytes <= self.max_in_flight_bytes
+
+    def _acquire(self, nbytes: int, fast_lane: bool, start: float) -> None:
+        with self._lock:
+            if (fast_lane or not self._queue) and self._fits(nbytes, fast_lane):
+                self._admit(nbytes)
+                return
+            if len(self._queue) >= self.queue_limit:
+                self._reject(nbytes, start, "admission queue is full")
+
+            ticket = object()
+            self._queue.append(ticket)
+            self._queued_bytes += nbytes
+            try:
+                deadline = start + self.queue_timeout_s
+                while not self._fits(nbytes, fast_lane) or (
+                    self._queue[0] is not ticket and not fast_lane
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # the request's own bytes are already counted as queued
+                        self._reject(0, start, "timed out waiting for admission")
+                    self._changed.wait(remaining)
+                self._admit(nbytes)
+            finally:
+                self._queue.remove(ticket)
+                self._queued_bytes -= nbytes
+                # the next request in the queue may fit now
+                self._changed.notify_all()
+
+    def _admit(self, nbytes: int) -> None:
+        self._in_flight += 1
+        self._in_flight_bytes += nbytes
+
+    def _release(self, nbytes: int) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._in_flight_bytes -= nbytes
+            now = time.monotonic()
+            self._completions.append((now, nbytes))
+            self._trim_completions(now)
+            self._changed.notify_all()
+
+    def _reject(self, queued_bytes: int, start: float, reason: str) -> None:
+        metrics.histogram(f"{self.name}.admission.rejected_wait.ms").observe(
+            (time.monotonic() - start) * 1000
+        )
+        retry_after = self._retry_after(queued_bytes)
+        raise AdmissionRejectedError(f"Request rejected: {reason}", retry_after)
+
+    def _trim_completions(self, now: float) -> None:
+        while self._completions and now - self._completions[0][0] > THROUGHPUT_WINDOW_S:
+            self._completions.popleft()
+
+    def _retry_after(self, nbytes: int) -> int:
+        """
+        Estimates the seconds until the in-flight and queued work, plus nbytes, drains, from the
+        bytes completed within the throughput window. Must be called with the lock held.
+        """
+        now = time.monotonic()
+        self._trim_completions(now)
+        if not self._completions:
+            return DEFAULT_RETRY_AFTER_S
+
+        elapsed = max(now - self._completions[0][0], 1.0)
+        completed_bytes = sum(size for _, size in self._completions)
+        completed_requests = len(self._completions)
+
+        # estimate by bytes when the requests carry sizes, otherwise by request count
+        if completed_bytes > 0:
+            backlog = self._in_flight_bytes + self._queued_bytes + nbytes
+            seconds = backlog / (completed_bytes / elapsed)
+        else:
+            backlog = self._in_flight + len(self._queue) + 1
+            seconds = backlog / (completed_requests / elapsed)
+        return min(MAX_RETRY_AFTER_S, max(MIN_RETRY_AFTER_S, math.ceil(seconds)))
+
+    @property
+    def in_flight(self) -> tuple[int, int]:
+        """
+        Returns:
+            tuple[int, int]: number of in-flight requests and sum of their sizes in bytes
+        """
+        with self._lock:
+            return self._in_flight, self._in_flight_bytes
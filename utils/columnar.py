@@ -0,0 +1,325 @@
+"""
+Columnar tables of image metadata, built row by row as images complete, and written as CSV or
+as a compact binary columnar file that loads without parsing a document per image.
+
+Each metadata field is a column, named by its path in the metadata, e.g. "exif.FNumber" or
+"size.0". Columns are typed by their values: integers are INT64, floats FLOAT64, EXIF dates
+TIMESTAMP (ISO 8601 strings), and anything else STRING. A column holding values of different
+types is widened to FLOAT64 or STRING.
+
+Binary columnar format, little endian:
+    magic       COLUMNAR_MAGIC
+    header      uint32 length, followed by a utf-8 json object
+                {"rows": n, "columns": [{"name", "type", "offset", "size"}, ...]}
+    columns     data of each column, at offset bytes from the end of the header: n validity
+                bytes (1 if the row has a value), followed by
+                INT64, FLOAT64: n values, 0 or NaN in rows without a value
+                STRING, TIMESTAMP: n + 1 uint32 offsets into the utf-8 data that follows
+
+Classes:
+    ColumnarTable: typed columns of metadata fields
+
+Functions:
+    flatten_metadata(metadata: dict) -> dict[str, object]
+    read_columnar(source: str | bytes) -> dict[str, list]
+
+Exceptions:
+    ColumnarFormatError(Exception)
+"""
+
+import csv
+import json
+import re
+import struct
+import sys
+from array import array
+
+
+COLUMNAR_MAGIC = b"EXCOLS1\n"
+INT64 = "int64"
+FLOAT64 = "float64"
+STRING = "string"
+TIMESTAMP = "timestamp"
+# array typecodes of the fixed size column types
+ARRAY_TYPECODES = {INT64: "q", FLOAT64: "d"}
+# array typecode of the uint32 offsets of string values
+OFFSET_TYPECODE = "I"
+INT64_RANGE = range(-(2**63), 2**63)
+
+# EXIF tags holding "YYYY:MM:DD HH:MM:SS" dates
+DATETIME_TAGS = frozenset(["DateTime", "DateTimeOriginal", "DateTimeDigitized"])
+EXIF_DATETIME = re.compile(r"(\d{4}):(\d{2}):(\d{2}) (\d{2}:\d{2}:\d{2})")
+
+
+class ColumnarFormatError(Exception):
+    """
+    Exception raised for data that is not a valid binary columnar file.
+    """
+
+    pass
+
+
+def flatten_metadata(metadata: dict) -> dict[str, object]:
+    """
+    Flattens the metadata of an image into fields: nested dictionaries and lists are flattened
+    into fields named by their path, e.g. {"size": (10, 20)} into {"size.0": 10, "size.1": 20}.
+
+    Args:
+        metadata (dict): metadata of an image
+
+    Returns:
+        dict[str, object]: values keyed by field name
+    """
+    fields = {}
+    _flatten(metadata, "", fields)
+    return fields
+
+
+def _flatten(value, name: str, fields: dict[str, object]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, f"{name}.{key}" if name else str(key), fields)
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value):
+            _flatten(item, f"{name}.{i}", fields)
+    else:
+        fields[name] = value
+
+
+class _Column:
+    """
+    Values of a column, and whether each row has a value.
+    """
+
+    def __init__(self, rows: int):
+        self.type = None
+        self.valid = bytearray(rows)
+        self.values = [None] * rows
+
+    def append(self, name: str, value) -> None:
+        if value is None:
+            self.valid.append(0)
+            self.values.append(self._empty())
+            return
+
+        value, value_type = _typed_value(name, value)
+        if self.type is None:
+            self._convert(value_type)
+        elif value_type != self.type:
+            self._convert(_widen(self.type, value_type))
+        if self.type == FLOAT64:
+            value = float(value)
+        elif self.type == STRING:
+            value = str(value)
+        self.valid.append(1)
+        self.values.append(value)
+
+    def _empty(self):
+        return {INT64: 0, FLOAT64: float("nan")}.get(self.type, "")
+
+    def _convert(self, column_type: str) -> None:
+        """
+        Changes the type of the column, converting the values it has.
+        """
+        convert = {INT64: int, FLOAT64: float}.get(column_type, str)
+        self.type = column_type
+        self.values = [
+            convert(value) if valid else self._empty()
+            for value, valid in zip(self.values, self.valid)
+        ]
+        if column_type in ARRAY_TYPECODES:
+            self.values = array(ARRAY_TYPECODES[column_type], self.values)
+
+    def text(self, row: int) -> str:
+        if not self.valid[row]:
+            return ""
+        return str(self.values[row])
+
+    def to_bytes(self) -> bytes:
+        if self.type in ARRAY_TYPECODES:
+            values = self.values
+            if sys.byteorder == "big":
+                values = array(values.typecode, values)
+                values.byteswap()
+            return bytes(self.valid) + values.tobytes()
+
+        data = [value.encode("utf-8") for value in self.values]
+        offsets = array(OFFSET_TYPECODE, [0])
+        for item in data:
+            offsets.append(offsets[-1] + len(item))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        return bytes(self.valid) + offsets.tobytes() + b"".join(data)
+
+
+def _typed_value(name: str, value) -> tuple[object, str]:
+    if isinstance(value, bool):
+        return int(value), INT64
+    if isinstance(value, int):
+        return (value, INT64) if value in INT64_RANGE else (str(value), STRING)
+    if isinstance(value, float):
+        return value, FLOAT64
+    if isinstance(value, str) and name.rpartition(".")[2] in DATETIME_TAGS:
+        match = EXIF_DATETIME.fullmatch(value)
+        if match is not None:
+            year, month, day, time = match.groups()
+            return f"{year}-{month}-{day}T{time}", TIMESTAMP
+    return str(value), STRING
+
+
+def _widen(column_type: str, value_type: str) -> str:
+    if {column_type, value_type} == {INT64, FLOAT64}:
+        return FLOAT64
+    return STRING
+
+
+class ColumnarTable:
+    """
+    Typed columns of the fields of image metadata, built a row per image.
+
+    Attributes:
+        rows (int): number of rows added
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._columns: dict[str, _Column] = {}
+
+    def add_row(self, fields: dict[str, object]) -> None:
+        """
+        Adds a row. Columns missing from the row get no value, and columns that are new get no
+        value in the rows before it.
+
+        Args:
+            fields (dict[str, object]): values keyed by column name, see flatten_metadata
+        """
+        for name in fields:
+            if name not in self._columns:
+                self._columns[name] = _Column(self.rows)
+        for name, column in self._columns.items():
+            column.append(name, fields.get(name))
+        self.rows += 1
+
+    def columns(self) -> dict[str, str]:
+        """
+        Returns:
+            dict[str, str]: type of each column, keyed by column name
+        """
+        return {name: column.type or STRING for name, column in self._columns.items()}
+
+    def write_csv(self, file_path: str) -> None:
+        """
+        Writes the table to a CSV file, with a header row of column names. Rows without a value
+        in a column have an empty field.
+
+        Args:
+            file_path (str): path to the CSV file
+        """
+        with open(file_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self._columns)
+            columns = list(self._columns.values())
+            writer.writerows([column.text(row) for column in columns] for row in range(self.rows))
+
+    def write(self, file_path: str) -> None:
+        """
+        Writes the table to a binary columnar file.
+
+        Args:
+            file_path (str): path to the columnar file
+        """
+        with open(file_path, "wb") as f:
+            f.write(self.to_bytes())
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns:
+            bytes: the table in the binary columnar format
+        """
+        schema, data, offset = [], [], 0
+        for name, column in self._columns.items():
+            if column.type is None:
+                column._convert(STRING)
+            column_data = column.to_bytes()
+            schema.append(
+                {"name": name, "type": column.type, "offset": offset, "size": len(column_data)}
+            )
+            data.append(column_data)
+            offset += len(column_data)
+
+        header = json.dumps({"rows": self.rows, "columns": schema}).encode("utf-8")
+        return b"".join([COLUMNAR_MAGIC, struct.pack("<I", len(header)), header, *data])
+
+
+def read_columnar(source: str | bytes) -> dict[str, list]:
+    """
+    Reads a binary columnar file.
+
+    Args:
+        source (str | bytes): path to the file, or its content
+
+    Returns:
+        dict[str, list]: values of each column keyed by column name, None in rows without a
+            value, TIMESTAMP values as ISO 8601 strings
+
+    Raises:
+        ColumnarFormatError: if the data is not a valid columnar file
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    data = memoryview(source)
+
+    if bytes(data[: len(COLUMNAR_MAGIC)]) != COLUMNAR_MAGIC:
+        raise ColumnarFormatError("Not a columnar metadata file")
+    try:
+        start = len(COLUMNAR_MAGIC) + 4
+        (header_size,) = struct.unpack_from("<I", data, len(COLUMNAR_MAGIC))
+        header = json.loads(bytes(data[start : start + header_size]))
+        rows = header["rows"]
+        start += header_size
+
+        columns = {}
+        for column in header["columns"]:
+            offset = start + column["offset"]
+            column_data = data[offset : offset + column["size"]]
+            if len(column_data) != column["size"]:
+                raise ColumnarFormatError(f"Column {column['name']} is truncated")
+            columns[column["name"]] = _read_column(column["type"], rows, column_data)
+        return columns
+    except (struct.error, ValueError, KeyError, IndexError, TypeError) as e:
+        raise ColumnarFormatError(f"Corrupted columnar metadata file: {e}") from e
+
+
+def _read_column(column_type: str, rows: int, data: memoryview) -> list:
+    valid = data[:rows]
+    if column_type in ARRAY_TYPECODES:
+        values = array(ARRAY_TYPECODES[column_type])
+        values.frombytes(data[rows:])
+        if sys.byteorder == "big":
+            values.byteswap()
+        if len(values) != rows:
+            raise ValueError("column size does not match the number of rows")
+        values = values.tolist()
+    elif column_type in (STRING, TIMESTAMP):
+        offsets = array(OFFSET_TYPECODE)
+        end = rows + (rows + 1) * offsets.itemsize
+        offsets.frombytes(data[rows:end])
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        text = bytes(data[end:])
+        if len(offsets) != rows + 1 or offsets[-1] != len(text):
+            raise ValueError("string offsets do not match the column data")
+        decoded = text.decode("utf-8")
+        if len(decoded) != len(text):
+            # offsets index bytes, they only index the decoded text if it is ascii
+            decoded = text
+        values = [decoded[start:stop] for start, stop in zip(offsets, offsets[1:])]
+        if decoded is text:
+            values = [value.decode("utf-8") for value in values]
+    else:
+        raise ValueError(f"unknown column type {column_type}")
+
+    if all(valid):
+        return values
+    return [value if is_valid else None for value, is_valid in zip(values, valid)]
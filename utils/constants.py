@@ -11,5 +11,12 @@ ZIP_NAME = "images.zip"
 # file extensions accepted by /upload endpoint
 ALLOWED_EXTENSIONS = set(["jpg", "jpeg", "png"])
 
+# leading bytes of the files accepted for each extension
+IMAGE_SIGNATURES = {
+    "jpg": b"\xff\xd8\xff",
+    "jpeg": b"\xff\xd8\xff",
+    "png": b"\x89PNG\r\n\x1a\n",
+}
+
 # maximum size of zip file accepted by /upload endpoint in MB
 ZIP_SIZE_LIMIT_MB = 100
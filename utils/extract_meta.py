@@ -1,25 +1,113 @@
 """
 Helper functions for extracting metadata from images.
 
+Classes:
+    MetadataManifest: writes the metadata of many images to a single file
+
 Functions:
-    extract_metadata(folder_path: str) -> None
-    _extract_metadata(file_path: str) -> None
+    load_image_plugins() -> None
+    resolve_tags(names: Iterable[str]) -> frozenset[str]
+    extract_metadata(folder_path: str) -> dict[str, dict]
+    extract_image_metadata(file_path: str, binary_limit: int | None = DEFAULT_BINARY_LIMIT,
+        binary_policy: str = BINARY_SUMMARY, tags: Collection[str] | None = None,
+        write_json: bool = True, keep_floats: bool = False, stats: bool = False) -> dict
     _remove_exif(img: Image) -> None
     _write_to_json(filename: str, metadata: dict) -> None
+    _write_sidecar(filename: str, tag: str, value: bytes) -> str
 
 Exceptions:
     ExtractMetaError(Exception)
 """
 
+import hashlib
+import importlib
 import json
 import os
 import logging
+from typing import Collection, Iterable
 from PIL import ExifTags, Image, UnidentifiedImageError
 
+from utils.columnar import ColumnarTable, flatten_metadata
+from utils.image_stats import compute_image_stats
+from utils.gps import decode_gps_info, get_coordinates
+from utils.image_header import read_image_header, parse_exif, ImageHeaderError
+
 
 log = logging.getLogger(__name__)
 logging.getLogger("PIL").setLevel(logging.INFO)
 
+# Pillow formats of the files accepted by the /upload endpoint, see ALLOWED_EXTENSIONS
+IMAGE_FORMATS = ("JPEG", "PNG")
+# plugins opening and saving IMAGE_FORMATS, and parsing their EXIF data
+IMAGE_PLUGINS = ("PIL.JpegImagePlugin", "PIL.PngImagePlugin", "PIL.TiffImagePlugin")
+
+# binary EXIF values, e.g. MakerNote, longer than the limit are omitted, summarized by length and
+# hash, or summarized and written to a sidecar file next to the image's json file
+BINARY_OMIT = "omit"
+BINARY_SUMMARY = "summary"
+BINARY_SIDECAR = "sidecar"
+BINARY_POLICIES = (BINARY_OMIT, BINARY_SUMMARY, BINARY_SIDECAR)
+DEFAULT_BINARY_LIMIT = 256
+
+# named sets of EXIF tags a client can request instead of listing them
+TAG_PRESETS = {
+    "basic": frozenset(
+        [
+            "Make",
+            "Model",
+            "Software",
+            "DateTime",
+            "DateTimeOriginal",
+            "Orientation",
+            "ExifImageWidth",
+            "ExifImageHeight",
+        ]
+    ),
+    "camera": frozenset(
+        [
+            "Make",
+            "Model",
+            "LensMake",
+            "LensModel",
+            "ExposureTime",
+            "FNumber",
+            "ISOSpeedRatings",
+            "ExposureProgram",
+            "ExposureBiasValue",
+            "MeteringMode",
+            "Flash",
+            "FocalLength",
+            "FocalLengthIn35mmFilm",
+            "WhiteBalance",
+        ]
+    ),
+    "gps": frozenset(["GPSInfo"]),
+}
+# metadata is written to a json file per image, or to a single manifest of all images: a json
+# object keyed by image filename, a json line per image, or a table with a row per image as
+# CSV or in the binary columnar format of utils.columnar
+METADATA_FILES = "files"
+METADATA_JSON = "json"
+METADATA_JSONL = "jsonl"
+METADATA_CSV = "csv"
+METADATA_COLUMNAR = "columnar"
+METADATA_OUTPUTS = (METADATA_FILES, METADATA_JSON, METADATA_JSONL, METADATA_CSV, METADATA_COLUMNAR)
+MANIFEST_NAMES = {
+    METADATA_JSON: "metadata.json",
+    METADATA_JSONL: "metadata.jsonl",
+    METADATA_CSV: "metadata.csv",
+    METADATA_COLUMNAR: "metadata.cols",
+}
+# outputs typing their values, which get floats instead of their string representation
+TABLE_OUTPUTS = (METADATA_CSV, METADATA_COLUMNAR)
+COMPACT_SEPARATORS = (",", ":")
+
+# EXIF tag name -> tag ids, a few names are used by two tags
+TAG_IDS = {
+    name: tuple(tag for tag, tag_name in ExifTags.TAGS.items() if tag_name == name)
+    for name in ExifTags.TAGS.values()
+}
+
 
 class ExtractMetaError(Exception):
     """
@@ -42,26 +130,165 @@ class ExtractMetaError(Exception):
         return self.message
 
 
-def extract_metadata(folder_path: str) -> None:
+class MetadataManifest:
+    """
+    Writes the metadata of an upload's images to a single compact file, one of MANIFEST_NAMES,
+    as each image completes. Lines of METADATA_JSONL are
+    {"file": <image filename>, "metadata": <metadata>}. TABLE_OUTPUTS are built as a
+    ColumnarTable, with the image filename in the "file" column, and written when the manifest
+    is closed.
+
+    Attributes:
+        path (str): path to the manifest file
+        output (str): one of MANIFEST_NAMES
+    """
+
+    def __init__(self, folder_path: str, output: str):
+        """
+        Args:
+            folder_path (str): folder the manifest is created in
+            output (str): one of MANIFEST_NAMES
+
+        Raises:
+            ValueError: if output is not a manifest format
+        """
+        if output not in MANIFEST_NAMES:
+            raise ValueError(f"{output} is not a manifest format")
+        self.path = os.path.join(folder_path, MANIFEST_NAMES[output])
+        self.output = output
+        self._count = 0
+        self._closed = False
+        if output in TABLE_OUTPUTS:
+            self._table = ColumnarTable()
+            return
+        self._file = open(self.path, "w")
+        if output == METADATA_JSON:
+            self._file.write("{")
+
+    def add(self, filename: str, metadata: dict) -> None:
+        """
+        Writes the metadata of an image to the manifest.
+
+        Args:
+            filename (str): image filename
+            metadata (dict): metadata of the image
+        """
+        if self.output in TABLE_OUTPUTS:
+            self._table.add_row({"file": filename, **flatten_metadata(metadata)})
+        elif self.output == METADATA_JSONL:
+            line = {"file": filename, "metadata": metadata}
+            self._file.write(json.dumps(line, separators=COMPACT_SEPARATORS) + "\n")
+        else:
+            if self._count:
+                self._file.write(",")
+            self._file.write(json.dumps(filename) + ":")
+            json.dump(metadata, self._file, separators=COMPACT_SEPARATORS)
+        self._count += 1
+
+    def close(self) -> None:
+        """
+        Completes and closes the manifest file.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self.output == METADATA_CSV:
+            self._table.write_csv(self.path)
+        elif self.output == METADATA_COLUMNAR:
+            self._table.write(self.path)
+        else:
+            if self.output == METADATA_JSON:
+                self._file.write("}")
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_image_plugins() -> None:
+    """
+    Loads the Pillow plugins needed for IMAGE_FORMATS. Called at startup, so the first request
+    of a worker does not import them. Images are only opened as IMAGE_FORMATS, so Pillow never
+    falls back to loading all of its plugins.
+    """
+    for plugin in IMAGE_PLUGINS:
+        importlib.import_module(plugin)
+    Image.preinit()
+
+
+def resolve_tags(names: Iterable[str]) -> frozenset[str]:
+    """
+    Resolves the tags requested by a client into EXIF tag names.
+
+    Args:
+        names (Iterable[str]): names of TAG_PRESETS and EXIF tags
+
+    Returns:
+        frozenset[str]: names of the requested EXIF tags
+
+    Raises:
+        ValueError: if a name is neither a preset nor an EXIF tag
+    """
+    tags = set()
+    for name in names:
+        if name in TAG_PRESETS:
+            tags.update(TAG_PRESETS[name])
+        elif name in TAG_IDS:
+            tags.add(name)
+        else:
+            raise ValueError(f"Unknown EXIF tag or preset '{name}'")
+    return frozenset(tags)
+
+
+def extract_metadata(folder_path: str) -> dict[str, dict]:
     """
     Extracts and removes metadata from all images in a folder.
 
     Args:
         folder_path (str): path to folder containing images
 
+    Returns:
+        dict[str, dict]: metadata of each image, keyed by image filename
+
     Raises:
         ValueError: if any file in folder is not an image file
     """
+    metadata = {}
     for file in os.listdir(folder_path):
-        _extract_metadata(os.path.join(folder_path, file))
-
-
-def _extract_metadata(file_path: str) -> None:
+        metadata[file] = extract_image_metadata(os.path.join(folder_path, file))
+    return metadata
+
+
+def extract_image_metadata(
+    file_path: str,
+    binary_limit: int | None = DEFAULT_BINARY_LIMIT,
+    binary_policy: str = BINARY_SUMMARY,
+    tags: Collection[str] | None = None,
+    write_json: bool = True,
+    keep_floats: bool = False,
+    stats: bool = False,
+) -> dict:
     """
     Extracts and removes metadata from an image file.
 
     Args:
         file_path (str): path to image file
+        binary_limit (int | None): length in bytes above which binary EXIF values are handled
+            by binary_policy, None to convert all of them to strings
+        binary_policy (str): one of BINARY_POLICIES
+        tags (Collection[str] | None): names of the EXIF tags to extract, None to extract all
+            of them
+        write_json (bool): whether to write the metadata to a json file next to the image, False
+            if it is written to a MetadataManifest
+        keep_floats (bool): whether to keep float values, e.g. rationals, as floats instead of
+            converting them to strings, for TABLE_OUTPUTS
+        stats (bool): whether to add the pixel statistics of the image, see compute_image_stats
+
+    Returns:
+        dict: extracted metadata, as written to the image's json file
 
     Raises:
         ExtractMetaError: if an error occurs while extracting metadata
@@ -71,28 +298,64 @@ def _extract_metadata(file_path: str) -> None:
     metadata = {}
 
     try:
-        with Image.open(file_path) as img:
-            metadata["format"] = img.format
-            metadata["mode"] = img.mode
-            metadata["size"] = img.size
-
-            if img._getexif() is not None:
-                metadata["exif"] = {
-                    ExifTags.TAGS[k]: v for k, v in img._getexif().items() if k in ExifTags.TAGS
-                }
-
-                for k, v in metadata["exif"].items():
-                    if not isinstance(v, str) and not isinstance(v, int):
-                        metadata["exif"][k] = str(v)
-
-                if hasattr(img, "info"):
-                    _remove_exif(img)
-
-            _write_to_json(img.filename, metadata)
-    except (AttributeError, FileNotFoundError, TypeError, UnidentifiedImageError) as e:
+        # metadata is read from the image's header, without Pillow decoding the image
+        header = read_image_header(file_path)
+        metadata["format"] = header.format
+        metadata["mode"] = header.mode
+        metadata["size"] = header.size
+
+        if stats:
+            # computed before the image is saved again without its EXIF data
+            with Image.open(file_path, formats=IMAGE_FORMATS) as img:
+                metadata["stats"] = compute_image_stats(img)
+
+        if header.exif is not None:
+            metadata["exif"] = {}
+            tag_ids = None
+            if tags is not None:
+                tag_ids = [tag for name in tags for tag in TAG_IDS.get(name, ())]
+            for k, v in parse_exif(header.exif, tag_ids).items():
+                name = ExifTags.TAGS.get(k)
+                if name is None:
+                    continue
+                if name == "GPSInfo" and isinstance(v, dict):
+                    v = decode_gps_info(v)
+                elif isinstance(v, bytes) and binary_limit is not None and len(v) > binary_limit:
+                    if binary_policy == BINARY_OMIT:
+                        continue
+                    summary = {"length": len(v), "sha256": hashlib.sha256(v).hexdigest()}
+                    if binary_policy == BINARY_SIDECAR:
+                        summary["file"] = _write_sidecar(file_path, name, v)
+                    v = summary
+                elif not isinstance(v, (str, int)) and not (keep_floats and isinstance(v, float)):
+                    v = str(v)
+                metadata["exif"][name] = v
+
+            if isinstance(metadata["exif"].get("GPSInfo"), dict):
+                coordinates = get_coordinates(metadata["exif"]["GPSInfo"])
+                if coordinates is not None:
+                    metadata["gps"] = coordinates
+
+            with Image.open(file_path, formats=IMAGE_FORMATS) as img:
+                # saving decodes the image anyway, and loading finds eXIf chunks after the pixels
+                img.load()
+                _remove_exif(img)
+
+        if write_json:
+            _write_to_json(file_path, metadata)
+    except (
+        AttributeError,
+        FileNotFoundError,
+        TypeError,
+        UnidentifiedImageError,
+        ImageHeaderError,
+        # e.g. a valid header followed by truncated or corrupt scan data
+        OSError,
+        ValueError,
+    ) as e:
         raise ExtractMetaError(f"Error while extracting metadata from {file_path}", e)
 
-    return None
+    return metadata
 
 
 def _remove_exif(img: Image) -> None:
@@ -130,3 +393,21 @@ def _write_to_json(filename: str, metadata: dict):
     output_file_path = f"{base_name}_meta.json"
     with open(output_file_path, "w") as output_file:
         json.dump(metadata, output_file, indent=4)
+
+
+def _write_sidecar(filename: str, tag: str, value: bytes) -> str:
+    """
+    Writes a binary EXIF value to a file next to the image.
+
+    Args:
+        filename (str): path to image file
+        tag (str): name of the EXIF tag
+
+    Returns:
+        str: name of the sidecar file
+    """
+    base_name = os.path.splitext(filename)[0]
+    output_file_path = f"{base_name}_{tag}.bin"
+    with open(output_file_path, "wb") as output_file:
+        output_file.write(value)
+    return os.path.basename(output_file_path)
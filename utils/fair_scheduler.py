@@ -0,0 +1,217 @@
+"""
+Per-user fair scheduling of image processing work.
+
+Tasks are queued per user and a pool of worker threads serves the user queues in weighted round
+robin, so one user submitting many large uploads cannot occupy every worker while another
+user's small upload waits behind them. Tasks of small uploads go to a fast lane, which is served
+before the user queues and has dedicated workers that only serve the fast lane. The fast lane is
+also queued per user and served in round robin, so a user flooding it with small uploads delays
+another user's small upload by at most one task per busy worker.
+
+Classes:
+    FairScheduler: Flask extension running tasks on a per-user fair-share thread pool
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from utils import metrics
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_FAST_LANE_WORKERS = 1
+DEFAULT_FAST_LANE_MB = 10
+
+FAST_LANE_WAIT_METRIC = "processing.fast_lane.wait.ms"
+FAIR_SHARE_WAIT_METRIC = "processing.fair_share.wait.ms"
+
+
+class _RoundRobin:
+    """
+    Task queues per user, served in weighted round robin: the user at the head runs up to its
+    weight tasks in turn, then moves to the back. Not thread safe; FairScheduler holds its lock.
+    """
+
+    def __init__(self):
+        # user -> queued tasks, in round robin order
+        self._queues = collections.OrderedDict()
+        # tasks the user at the head of the round robin may still run in its turn
+        self._turn_credits = 0
+
+    def __bool__(self) -> bool:
+        return bool(self._queues)
+
+    def push(self, user: str, task) -> None:
+        self._queues.setdefault(user, collections.deque()).append(task)
+
+    def pop(self, weights: dict[str, int]):
+        """
+        Removes the next task in round robin order.
+
+        Args:
+            weights (dict[str, int]): tasks run per turn by each user, default 1
+
+        Returns:
+            task: the next task, None if no tasks are queued
+        """
+        if not self._queues:
+            return None
+        user, queue = next(iter(self._queues.items()))
+        if self._turn_credits <= 0:
+            self._turn_credits = max(1, weights.get(user, 1))
+        task = queue.popleft()
+        self._turn_credits -= 1
+
+        if not queue:
+            del self._queues[user]
+            self._turn_credits = 0
+        elif self._turn_credits == 0:
+            self._queues.move_to_end(user)
+        return task
+
+    def pending(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: number of queued tasks per user
+        """
+        return {user: len(queue) for user, queue in self._queues.items()}
+
+
+class FairScheduler:
+    """
+    Runs tasks on worker threads, sharing the workers fairly between users.
+
+    Each user with queued tasks runs up to its weight (PROCESSING_USER_WEIGHTS, default 1) tasks
+    in turn before the next user. PROCESSING_WORKERS threads serve the fast lane first and then
+    the user queues, and PROCESSING_FAST_LANE_WORKERS more threads only serve the fast lane. In
+    the fast lane every user runs one task in turn, regardless of its weight.
+    Threads are started on first use in each process.
+    """
+
+    def __init__(self, app=None):
+        self.workers = DEFAULT_WORKERS
+        self.fast_lane_workers = DEFAULT_FAST_LANE_WORKERS
+        self.fast_lane_bytes = DEFAULT_FAST_LANE_MB * 1000000
+        self.weights = {}
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Reads the pool sizes, fast lane threshold and user weights from the app config.
+
+        Args:
+            app (Flask): Flask app whose config may define PROCESSING_WORKERS,
+                PROCESSING_FAST_LANE_WORKERS, PROCESSING_FAST_LANE_MB and
+                PROCESSING_USER_WEIGHTS
+        """
+        self.workers = app.config.get("PROCESSING_WORKERS", DEFAULT_WORKERS)
+        self.fast_lane_workers = app.config.get(
+            "PROCESSING_FAST_LANE_WORKERS", DEFAULT_FAST_LANE_WORKERS
+        )
+        self.fast_lane_bytes = (
+            app.config.get("PROCESSING_FAST_LANE_MB", DEFAULT_FAST_LANE_MB) * 1000000
+        )
+        self.weights = dict(app.config.get("PROCESSING_USER_WEIGHTS", {}))
+        app.extensions["fair_scheduler"] = self
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._fast_lane = _RoundRobin()
+        self._queues = _RoundRobin()
+        self._threads = []
+
+    def is_fast_lane(self, nbytes: int | None) -> bool:
+        """
+        Returns whether work for an upload of nbytes belongs in the fast lane.
+
+        Args:
+            nbytes (int | None): upload size in bytes, None if unknown
+
+        Returns:
+            bool: True if the upload is small enough for the fast lane
+        """
+        return nbytes is not None and nbytes <= self.fast_lane_bytes
+
+    def submit(self, user: str, fn: Callable, *args, fast_lane: bool = False, **kwargs) -> Future:
+        """
+        Queues a task for a user.
+
+        Args:
+            user (str): user the task is run for
+            fn (Callable): task, called as fn(*args, **kwargs) on a worker thread
+            fast_lane (bool): whether the task belongs to a small upload
+
+        Returns:
+            Future: result of the task; cancelling it before it started skips the task
+        """
+        future = Future()
+        task = (future, fn, args, kwargs, time.monotonic())
+        with self._lock:
+            self._start_workers()
+            (self._fast_lane if fast_lane else self._queues).push(user, task)
+            # fast lane workers ignore user queues, so wake all to reach a suitable worker
+            self._changed.notify_all()
+        return future
+
+    def _start_workers(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers + self.fast_lane_workers):
+            fast_lane_only = i >= self.workers
+            thread = threading.Thread(
+                target=self._work,
+                args=(fast_lane_only,),
+                name=f"processing-{'fast-' if fast_lane_only else ''}{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_task(self, fast_lane_only: bool):
+        if self._fast_lane:
+            return self._fast_lane.pop({}), FAST_LANE_WAIT_METRIC
+        if fast_lane_only or not self._queues:
+            return None, None
+        return self._queues.pop(self.weights), FAIR_SHARE_WAIT_METRIC
+
+    def _work(self, fast_lane_only: bool) -> None:
+        while True:
+            with self._lock:
+                task, metric = self._next_task(fast_lane_only)
+                while task is None:
+                    self._changed.wait()
+                    task, metric = self._next_task(fast_lane_only)
+
+            future, fn, args, kwargs, queued_at = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            metrics.histogram(metric).observe((time.monotonic() - queued_at) * 1000)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def pending(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: number of queued tasks per user, fast lane tasks under ""
+        """
+        with self._lock:
+            pending = self._queues.pending()
+            if self._fast_lane:
+                pending[""] = sum(self._fast_lane.pending().values())
+            return pending
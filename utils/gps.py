@@ -0,0 +1,116 @@
+"""
+Helpers for decoding GPS EXIF metadata and for geographic distance calculations.
+
+Functions:
+    decode_gps_info(gps_info: dict) -> dict
+    get_coordinates(gps: dict) -> dict | None
+    to_decimal_degrees(dms, ref: str) -> float | None
+    haversine_distance_m(lon1: float, lat1: float, lon2: float, lat2: float) -> float
+"""
+
+import math
+from numbers import Rational, Real
+
+from PIL import ExifTags
+
+
+# radius of the earth used by MongoDB for spherical queries, in meters
+EARTH_RADIUS_M = 6378100
+
+_NEGATIVE_REFS = {"S", "W"}
+
+
+def _to_json_value(value):
+    """
+    Converts a GPS tag value to a JSON-serializable value: rationals to floats, tuples to lists,
+    byte strings to lists of ints and NUL-padded strings to plain strings.
+    """
+    if isinstance(value, bytes):
+        return list(value)
+    if isinstance(value, str):
+        return value.strip("\x00 ")
+    if isinstance(value, (tuple, list)):
+        return [_to_json_value(v) for v in value]
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (Rational, Real)):
+        number = float(value)
+        return number if math.isfinite(number) else None
+    return str(value)
+
+
+def decode_gps_info(gps_info: dict) -> dict:
+    """
+    Decodes a GPS IFD, as returned by Pillow, into named, JSON-serializable tags.
+
+    Args:
+        gps_info (dict): GPS tag values keyed by tag id
+
+    Returns:
+        dict: GPS tag values keyed by tag name, e.g. {"GPSLatitudeRef": "N", "GPSLatitude": [...]}
+    """
+    return {
+        ExifTags.GPSTAGS.get(tag, str(tag)): _to_json_value(value)
+        for tag, value in gps_info.items()
+    }
+
+
+def to_decimal_degrees(dms, ref: str) -> float | None:
+    """
+    Converts degrees, minutes and seconds to signed decimal degrees.
+
+    Args:
+        dms: (degrees, minutes, seconds)
+        ref (str): hemisphere reference, one of "N", "S", "E", "W"
+
+    Returns:
+        float | None: decimal degrees, negative in the southern and western hemispheres,
+            None if dms is malformed
+    """
+    try:
+        degrees, minutes, seconds = (float(part) for part in dms)
+    except (TypeError, ValueError):
+        return None
+    decimal = degrees + minutes / 60 + seconds / 3600
+    if not math.isfinite(decimal):
+        return None
+    return -decimal if ref in _NEGATIVE_REFS else decimal
+
+
+def get_coordinates(gps: dict) -> dict | None:
+    """
+    Returns the position recorded in decoded GPS tags.
+
+    Args:
+        gps (dict): GPS tags as returned by decode_gps_info
+
+    Returns:
+        dict | None: {"latitude", "longitude"} in decimal degrees, plus "altitude" in meters if
+            recorded, None if the tags hold no valid position
+    """
+    latitude = to_decimal_degrees(gps.get("GPSLatitude"), gps.get("GPSLatitudeRef"))
+    longitude = to_decimal_degrees(gps.get("GPSLongitude"), gps.get("GPSLongitudeRef"))
+    if latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+
+    coordinates = {"latitude": latitude, "longitude": longitude}
+    altitude = gps.get("GPSAltitude")
+    if isinstance(altitude, (int, float)):
+        # GPSAltitudeRef 1 means below sea level
+        below_sea_level = gps.get("GPSAltitudeRef") in ([1], 1)
+        coordinates["altitude"] = -altitude if below_sea_level else altitude
+    return coordinates
+
+
+def haversine_distance_m(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """
+    Returns:
+        float: great-circle distance between two points in meters
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
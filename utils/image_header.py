@@ -0,0 +1,345 @@
+"""
+Header-only reader of JPEG and PNG images. The format, mode and size of an image, and its raw
+EXIF data, are read from the segments (JPEG) or chunks (PNG) preceding the pixel data, which is
+skipped without being read or decoded, so the cost of reading an image's metadata does not
+depend on its resolution. EXIF data is decoded by a TIFF IFD parser into the values Pillow's
+_getexif returns.
+
+Classes:
+    ImageHeader: format, mode, size and raw EXIF data of an image
+
+Functions:
+    read_image_header(source: str | bytes | BinaryIO) -> ImageHeader
+    parse_exif(data: bytes, tags: Collection[int] | None = None) -> dict[int, object]
+
+Exceptions:
+    ImageHeaderError(Exception)
+"""
+
+import io
+import logging
+import struct
+import zlib
+from typing import BinaryIO, Collection
+
+from PIL import ExifTags, TiffTags
+
+
+log = logging.getLogger(__name__)
+
+JPEG_SOI = b"\xff\xd8"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+EXIF_HEADER = b"Exif\x00\x00"
+
+# JPEG markers without a length field, and the start of frame markers holding the image size
+JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xD8)])
+JPEG_SOF_MARKERS = frozenset(
+    [*range(0xC0, 0xC4), *range(0xC5, 0xC8), *range(0xC9, 0xCC)] + [0xCD, 0xCE, 0xCF]
+)
+JPEG_APP1, JPEG_SOS, JPEG_EOI = 0xE1, 0xDA, 0xD9
+JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+# (bit depth, color type) of the PNG IHDR chunk -> Pillow mode
+PNG_MODES = {
+    (1, 0): "1",
+    (2, 0): "L",
+    (4, 0): "L",
+    (8, 0): "L",
+    (16, 0): "I",
+    (8, 2): "RGB",
+    (16, 2): "RGB",
+    (1, 3): "P",
+    (2, 3): "P",
+    (4, 3): "P",
+    (8, 3): "P",
+    (8, 4): "LA",
+    (16, 4): "RGBA",
+    (8, 6): "RGBA",
+    (16, 6): "RGBA",
+}
+# text chunk keyword under which ImageMagick stores hex encoded EXIF data
+PNG_RAW_EXIF_KEYWORD = b"Raw profile type exif"
+# maximum size of a decompressed zTXt chunk
+PNG_MAX_TEXT_SIZE = 1024 * 1024
+
+# TIFF field type -> (size of a value in bytes, struct format of a value); BYTE, ASCII and
+# UNDEFINED values are kept as bytes, RATIONAL values are pairs of integers
+TIFF_TYPES = {
+    1: (1, None),
+    2: (1, None),
+    3: (2, "H"),
+    4: (4, "L"),
+    5: (8, "L"),
+    6: (1, "b"),
+    7: (1, None),
+    8: (2, "h"),
+    9: (4, "l"),
+    10: (8, "l"),
+    11: (4, "f"),
+    12: (8, "d"),
+    13: (4, "L"),
+    16: (8, "Q"),
+}
+TIFF_ASCII = 2
+TIFF_RATIONAL_TYPES = frozenset([5, 10])
+TIFF_BYTE_TYPES = frozenset([1, 7])
+# tags of IFD0 pointing to the EXIF and GPS IFDs
+IFD_POINTERS = frozenset([ExifTags.IFD.Exif, ExifTags.IFD.GPSInfo])
+# tags whose value Pillow always unwraps to a single value, even if the file holds more
+SINGLE_VALUE_TAGS = frozenset(tag for tag, info in TiffTags.TAGS_V2.items() if info.length == 1)
+
+
+class ImageHeaderError(Exception):
+    """
+    Exception raised for files that are not JPEG or PNG images, or whose header is corrupted.
+    """
+
+    pass
+
+
+class ImageHeader:
+    """
+    Format, mode and size of an image, as Pillow reports them, and its raw EXIF data.
+
+    Attributes:
+        format (str): "JPEG" or "PNG"
+        mode (str): Pillow mode, e.g. "RGB"
+        size (tuple[int, int]): width and height in pixels
+        exif (bytes | None): EXIF data, None if the image has none
+    """
+
+    def __init__(self, format: str, mode: str, size: tuple[int, int], exif: bytes | None):
+        self.format = format
+        self.mode = mode
+        self.size = size
+        self.exif = exif
+
+
+def read_image_header(source: str | bytes | BinaryIO) -> ImageHeader:
+    """
+    Reads the header of a JPEG or PNG image.
+
+    Args:
+        source (str | bytes | BinaryIO): path to image file, image data, or a binary file
+            positioned at the start of the image
+
+    Returns:
+        ImageHeader: format, mode, size and EXIF data of the image
+
+    Raises:
+        ImageHeaderError: if the image is not a JPEG or PNG image, or its header is corrupted
+        OSError: if the file cannot be read
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as fp:
+            return _read_header(fp)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _read_header(io.BytesIO(source))
+    return _read_header(source)
+
+
+def _read_header(fp: BinaryIO) -> ImageHeader:
+    signature = fp.read(len(PNG_SIGNATURE))
+    if signature.startswith(JPEG_SOI):
+        fp.seek(len(JPEG_SOI) - len(signature), io.SEEK_CUR)
+        return _read_jpeg_header(fp)
+    if signature == PNG_SIGNATURE:
+        return _read_png_header(fp)
+    raise ImageHeaderError("Not a JPEG or PNG image")
+
+
+def _read_exact(fp: BinaryIO, size: int) -> bytes:
+    data = fp.read(size)
+    if len(data) != size:
+        raise ImageHeaderError("Image header is truncated")
+    return data
+
+
+def _read_jpeg_header(fp: BinaryIO) -> ImageHeader:
+    mode = size = exif = None
+    while True:
+        if _read_exact(fp, 1) != b"\xff":
+            raise ImageHeaderError("Expected a JPEG marker")
+        marker = 0xFF
+        while marker == 0xFF:  # fill bytes
+            marker = _read_exact(fp, 1)[0]
+
+        if marker in (JPEG_SOS, JPEG_EOI):
+            break
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+
+        (length,) = struct.unpack(">H", _read_exact(fp, 2))
+        if length < 2:
+            raise ImageHeaderError("Invalid JPEG segment length")
+        if marker in JPEG_SOF_MARKERS and size is None:
+            segment = _read_exact(fp, length - 2)
+            height, width, layers = struct.unpack_from(">HHB", segment, 1)
+            mode = JPEG_MODES.get(layers)
+            if mode is None:
+                raise ImageHeaderError(f"Cannot handle {layers}-layer JPEG images")
+            size = (width, height)
+        elif marker == JPEG_APP1 and exif is None:
+            segment = _read_exact(fp, length - 2)
+            if segment.startswith(EXIF_HEADER):
+                exif = segment
+        else:
+            fp.seek(length - 2, io.SEEK_CUR)
+
+    if size is None:
+        raise ImageHeaderError("JPEG image has no frame header")
+    return ImageHeader("JPEG", mode, size, exif)
+
+
+def _read_png_header(fp: BinaryIO) -> ImageHeader:
+    length, chunk_type = struct.unpack(">I4s", _read_exact(fp, 8))
+    if chunk_type != b"IHDR" or length < 13:
+        raise ImageHeaderError("PNG image has no IHDR chunk")
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", _read_exact(fp, 10))
+    mode = PNG_MODES.get((bit_depth, color_type))
+    if mode is None:
+        raise ImageHeaderError(f"Unknown PNG mode {(bit_depth, color_type)}")
+    fp.seek(length - 10 + 4, io.SEEK_CUR)
+
+    exif = raw_exif = None
+    while exif is None:
+        header = fp.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IEND":
+            break
+        if chunk_type == b"eXIf":
+            exif = _read_exact(fp, length)
+        elif chunk_type in (b"tEXt", b"zTXt") and raw_exif is None:
+            raw_exif = _read_raw_exif(chunk_type, _read_exact(fp, length))
+        else:
+            # pixel data is skipped, but eXIf may follow it
+            fp.seek(length, io.SEEK_CUR)
+        fp.seek(4, io.SEEK_CUR)  # crc
+
+    return ImageHeader("PNG", mode, (width, height), exif if exif is not None else raw_exif)
+
+
+def _read_raw_exif(chunk_type: bytes, data: bytes) -> bytes | None:
+    """
+    Returns the EXIF data of a text chunk holding it hex encoded, None for other text chunks.
+    """
+    keyword, _, text = data.partition(b"\x00")
+    if keyword != PNG_RAW_EXIF_KEYWORD:
+        return None
+    try:
+        if chunk_type == b"zTXt":
+            text = zlib.decompressobj().decompress(text[1:], PNG_MAX_TEXT_SIZE)
+        # "\nexif\n<length>\n<hex data>"
+        return bytes.fromhex("".join(text.decode("latin-1").split("\n")[3:]))
+    except (zlib.error, ValueError) as e:
+        log.debug(f"Ignoring invalid raw EXIF text chunk -> {e}")
+        return None
+
+
+def parse_exif(data: bytes, tags: Collection[int] | None = None) -> dict[int, object]:
+    """
+    Decodes EXIF data into tag values, like Pillow's _getexif: the tags of the image's IFD0 and
+    EXIF IFD in one dictionary, with the GPS IFD as a dictionary under the GPSInfo tag. ASCII
+    values are decoded to str, BYTE and UNDEFINED values are bytes, RATIONAL values are floats,
+    and values with more than one element are tuples. Tags that cannot be read are skipped.
+
+    If tags are given, other tags are skipped without decoding their values, the EXIF IFD is
+    only read if some of the tags are not in IFD0, and the GPS IFD only if GPSInfo is one of them.
+
+    Args:
+        data (bytes): EXIF data, with or without the "Exif\\0\\0" header
+        tags (Collection[int] | None): ids of the tags to decode, None to decode all tags
+
+    Returns:
+        dict[int, object]: tag values keyed by tag id
+    """
+    if data.startswith(EXIF_HEADER):
+        data = data[len(EXIF_HEADER) :]
+    if data[:4] == b"II*\x00":
+        byte_order = "<"
+    elif data[:4] == b"MM\x00*":
+        byte_order = ">"
+    else:
+        if data:
+            log.debug("Ignoring EXIF data without a TIFF header")
+        return {}
+
+    requested = None if tags is None else frozenset(tags)
+    (ifd0_offset,) = struct.unpack(byte_order + "L", data[4:8])
+    if requested is None:
+        tags = _parse_ifd(data, ifd0_offset, byte_order)
+        read_exif = read_gps = True
+    else:
+        # the IFD pointers are read even if they are not requested
+        tags = _parse_ifd(data, ifd0_offset, byte_order, requested | IFD_POINTERS)
+        read_exif = not requested.issubset(tags.keys() | {ExifTags.IFD.GPSInfo})
+        read_gps = ExifTags.IFD.GPSInfo in requested
+
+    exif_offset = tags.get(ExifTags.IFD.Exif)
+    gps_offset = tags.get(ExifTags.IFD.GPSInfo)
+    if requested is not None:
+        tags = {tag: value for tag, value in tags.items() if tag in requested}
+
+    if read_exif and isinstance(exif_offset, int):
+        tags.update(_parse_ifd(data, exif_offset, byte_order, requested))
+    if read_gps and isinstance(gps_offset, int):
+        tags[ExifTags.IFD.GPSInfo] = _parse_ifd(data, gps_offset, byte_order)
+    return tags
+
+
+def _parse_ifd(
+    data: bytes, offset: int, byte_order: str, tags: frozenset[int] | None = None
+) -> dict[int, object]:
+    values = {}
+    try:
+        (count,) = struct.unpack_from(byte_order + "H", data, offset)
+    except struct.error:
+        return values
+
+    entry = struct.Struct(byte_order + "HHL4s")
+    for i in range(count):
+        try:
+            tag, field_type, value_count, value = entry.unpack_from(data, offset + 2 + i * 12)
+        except struct.error:
+            break
+        if field_type not in TIFF_TYPES or value_count == 0:
+            continue
+        if tags is not None and tag not in tags:
+            continue
+
+        value_size, value_format = TIFF_TYPES[field_type]
+        size = value_count * value_size
+        if size > 4:
+            (value_offset,) = struct.unpack(byte_order + "L", value)
+            value = data[value_offset : value_offset + size]
+            if len(value) != size:
+                continue
+        else:
+            value = value[:size]
+
+        values[tag] = _decode_value(tag, field_type, value_count, value_format, value, byte_order)
+    return values
+
+
+def _decode_value(tag, field_type, value_count, value_format, value, byte_order):
+    if field_type in TIFF_BYTE_TYPES:
+        return value
+    if field_type == TIFF_ASCII:
+        if value.endswith(b"\x00"):
+            value = value[:-1]
+        return value.decode("latin-1", "replace")
+
+    if field_type in TIFF_RATIONAL_TYPES:
+        numbers = struct.unpack(f"{byte_order}{2 * value_count}{value_format}", value)
+        values = tuple(
+            numerator / denominator if denominator else float("nan")
+            for numerator, denominator in zip(numbers[::2], numbers[1::2])
+        )
+    else:
+        values = struct.unpack(f"{byte_order}{value_count}{value_format}", value)
+
+    if value_count == 1 or tag in SINGLE_VALUE_TAGS:
+        return values[0]
+    return values
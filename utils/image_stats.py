@@ -0,0 +1,66 @@
+"""
+Pixel statistics of images: luminance histogram, mean and variance of each channel, and the
+ratio of clipped shadows and highlights. Images are decoded at a reduced size, JPEG images with
+draft mode, which scales the DCT while decoding instead of decoding every pixel, and the
+statistics are computed with NumPy over all pixels at once.
+
+Functions:
+    compute_image_stats(img: Image.Image, size: int = STATS_SIZE) -> dict
+"""
+
+import numpy as np
+from PIL import Image
+
+
+# images are decoded to at least this many pixels on their shorter side, and reduced to at
+# most about twice that, before their statistics are computed
+STATS_SIZE = 256
+HISTOGRAM_BINS = 32
+# modes analysed as a single luminance channel, other modes are converted to RGB
+GRAYSCALE_MODES = frozenset(["1", "L", "LA", "I", "I;16", "F"])
+# ITU-R 601-2 luma weights, as used by Pillow's conversion to L
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+
+def compute_image_stats(img: Image.Image, size: int = STATS_SIZE) -> dict:
+    """
+    Computes the pixel statistics of an image that has not been loaded yet.
+
+    Args:
+        img (Image.Image): image opened with Image.open
+        size (int): minimum size of the shorter side of the decoded image, if the image is larger
+
+    Returns:
+        dict: width and height of the decoded image; mean and variance of each channel (R, G, B
+            or L) in 0-255; luminance mean and a histogram of HISTOGRAM_BINS bins; and the ratio
+            of pixels clipped to black in every channel (shadows) or to white in any channel
+            (highlights)
+    """
+    mode = "L" if img.mode in GRAYSCALE_MODES else "RGB"
+    # only changes how JPEG images are decoded, which must happen before they are loaded
+    img.draft(mode, (size, size))
+    img = img.convert(mode)
+    factor = min(img.size) // size
+    if factor > 1:
+        img = img.reduce(factor)
+
+    pixels = np.asarray(img, dtype=np.float64).reshape(-1, len(mode))
+    if mode == "L":
+        luminance = pixels[:, 0]
+    else:
+        luminance = pixels @ LUMA_WEIGHTS
+    bins = np.minimum((luminance * HISTOGRAM_BINS / 256).astype(np.intp), HISTOGRAM_BINS - 1)
+
+    return {
+        "size": list(img.size),
+        "mean": dict(zip(mode, pixels.mean(axis=0).tolist())),
+        "variance": dict(zip(mode, pixels.var(axis=0).tolist())),
+        "luminance": {
+            "mean": float(luminance.mean()),
+            "histogram": np.bincount(bins, minlength=HISTOGRAM_BINS).tolist(),
+        },
+        "clipping": {
+            "shadows": float(np.mean(pixels.max(axis=1) <= 0)),
+            "highlights": float(np.mean(pixels.max(axis=1) >= 255)),
+        },
+    }
@@ -0,0 +1,710 @@
+"""
+Storage of extracted image metadata, so clients can re-fetch the results of an upload without
+uploading the images again. Like the user store, the backend is selected with STORE_BACKEND.
+
+Each image is stored as one document:
+    {user, upload_id, filename, captured_at, created_at, make, model, lens_model, iso,
+     focal_length, location, metadata}
+
+The commonly searched EXIF fields are copied to the top level of the document so that searches
+are served by compound indexes of the form (user, <field>, captured_at, _id). Search results are
+ordered by (captured_at, _id) and paginated with an opaque keyset cursor encoding the last
+returned (captured_at, _id), so fetching a page never skips over earlier results. Range filters
+on numeric fields are served by (user, captured_at, _id, <field>) indexes, following the
+equality, sort, range order, so their results are read in sort order instead of sorted in memory.
+
+Images with GPS coordinates store them as a GeoJSON point in the location field, indexed with a
+2dsphere index, so searches can be restricted to a radius around a point or to a bounding box.
+
+Classes:
+    MetadataStore: interface implemented by all metadata storage backends
+    MongoMetadataStore: stores metadata in a MongoDB collection using batched inserts
+    InMemoryMetadataStore: stores metadata in a process-local list
+
+Functions:
+    create_metadata_store(backend: str, mongo: MongoConnection, collection_name: str,
+        batch_size: int) -> MetadataStore
+    parse_exif_datetime(value) -> datetime | None
+    get_capture_time(metadata: dict) -> datetime | None
+    create_documents(user: str, upload_id: str, metadata: dict[str, dict]) -> list[dict]
+    to_response(document: dict) -> dict
+    get_search_fields(metadata: dict) -> dict
+    parse_search_filters(args: dict) -> dict
+    parse_page_size(value: str | None) -> int
+    encode_cursor(captured_at: datetime | None, doc_id) -> str
+    decode_cursor(cursor: str) -> tuple[datetime | None, str]
+"""
+
+import base64
+import binascii
+import copy
+import datetime
+import itertools
+import json
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import MongoClient, ASCENDING, GEOSPHERE
+from pymongo.collection import Collection
+
+from utils.gps import haversine_distance_m, EARTH_RADIUS_M
+from utils.mongo_utils import MongoConnection, create_db, create_collection
+from utils.user_store import MONGO_BACKEND, MEMORY_BACKEND
+
+
+log = logging.getLogger(__name__)
+
+USER_FIELD = "user"
+UPLOAD_ID_FIELD = "upload_id"
+FILENAME_FIELD = "filename"
+CAPTURED_AT_FIELD = "captured_at"
+CREATED_AT_FIELD = "created_at"
+METADATA_FIELD = "metadata"
+ID_FIELD = "_id"
+
+# searchable fields copied from the EXIF metadata to the top level of each document
+MAKE_FIELD = "make"
+MODEL_FIELD = "model"
+LENS_MODEL_FIELD = "lens_model"
+ISO_FIELD = "iso"
+FOCAL_LENGTH_FIELD = "focal_length"
+STRING_SEARCH_FIELDS = {MAKE_FIELD: "Make", MODEL_FIELD: "Model", LENS_MODEL_FIELD: "LensModel"}
+NUMBER_SEARCH_FIELDS = {ISO_FIELD: "ISOSpeedRatings", FOCAL_LENGTH_FIELD: "FocalLength"}
+LOCATION_FIELD = "location"
+
+# search query parameters; numeric fields also accept <field>_min and <field>_max
+START_PARAM = "start"
+END_PARAM = "end"
+LIMIT_PARAM = "limit"
+CURSOR_PARAM = "cursor"
+# "<lat>,<lon>" with a radius in meters, or "<min_lon>,<min_lat>,<max_lon>,<max_lat>"
+NEAR_PARAM = "near"
+RADIUS_PARAM = "radius"
+BBOX_PARAM = "bbox"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DEFAULT_BATCH_SIZE = 500
+
+# EXIF date format, e.g. "2022:01:01 12:00:00"
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+# tags holding the capture time, in order of preference
+CAPTURE_TIME_TAGS = ("DateTimeOriginal", "DateTimeDigitized", "DateTime")
+
+
+def parse_exif_datetime(value) -> datetime.datetime | None:
+    """
+    Parses an EXIF date string.
+
+    Args:
+        value: EXIF date value, e.g. "2022:01:01 12:00:00"
+
+    Returns:
+        datetime | None: parsed date, None if value is not a valid EXIF date
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.strptime(value.strip("\x00 "), EXIF_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def get_capture_time(metadata: dict) -> datetime.datetime | None:
+    """
+    Returns:
+        datetime | None: capture time of an image from its extracted metadata, if present
+    """
+    exif = metadata.get("exif") or {}
+    for tag in CAPTURE_TIME_TAGS:
+        captured_at = parse_exif_datetime(exif.get(tag))
+        if captured_at is not None:
+            return captured_at
+    return None
+
+
+def _to_number(value) -> float | None:
+    """
+    Converts an extracted EXIF value to a number, e.g. 200, "50.0" or (100, 200).
+
+    Returns:
+        float | None: numeric value, None if value is not a finite number, e.g. "nan"
+    """
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _to_string(value) -> str | None:
+    """
+    Returns:
+        str | None: EXIF string value without padding, None if value is not a non-empty string
+    """
+    if not isinstance(value, str):
+        return None
+    return value.strip("\x00 ") or None
+
+
+def get_search_fields(metadata: dict) -> dict:
+    """
+    Extracts the searchable fields of an image from its metadata.
+
+    Args:
+        metadata (dict): extracted metadata of an image
+
+    Returns:
+        dict: value of every searchable field, None where the image has no such tag; location
+            is only present for images with GPS coordinates
+    """
+    exif = metadata.get("exif") or {}
+    fields = {field: _to_string(exif.get(tag)) for field, tag in STRING_SEARCH_FIELDS.items()}
+    fields.update({field: _to_number(exif.get(tag)) for field, tag in NUMBER_SEARCH_FIELDS.items()})
+    gps = metadata.get("gps")
+    if gps:
+        fields[LOCATION_FIELD] = {
+            "type": "Point",
+            "coordinates": [gps["longitude"], gps["latitude"]],
+        }
+    return fields
+
+
+def create_documents(user: str, upload_id: str, metadata: dict[str, dict]) -> list[dict]:
+    """
+    Builds the documents stored for an upload.
+
+    Args:
+        user (str): username of the uploader
+        upload_id (str): id of the upload request
+        metadata (dict[str, dict]): metadata of each image, keyed by image filename
+
+    Returns:
+        list[dict]: one document per image
+    """
+    created_at = datetime.datetime.utcnow()
+    return [
+        {
+            USER_FIELD: user,
+            UPLOAD_ID_FIELD: upload_id,
+            FILENAME_FIELD: filename,
+            CAPTURED_AT_FIELD: get_capture_time(image_metadata),
+            CREATED_AT_FIELD: created_at,
+            **get_search_fields(image_metadata),
+            METADATA_FIELD: image_metadata,
+        }
+        for filename, image_metadata in metadata.items()
+    ]
+
+
+def to_response(document: dict) -> dict:
+    """
+    Converts a stored document to its JSON response form.
+
+    Args:
+        document (dict): stored document
+
+    Returns:
+        dict: upload id, filename, ISO capture time and metadata of the image
+    """
+    captured_at = document.get(CAPTURED_AT_FIELD)
+    return {
+        UPLOAD_ID_FIELD: document[UPLOAD_ID_FIELD],
+        FILENAME_FIELD: document[FILENAME_FIELD],
+        CAPTURED_AT_FIELD: captured_at.isoformat() if captured_at else None,
+        METADATA_FIELD: document[METADATA_FIELD],
+    }
+
+
+def _parse_datetime(value: str, param: str) -> datetime.datetime:
+    """
+    Parses an ISO 8601 capture time bound. EXIF capture times are local times without a timezone,
+    so bounds with a UTC offset are rejected rather than compared against them.
+    """
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{param}' must be an ISO 8601 date, got '{value}'")
+    if parsed.tzinfo is not None:
+        raise ValueError(f"'{param}' must be a local time without a timezone, got '{value}'")
+    return parsed
+
+
+def _parse_number(value: str, param: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"'{param}' must be a number, got '{value}'")
+    return number
+
+
+def _parse_coordinates(value: str, param: str, count: int) -> list[float]:
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        raise ValueError(f"'{param}' must be {count} comma-separated numbers, got '{value}'")
+    return numbers
+
+
+def _check_position(lon: float, lat: float, param: str) -> None:
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError(f"'{param}' is not a valid position")
+
+
+def _parse_location_filters(args: dict) -> dict:
+    filters = {}
+    if args.get(NEAR_PARAM):
+        lat, lon = _parse_coordinates(args[NEAR_PARAM], NEAR_PARAM, 2)
+        _check_position(lon, lat, NEAR_PARAM)
+        radius = _parse_number(args.get(RADIUS_PARAM) or "", RADIUS_PARAM)
+        if radius <= 0:
+            raise ValueError(f"'{RADIUS_PARAM}' must be positive")
+        filters[NEAR_PARAM] = (lon, lat)
+        filters[RADIUS_PARAM] = radius
+    if args.get(BBOX_PARAM):
+        min_lon, min_lat, max_lon, max_lat = _parse_coordinates(args[BBOX_PARAM], BBOX_PARAM, 4)
+        _check_position(min_lon, min_lat, BBOX_PARAM)
+        _check_position(max_lon, max_lat, BBOX_PARAM)
+        if min_lon >= max_lon or min_lat >= max_lat:
+            raise ValueError(f"'{BBOX_PARAM}' minimums must be below its maximums")
+        filters[BBOX_PARAM] = (min_lon, min_lat, max_lon, max_lat)
+    return filters
+
+
+def parse_search_filters(args: dict) -> dict:
+    """
+    Parses the query parameters of a metadata search.
+
+    Args:
+        args (dict): query parameters; any of make, model, lens_model (exact match), iso,
+            focal_length (exact match), iso_min, iso_max, focal_length_min, focal_length_max,
+            start, end (ISO 8601 capture time range without a timezone, inclusive), near and radius ("<lat>,<lon>"
+            and meters) or bbox ("<min_lon>,<min_lat>,<max_lon>,<max_lat>")
+
+    Returns:
+        dict: parsed filters, keyed by parameter name
+
+    Raises:
+        ValueError: if a parameter has an invalid value
+    """
+    filters = {}
+    for field in STRING_SEARCH_FIELDS:
+        if args.get(field):
+            filters[field] = args[field]
+    for field in NUMBER_SEARCH_FIELDS:
+        for param in (field, f"{field}_min", f"{field}_max"):
+            if args.get(param):
+                filters[param] = _parse_number(args[param], param)
+    for param in (START_PARAM, END_PARAM):
+        if args.get(param):
+            filters[param] = _parse_datetime(args[param], param)
+    filters.update(_parse_location_filters(args))
+    return filters
+
+
+def parse_page_size(value: str | None) -> int:
+    """
+    Parses the page size of a search.
+
+    Raises:
+        ValueError: if value is not an integer between 1 and MAX_PAGE_SIZE
+    """
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"'{LIMIT_PARAM}' must be an integer between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def encode_cursor(captured_at: datetime.datetime | None, doc_id) -> str:
+    """
+    Encodes the sort key of the last returned document as an opaque page cursor.
+
+    Args:
+        captured_at (datetime | None): capture time of the document
+        doc_id: id of the document
+
+    Returns:
+        str: url-safe cursor
+    """
+    key = {"t": captured_at.isoformat() if captured_at else None, "id": str(doc_id)}
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime | None, str]:
+    """
+    Decodes a page cursor created by encode_cursor.
+
+    Args:
+        cursor (str): cursor
+
+    Returns:
+        tuple[datetime | None, str]: capture time and id of the last returned document
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        captured_at = datetime.datetime.fromisoformat(key["t"]) if key["t"] else None
+        doc_id = str(key["id"])
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid page cursor")
+    # capture times are stored without a timezone, see _parse_datetime
+    if captured_at is not None and captured_at.tzinfo is not None:
+        raise ValueError("Invalid page cursor")
+    return captured_at, doc_id
+
+
+def _matches(document: dict, user: str, filters: dict) -> bool:
+    """
+    Checks a document against search filters, with the same semantics as MongoMetadataStore.
+    """
+    if document[USER_FIELD] != user:
+        return False
+    for field in STRING_SEARCH_FIELDS:
+        if field in filters and document.get(field) != filters[field]:
+            return False
+    for field in NUMBER_SEARCH_FIELDS:
+        value = document.get(field)
+        if field in filters and value != filters[field]:
+            return False
+        if f"{field}_min" in filters and (value is None or value < filters[f"{field}_min"]):
+            return False
+        if f"{field}_max" in filters and (value is None or value > filters[f"{field}_max"]):
+            return False
+    captured_at = document.get(CAPTURED_AT_FIELD)
+    if START_PARAM in filters and (captured_at is None or captured_at < filters[START_PARAM]):
+        return False
+    if END_PARAM in filters and (captured_at is None or captured_at > filters[END_PARAM]):
+        return False
+    if NEAR_PARAM in filters or BBOX_PARAM in filters:
+        location = document.get(LOCATION_FIELD)
+        if location is None:
+            return False
+        lon, lat = location["coordinates"]
+        if NEAR_PARAM in filters:
+            distance = haversine_distance_m(lon, lat, *filters[NEAR_PARAM])
+            if distance > filters[RADIUS_PARAM]:
+                return False
+        if BBOX_PARAM in filters:
+            min_lon, min_lat, max_lon, max_lat = filters[BBOX_PARAM]
+            if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+                return False
+    return True
+
+
+class MetadataStore(ABC):
+    """
+    Interface for image metadata storage backends.
+    """
+
+    @abstractmethod
+    def save_upload(self, user: str, upload_id: str, metadata: dict[str, dict]) -> int:
+        """
+        Stores the metadata of all images of an upload.
+
+        Args:
+            user (str): username of the uploader
+            upload_id (str): id of the upload request
+            metadata (dict[str, dict]): metadata of each image, keyed by image filename
+
+        Returns:
+            int: number of stored documents
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_upload(self, user: str, upload_id: str) -> list[dict]:
+        """
+        Gets the stored metadata of an upload, ordered by filename.
+
+        Args:
+            user (str): username of the uploader
+            upload_id (str): id of the upload request
+
+        Returns:
+            list[dict]: stored documents, empty if the user has no such upload
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(
+        self, user: str, filters: dict, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None
+    ) -> tuple[list[dict], str | None]:
+        """
+        Searches a user's stored metadata, ordered by capture time (images without one first).
+
+        Args:
+            user (str): username of the uploader
+            filters (dict): filters returned by parse_search_filters
+            limit (int): maximum number of documents to return
+            cursor (str | None): cursor returned with the previous page, None for the first page
+
+        Returns:
+            tuple[list[dict], str | None]: matching documents, cursor of the next page or None if
+                this is the last page
+
+        Raises:
+            ValueError: if the cursor is invalid
+        """
+        raise NotImplementedError
+
+
+class MongoMetadataStore(MetadataStore):
+    """
+    Stores metadata in a MongoDB collection, writing each upload with one insert_many round trip
+    per batch of images.
+    """
+
+    def __init__(
+        self, mongo: MongoConnection, collection_name: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        """
+        Args:
+            mongo (MongoConnection): lazily connected MongoDB connection
+            collection_name (str): name of the metadata collection
+            batch_size (int): maximum number of documents per insert_many call
+        """
+        self.mongo = mongo
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        mongo.on_connect(self._ensure_indexes)
+
+    @property
+    def collection(self) -> Collection:
+        return self.mongo.collection(self.collection_name)
+
+    def _ensure_indexes(self, mongo_client: MongoClient) -> None:
+        collection = create_collection(
+            create_db(mongo_client, self.mongo.db_name), self.collection_name
+        )
+        log.debug(f"Ensuring indexes on collection '{self.collection_name}'")
+        collection.create_index(
+            [(USER_FIELD, ASCENDING), (UPLOAD_ID_FIELD, ASCENDING), (FILENAME_FIELD, ASCENDING)]
+        )
+        sort_key = [(CAPTURED_AT_FIELD, ASCENDING), (ID_FIELD, ASCENDING)]
+        collection.create_index(
+            [(USER_FIELD, ASCENDING), (MAKE_FIELD, ASCENDING), (MODEL_FIELD, ASCENDING), *sort_key]
+        )
+        # equality filters: (user, field) prefix, then the sort key
+        for field in (MODEL_FIELD, LENS_MODEL_FIELD, ISO_FIELD, FOCAL_LENGTH_FIELD):
+            collection.create_index([(USER_FIELD, ASCENDING), (field, ASCENDING), *sort_key])
+        # range filters: the sort key before the ranged field, so no in-memory sort is needed;
+        # the (user, captured_at, _id) prefix also serves unfiltered and capture time searches
+        for field in NUMBER_SEARCH_FIELDS:
+            collection.create_index([(USER_FIELD, ASCENDING), *sort_key, (field, ASCENDING)])
+        # documents without a location are not indexed by 2dsphere indexes
+        collection.create_index([(USER_FIELD, ASCENDING), (LOCATION_FIELD, GEOSPHERE)])
+
+    def save_upload(self, user: str, upload_id: str, metadata: dict[str, dict]) -> int:
+        documents = create_documents(user, upload_id, metadata)
+        collection = self.collection
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start : start + self.batch_size]
+            log.debug(f"Inserting {len(batch)} metadata documents of upload '{upload_id}'")
+            collection.insert_many(batch, ordered=False)
+        return len(documents)
+
+    def get_upload(self, user: str, upload_id: str) -> list[dict]:
+        cursor = self.collection.find(
+            {USER_FIELD: user, UPLOAD_ID_FIELD: upload_id}, sort=[(FILENAME_FIELD, ASCENDING)]
+        )
+        return list(cursor)
+
+    def search(
+        self, user: str, filters: dict, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None
+    ) -> tuple[list[dict], str | None]:
+        query = [self._build_filter(user, filters)]
+        if cursor is not None:
+            query.append(self._after_cursor(cursor))
+        documents = list(
+            self.collection.find(
+                {"$and": query},
+                sort=[(CAPTURED_AT_FIELD, ASCENDING), (ID_FIELD, ASCENDING)],
+                limit=limit + 1,
+            )
+        )
+        return _paginate(documents, limit)
+
+    @staticmethod
+    def _build_filter(user: str, filters: dict) -> dict:
+        query = {USER_FIELD: user}
+        for field in (*STRING_SEARCH_FIELDS, *NUMBER_SEARCH_FIELDS):
+            if field in filters:
+                query[field] = filters[field]
+        for field in NUMBER_SEARCH_FIELDS:
+            bounds = {}
+            if f"{field}_min" in filters:
+                bounds["$gte"] = filters[f"{field}_min"]
+            if f"{field}_max" in filters:
+                bounds["$lte"] = filters[f"{field}_max"]
+            if bounds:
+                query.setdefault("$and", []).append({field: bounds})
+        captured_at = {}
+        if START_PARAM in filters:
+            captured_at["$gte"] = filters[START_PARAM]
+        if END_PARAM in filters:
+            captured_at["$lte"] = filters[END_PARAM]
+        if captured_at:
+            query[CAPTURED_AT_FIELD] = captured_at
+        if NEAR_PARAM in filters:
+            radius_radians = filters[RADIUS_PARAM] / EARTH_RADIUS_M
+            query.setdefault("$and", []).append(
+                {
+                    LOCATION_FIELD: {
+                        "$geoWithin": {"$centerSphere": [list(filters[NEAR_PARAM]), radius_radians]}
+                    }
+                }
+            )
+        if BBOX_PARAM in filters:
+            min_lon, min_lat, max_lon, max_lat = filters[BBOX_PARAM]
+            ring = [
+                [min_lon, min_lat],
+                [max_lon, min_lat],
+                [max_lon, max_lat],
+                [min_lon, max_lat],
+                [min_lon, min_lat],
+            ]
+            query.setdefault("$and", []).append(
+                {
+                    LOCATION_FIELD: {
+                        "$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}
+                    }
+                }
+            )
+        return query
+
+    @staticmethod
+    def _after_cursor(cursor: str) -> dict:
+        """
+        Returns the filter selecting documents after a cursor in (captured_at, _id) order, where
+        documents without a capture time (null) sort first.
+        """
+        captured_at, doc_id = decode_cursor(cursor)
+        try:
+            doc_id = ObjectId(doc_id)
+        except InvalidId:
+            raise ValueError("Invalid page cursor")
+        if captured_at is None:
+            return {
+                "$or": [
+                    {CAPTURED_AT_FIELD: None, ID_FIELD: {"$gt": doc_id}},
+                    {CAPTURED_AT_FIELD: {"$type": "date"}},
+                ]
+            }
+        return {
+            "$or": [
+                {CAPTURED_AT_FIELD: {"$gt": captured_at}},
+                {CAPTURED_AT_FIELD: captured_at, ID_FIELD: {"$gt": doc_id}},
+            ]
+        }
+
+
+def _sort_key(document: dict) -> tuple:
+    """
+    Returns:
+        tuple: (captured_at, _id) sort key, with documents without a capture time first
+    """
+    captured_at = document.get(CAPTURED_AT_FIELD)
+    return (captured_at is not None, captured_at or datetime.datetime.min, document[ID_FIELD])
+
+
+def _paginate(documents: list[dict], limit: int) -> tuple[list[dict], str | None]:
+    """
+    Splits limit + 1 fetched documents into a page and the cursor of the next page.
+    """
+    if len(documents) <= limit:
+        return documents, None
+    page = documents[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.get(CAPTURED_AT_FIELD), last[ID_FIELD])
+
+
+class InMemoryMetadataStore(MetadataStore):
+    """
+    Stores metadata in a process-local list. Intended for tests, local development and load tests.
+    """
+
+    def __init__(self):
+        self._documents = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def save_upload(self, user: str, upload_id: str, metadata: dict[str, dict]) -> int:
+        documents = create_documents(user, upload_id, copy.deepcopy(metadata))
+        with self._lock:
+            for document in documents:
+                document[ID_FIELD] = next(self._ids)
+            self._documents.extend(documents)
+        return len(documents)
+
+    def get_upload(self, user: str, upload_id: str) -> list[dict]:
+        with self._lock:
+            documents = [
+                copy.deepcopy(document)
+                for document in self._documents
+                if document[USER_FIELD] == user and document[UPLOAD_ID_FIELD] == upload_id
+            ]
+        return sorted(documents, key=lambda document: document[FILENAME_FIELD])
+
+    def search(
+        self, user: str, filters: dict, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None
+    ) -> tuple[list[dict], str | None]:
+        after = None
+        if cursor is not None:
+            captured_at, doc_id = decode_cursor(cursor)
+            try:
+                after = _sort_key({CAPTURED_AT_FIELD: captured_at, ID_FIELD: int(doc_id)})
+            except ValueError:
+                raise ValueError("Invalid page cursor")
+        with self._lock:
+            documents = [doc for doc in self._documents if _matches(doc, user, filters)]
+        documents.sort(key=_sort_key)
+        if after is not None:
+            documents = [doc for doc in documents if _sort_key(doc) > after]
+        return _paginate([copy.deepcopy(doc) for doc in documents[: limit + 1]], limit)
+
+
+def create_metadata_store(
+    backend: str,
+    mongo: MongoConnection,
+    collection_name: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> MetadataStore:
+    """
+    Creates the metadata store for a storage backend.
+
+    Args:
+        backend (str): "mongo" or "memory"
+        mongo (MongoConnection): MongoDB connection, used by the mongo backend
+        collection_name (str): name of the metadata collection, used by the mongo backend
+        batch_size (int): maximum number of documents per insert, used by the mongo backend
+
+    Returns:
+        MetadataStore: metadata store for the backend
+
+    Raises:
+        ValueError: if backend is not a known storage backend
+    """
+    if backend == MONGO_BACKEND:
+        return MongoMetadataStore(mongo, collection_name, batch_size)
+    if backend == MEMORY_BACKEND:
+        return InMemoryMetadataStore()
+    raise ValueError(f"Unknown storage backend '{backend}'")
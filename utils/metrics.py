@@ -0,0 +1,137 @@
+"""
+In-process metrics: named latency histograms with fixed buckets, exported as JSON by the
+/metrics endpoint. Each worker process keeps its own metrics.
+
+Classes:
+    Histogram: thread-safe histogram of observed values
+
+Functions:
+    histogram(name: str) -> Histogram
+    snapshot() -> dict
+    reset() -> None
+"""
+
+import bisect
+import threading
+
+
+# bucket upper bounds in milliseconds; values above the last bound go to an overflow bucket
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    Thread-safe histogram of observed values with fixed bucket upper bounds.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS_MS):
+        """
+        Args:
+            buckets (tuple): sorted bucket upper bounds
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Records a value.
+
+        Args:
+            value (float): observed value, e.g. a latency in milliseconds
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile as the upper bound of the bucket containing it.
+
+        Args:
+            q (float): quantile in [0, 1]
+
+        Returns:
+            float: estimated quantile, 0 if nothing was observed
+        """
+        with self._lock:
+            counts, total, max_value = list(self._counts), self._count, self._max
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else max_value
+        return max_value
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: count, sum, max, estimated p50/p99 and cumulative bucket counts keyed by
+                upper bound ("+Inf" for the overflow bucket)
+        """
+        with self._lock:
+            counts, total, value_sum, max_value = (
+                list(self._counts),
+                self._count,
+                self._sum,
+                self._max,
+            )
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": total,
+            "sum": value_sum,
+            "max": max_value,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    """
+    Returns the histogram registered under a name, creating it on first use.
+
+    Args:
+        name (str): metric name, e.g. "mongo.command.find.ms"
+
+    Returns:
+        Histogram: the named histogram
+    """
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram()
+        return _histograms[name]
+
+
+def snapshot() -> dict:
+    """
+    Returns:
+        dict: snapshots of all registered histograms keyed by name
+    """
+    with _lock:
+        histograms = dict(_histograms)
+    return {name: hist.snapshot() for name, hist in sorted(histograms.items())}
+
+
+def reset() -> None:
+    """
+    Removes all registered histograms.
+    """
+    with _lock:
+        _histograms.clear()
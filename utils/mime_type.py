@@ -13,6 +13,12 @@ MIME_TYPES = {
     "jpeg": "image/jpeg",
     "png": "image/png",
     "json": "application/json",
+    "jsonl": "application/jsonl",
+    "csv": "text/csv",
+    # binary columnar metadata, see utils.columnar
+    "cols": "application/octet-stream",
+    # binary EXIF values written next to the metadata json files
+    "bin": "application/octet-stream",
 }
 
 
@@ -27,7 +33,7 @@ def get_mime_type(file_path: str) -> str:
         str: MIME type of file
 
     Raises:
-        ValueError: if file is not accepted file type (image or json)
+        ValueError: if file is not accepted file type (image, metadata or binary EXIF value)
     """
     _, file_extension = os.path.splitext(file_path)
     mime_type = MIME_TYPES.get(file_extension[1:])
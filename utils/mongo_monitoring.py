@@ -0,0 +1,135 @@
+"""
+pymongo event listeners recording MongoDB command latency and connection pool checkout wait time,
+and logging slow operations together with the id of the request that issued them.
+
+Classes:
+    CommandLatencyListener(monitoring.CommandListener)
+    PoolCheckoutListener(monitoring.ConnectionPoolListener)
+
+Functions:
+    create_event_listeners(slow_op_threshold_ms: float) -> list
+"""
+
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+from utils import metrics
+from utils.request_context import get_request_id
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SLOW_OP_THRESHOLD_MS = 100
+
+POOL_CHECKOUT_METRIC = "mongo.pool.checkout_wait.ms"
+
+
+def command_metric(command_name: str) -> str:
+    """
+    Returns:
+        str: name of the latency histogram of a MongoDB command
+    """
+    return f"mongo.command.{command_name}.ms"
+
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """
+    Records the latency of every MongoDB command in a per-command histogram and logs commands
+    slower than a threshold. Events are published on the thread running the command, so the
+    request id of the current request is available.
+    """
+
+    def __init__(self, slow_op_threshold_ms: float = DEFAULT_SLOW_OP_THRESHOLD_MS):
+        """
+        Args:
+            slow_op_threshold_ms (float): commands taking at least this long are logged
+        """
+        self.slow_op_threshold_ms = slow_op_threshold_ms
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event, f"failed ({event.failure})")
+
+    def _record(self, event, outcome: str) -> None:
+        duration_ms = event.duration_micros / 1000
+        metrics.histogram(command_metric(event.command_name)).observe(duration_ms)
+        if duration_ms >= self.slow_op_threshold_ms:
+            log.warning(
+                f"request {get_request_id()}: slow MongoDB command '{event.command_name}' "
+                f"{outcome} in {duration_ms:.1f} ms on {event.connection_id}"
+            )
+
+
+class PoolCheckoutListener(monitoring.ConnectionPoolListener):
+    """
+    Records how long threads wait to check a connection out of the pool, which grows when the
+    pool is too small for the number of concurrent requests.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        self._observe()
+
+    def connection_check_out_failed(self, event) -> None:
+        self._observe()
+        log.warning(
+            f"request {get_request_id()}: failed to check out MongoDB connection "
+            f"to {event.address} -> {event.reason}"
+        )
+
+    def _observe(self) -> None:
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return
+        self._local.started = None
+        metrics.histogram(POOL_CHECKOUT_METRIC).observe((time.perf_counter() - started) * 1000)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+    def connection_checked_in(self, event) -> None:
+        pass
+
+
+def create_event_listeners(slow_op_threshold_ms: float = DEFAULT_SLOW_OP_THRESHOLD_MS) -> list:
+    """
+    Creates the listeners to register on a MongoClient.
+
+    Args:
+        slow_op_threshold_ms (float): commands taking at least this long are logged
+
+    Returns:
+        list: command and connection pool listeners
+    """
+    return [CommandLatencyListener(slow_op_threshold_ms), PoolCheckoutListener()]
@@ -1,30 +1,39 @@
 """
 MongoDB utility functions
 
+Classes:
+    MongoConnection: Lazily creates a fork-safe MongoClient for a Flask app
+
 Functions:
     create_mongo_client: Creates a MongoClient instance
     create_db: Creates a local MongoDB database object
     create_collection: Creates a local MongoDB collection
+    create_user_indexes: Ensures the indexes required by the users collection exist
     add_user: Adds a user to a MongoDB collection
     get_user: Gets a user from a MongoDB collection
+    update_user_password: Replaces the password hash of a user in a MongoDB collection
     delete_user: Deletes a user from a MongoDB collection
     close_connection: Closes a MongoClient connection
 
 Exceptions:
     MongoServerConnectionError: If the MongoClient instance fails to connect to the MongoDB server
+    UserExistsError: If a user with the same username already exists
 """
 
 import logging
 import os
+import threading
+from typing import Callable
 
 from dotenv import load_dotenv
 
 from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo.errors import ServerSelectionTimeoutError, DuplicateKeyError
 
-from models.users import USERNAME_FIELD, PASSWORD_FIELD
+from utils.mongo_monitoring import create_event_listeners, DEFAULT_SLOW_OP_THRESHOLD_MS
+from models.users import USERNAME_FIELD, PASSWORD_FIELD, UserExistsError
 
 
 log = logging.getLogger(__name__)
@@ -35,18 +44,31 @@ MONGO_USER = os.getenv("MONGO_USER")
 MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
 
 TIMEOUT_MS = 5000
+DEFAULT_MAX_POOL_SIZE = 100
+DEFAULT_MIN_POOL_SIZE = 0
 
 
 class MongoServerConnectionError(Exception):
     pass
 
 
-def create_mongo_client(mongo_url: str) -> MongoClient:
+def create_mongo_client(
+    mongo_url: str,
+    max_pool_size: int = DEFAULT_MAX_POOL_SIZE,
+    min_pool_size: int = DEFAULT_MIN_POOL_SIZE,
+    verify_connection: bool = True,
+    slow_op_threshold_ms: float = DEFAULT_SLOW_OP_THRESHOLD_MS,
+) -> MongoClient:
     """
     Creates a MongoClient instance
 
     Args:
         mongo_url (str): The URL to connect to MongoDB
+        max_pool_size (int): Maximum number of connections in the client's connection pool
+        min_pool_size (int): Minimum number of connections kept open in the connection pool
+        verify_connection (bool): If True, block until the server answers a round trip; if False,
+            the client connects in the background on first use
+        slow_op_threshold_ms (float): commands taking at least this long are logged as slow
 
     Returns:
         MongoClient: connection to MongoDB server instance
@@ -59,10 +81,14 @@ def create_mongo_client(mongo_url: str) -> MongoClient:
         mongo_url,
         connectTimeoutMS=TIMEOUT_MS,
         serverSelectionTimeoutMS=TIMEOUT_MS,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min_pool_size,
+        connect=verify_connection,
+        event_listeners=create_event_listeners(slow_op_threshold_ms),
         username=MONGO_USER,
         password=MONGO_PASSWORD,
     )
-    if not _is_connected_to_server(mongo_client):
+    if verify_connection and not _is_connected_to_server(mongo_client):
         raise MongoServerConnectionError(f"Failed to connect to MongoDB server at '{mongo_url}'")
     return mongo_client
 
@@ -87,6 +113,124 @@ def _is_connected_to_server(mongo_client: MongoClient) -> bool:
     return True
 
 
+class MongoConnection:
+    """
+    Flask extension that creates its MongoClient lazily, on first use, instead of at import time.
+
+    MongoClient is not fork-safe, so the client is tied to the process that created it: a worker
+    forked by a pre-fork WSGI server (e.g. gunicorn) discards any client inherited from its
+    parent and creates its own on first use.
+    """
+
+    def __init__(self, app=None):
+        self.mongo_url = None
+        self.db_name = None
+        self.max_pool_size = DEFAULT_MAX_POOL_SIZE
+        self.min_pool_size = DEFAULT_MIN_POOL_SIZE
+        self.slow_op_threshold_ms = DEFAULT_SLOW_OP_THRESHOLD_MS
+        self._connect_callbacks = []
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Reads connection settings from the app config. Does not contact the server.
+
+        Args:
+            app (Flask): Flask app whose config defines MONGO_URI, DB_NAME, MONGO_MAX_POOL_SIZE,
+                MONGO_MIN_POOL_SIZE and MONGO_SLOW_OP_THRESHOLD_MS
+        """
+        self.mongo_url = app.config["MONGO_URI"]
+        self.db_name = app.config["DB_NAME"]
+        self.max_pool_size = app.config.get("MONGO_MAX_POOL_SIZE", DEFAULT_MAX_POOL_SIZE)
+        self.min_pool_size = app.config.get("MONGO_MIN_POOL_SIZE", DEFAULT_MIN_POOL_SIZE)
+        self.slow_op_threshold_ms = app.config.get(
+            "MONGO_SLOW_OP_THRESHOLD_MS", DEFAULT_SLOW_OP_THRESHOLD_MS
+        )
+        app.extensions["mongo"] = self
+
+    def on_connect(self, callback: Callable[[MongoClient], None]) -> Callable[[MongoClient], None]:
+        """
+        Registers a callback run once for every new client, before it is handed out,
+        e.g. to ensure indexes exist. If a callback raises, the client is closed and the next
+        access creates a new one. Can be used as a decorator.
+
+        Args:
+            callback (Callable[[MongoClient], None]): function called with the new client
+
+        Returns:
+            Callable[[MongoClient], None]: the callback, unchanged
+        """
+        self._connect_callbacks.append(callback)
+        return callback
+
+    @property
+    def client(self) -> MongoClient:
+        """
+        Returns the MongoClient of the current process, creating it if necessary.
+        """
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    mongo_client = create_mongo_client(
+                        self.mongo_url,
+                        max_pool_size=self.max_pool_size,
+                        min_pool_size=self.min_pool_size,
+                        verify_connection=False,
+                        slow_op_threshold_ms=self.slow_op_threshold_ms,
+                    )
+                    try:
+                        for callback in self._connect_callbacks:
+                            callback(mongo_client)
+                    except BaseException:
+                        # the next access retries with a new client, so release this one
+                        mongo_client.close()
+                        raise
+                    self._client = mongo_client
+                    self._pid = pid
+        return self._client
+
+    @property
+    def db(self) -> Database:
+        """
+        Returns the app's database on the current process's client.
+        """
+        return create_db(self.client, self.db_name)
+
+    def collection(self, collection_name: str) -> Collection:
+        """
+        Returns a collection of the app's database on the current process's client.
+
+        Args:
+            collection_name (str): The name of the collection
+        """
+        return create_collection(self.db, collection_name)
+
+    def close(self) -> None:
+        """
+        Closes the current process's client, if one was created.
+        """
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                close_connection(self._client)
+            self._client = None
+            self._pid = None
+
+    def _reset(self) -> None:
+        """
+        Drops the client and lock inherited from the parent process after a fork.
+        """
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+
 def create_db(mongo_client: MongoClient, db_name: str) -> Database:
     """
     Creates a local MongoDB database object (note this does not create a database on the server)
@@ -119,6 +263,19 @@ def create_collection(db: Database, collection_name: str) -> Collection:
     return collection
 
 
+def create_user_indexes(users: Collection) -> None:
+    """
+    Ensures a unique index on the username field of a users collection, so that lookups by
+    username do not scan the collection and duplicate usernames are rejected by the server.
+    This is a no-op if the index already exists.
+
+    Args:
+        users (Collection): A MongoDB collection
+    """
+    log.debug(f"Ensuring unique index on '{USERNAME_FIELD}' in collection '{users.name}'")
+    users.create_index(USERNAME_FIELD, unique=True)
+
+
 # TODO: abstract out collection from args
 def add_user(users: Collection, username: str, password: str) -> None:
     """
@@ -128,9 +285,15 @@ def add_user(users: Collection, username: str, password: str) -> None:
         users (Collection): A MongoDB collection
         username (str): The username of the user to add
         password (str): The password of the user to add
+
+    Raises:
+        UserExistsError: If a user with the same username already exists
     """
     log.debug(f"Adding user '{username}' to collection '{users.name}'")
-    users.insert_one({USERNAME_FIELD: username, PASSWORD_FIELD: password})
+    try:
+        users.insert_one({USERNAME_FIELD: username, PASSWORD_FIELD: password})
+    except DuplicateKeyError as e:
+        raise UserExistsError(f"User '{username}' already exists") from e
 
 
 def get_user(users: Collection, username: str) -> dict:
@@ -149,6 +312,19 @@ def get_user(users: Collection, username: str) -> dict:
     return user
 
 
+def update_user_password(users: Collection, username: str, password: str) -> None:
+    """
+    Replaces the password hash of a user in a MongoDB collection
+
+    Args:
+        users (Collection): A MongoDB collection
+        username (str): The username of the user to update
+        password (str): The new password hash
+    """
+    log.debug(f"Updating password of user '{username}' in collection '{users.name}'")
+    users.update_one({USERNAME_FIELD: username}, {"$set": {PASSWORD_FIELD: password}})
+
+
 def delete_user(users: dict, username: str) -> None:
     """
     Deletes a user from a MongoDB collection
@@ -0,0 +1,161 @@
+"""
+Streaming reader for multipart/form-data request bodies. Parts are yielded as soon as their
+headers arrive and their data is read from the request stream while it is consumed, so files can
+be written to disk, and processed, while later parts are still being uploaded.
+
+Classes:
+    Part: a part of a multipart body
+    MultipartReader: iterates over the parts of a multipart body
+
+Functions:
+    get_boundary(content_type: str | None) -> bytes | None
+
+Exceptions:
+    MalformedMultipartError(Exception)
+    LargeUploadError(Exception)
+"""
+
+from typing import BinaryIO, Iterator
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Data, Epilogue, Field, File, NEED_DATA
+
+
+READ_SIZE = 64 * 1024
+
+
+class MalformedMultipartError(Exception):
+    """
+    Exception raised for request bodies that are not valid multipart/form-data.
+    """
+
+    pass
+
+
+class LargeUploadError(Exception):
+    """
+    Exception raised when a request body exceeds the size limit.
+    """
+
+    pass
+
+
+def get_boundary(content_type: str | None) -> bytes | None:
+    """
+    Returns the boundary of a multipart/form-data content type.
+
+    Args:
+        content_type (str | None): Content-Type header of the request
+
+    Returns:
+        bytes | None: boundary, None if the content type is not multipart/form-data
+    """
+    mimetype, options = parse_options_header(content_type)
+    boundary = options.get("boundary")
+    if mimetype != "multipart/form-data" or not boundary:
+        return None
+    return boundary.encode("latin-1")
+
+
+class Part:
+    """
+    A part of a multipart body. Its data can only be read once, before advancing to the next
+    part.
+
+    Attributes:
+        name (str): form field name
+        filename (str | None): filename, None for parts that are not files
+        mimetype (str): content type of the part
+    """
+
+    def __init__(self, name: str, filename: str | None, mimetype: str, chunks: Iterator[bytes]):
+        self.name = name
+        self.filename = filename
+        self.mimetype = mimetype
+        self._chunks = chunks
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """
+        Yields the part's data as it is read from the request stream.
+
+        Raises:
+            MalformedMultipartError: if the body ends before the part does
+            LargeUploadError: if the body exceeds the size limit
+        """
+        yield from self._chunks
+
+
+class MultipartReader:
+    """
+    Iterates over the parts of a multipart/form-data body read from a stream.
+    """
+
+    def __init__(self, stream: BinaryIO, boundary: bytes, size_limit: int):
+        """
+        Args:
+            stream (BinaryIO): request body
+            boundary (bytes): multipart boundary, from get_boundary
+            size_limit (int): maximum number of bytes read from stream
+        """
+        self.stream = stream
+        self.size_limit = size_limit
+        self.bytes_read = 0
+        self._decoder = MultipartDecoder(boundary)
+        self._events = self._read_events()
+
+    def __iter__(self) -> Iterator[Part]:
+        """
+        Yields the parts of the body. Data of a part that was not read is skipped.
+
+        Raises:
+            MalformedMultipartError: if the body is not valid multipart/form-data
+            LargeUploadError: if the body exceeds the size limit
+        """
+        for event in self._events:
+            if not isinstance(event, (Field, File)):
+                continue
+            part = Part(
+                event.name,
+                event.filename if isinstance(event, File) else None,
+                event.headers.get("content-type", "text/plain"),
+                self._read_data(),
+            )
+            yield part
+            for _ in part.iter_chunks():
+                pass
+
+    def _read_data(self) -> Iterator[bytes]:
+        for event in self._events:
+            if not isinstance(event, Data):
+                raise MalformedMultipartError("Expected part data")
+            if event.data:
+                yield event.data
+            if not event.more_data:
+                return
+        raise MalformedMultipartError("Body ended within a part")
+
+    def _read_events(self):
+        complete = False
+        while True:
+            try:
+                event = self._decoder.next_event()
+            except ValueError as e:
+                raise MalformedMultipartError(str(e)) from e
+
+            if isinstance(event, Epilogue):
+                return
+            if event is not NEED_DATA:
+                yield event
+                continue
+            if complete:
+                raise MalformedMultipartError("Body ended before the closing boundary")
+
+            data = self.stream.read(READ_SIZE)
+            self.bytes_read += len(data)
+            if self.bytes_read > self.size_limit:
+                raise LargeUploadError(
+                    f"Request body exceeds size limit of {self.size_limit} bytes"
+                )
+            if not data:
+                complete = True
+            self._decoder.receive_data(data or None)
@@ -0,0 +1,149 @@
+"""
+Password hashing on a dedicated, bounded worker pool.
+
+bcrypt hashing is deliberately slow CPU work. Running it on the request threads lets a burst of
+logins occupy every worker, so hashing is done by a small pool of threads (bcrypt releases the
+GIL while hashing) and requests beyond the pool's queue limit are rejected instead of queued
+indefinitely.
+
+Classes:
+    PasswordHasher: Flask extension hashing and verifying passwords on a bounded pool
+
+Exceptions:
+    HasherBusyError(Exception)
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from flask_bcrypt import Bcrypt
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LOG_ROUNDS = 12
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_LIMIT = 16
+
+
+class HasherBusyError(Exception):
+    """
+    Exception raised when the hashing pool and its queue are full.
+    """
+
+    pass
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with bcrypt on a bounded thread pool.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once and at most PASSWORD_HASH_QUEUE_LIMIT more
+    wait for a worker; further calls raise HasherBusyError immediately.
+    """
+
+    def __init__(self, app=None):
+        self.bcrypt = Bcrypt()
+        self.log_rounds = DEFAULT_LOG_ROUNDS
+        self.max_workers = DEFAULT_WORKERS
+        self.queue_limit = DEFAULT_QUEUE_LIMIT
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Reads the bcrypt cost factor and pool bounds from the app config.
+
+        Args:
+            app (Flask): Flask app whose config may define BCRYPT_LOG_ROUNDS,
+                PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_LIMIT
+        """
+        self.bcrypt.init_app(app)
+        self.log_rounds = app.config.get("BCRYPT_LOG_ROUNDS", DEFAULT_LOG_ROUNDS)
+        self.max_workers = app.config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS)
+        self.queue_limit = app.config.get("PASSWORD_HASH_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+        self._executor.shutdown(wait=False)
+        self._reset()
+        app.extensions["password_hasher"] = self
+
+    def generate_password_hash(self, password: str) -> str:
+        """
+        Hashes a password with the configured cost factor.
+
+        Args:
+            password (str): plaintext password
+
+        Returns:
+            str: bcrypt hash
+
+        Raises:
+            HasherBusyError: if the hashing pool is saturated
+        """
+        pw_hash = self._run(self.bcrypt.generate_password_hash, password, self.log_rounds)
+        return pw_hash.decode("utf-8")
+
+    def check_password_hash(self, pw_hash: str, password: str) -> bool:
+        """
+        Checks a password against a bcrypt hash.
+
+        Args:
+            pw_hash (str): bcrypt hash
+            password (str): plaintext password
+
+        Returns:
+            bool: True if the password matches
+
+        Raises:
+            HasherBusyError: if the hashing pool is saturated
+            ValueError: if pw_hash is not a valid bcrypt hash
+        """
+        return self._run(self.bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        """
+        Checks whether a bcrypt hash was made with a different cost factor than the configured one.
+
+        Args:
+            pw_hash (str): bcrypt hash, e.g. '$2b$12$...'
+
+        Returns:
+            bool: True if the hash should be regenerated
+        """
+        try:
+            return int(pw_hash.split("$")[2]) != self.log_rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, fn: Callable, *args):
+        """
+        Runs fn on the hashing pool and waits for its result.
+
+        Raises:
+            HasherBusyError: if all workers are busy and the queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            log.warning("Password hashing pool saturated, rejecting request")
+            raise HasherBusyError("Password hashing pool is saturated")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _reset(self) -> None:
+        """
+        Creates a fresh pool, e.g. after init_app or in a forked child, whose inherited pool has
+        no running threads.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="password-hasher"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_limit)
@@ -0,0 +1,31 @@
+"""
+Request-scoped context shared with code that has no access to the Flask request, such as
+pymongo event listeners.
+
+Functions:
+    set_request_id(req_id: str) -> None
+    get_request_id() -> str | None
+"""
+
+from contextvars import ContextVar
+
+
+_request_id = ContextVar("request_id", default=None)
+
+
+def set_request_id(req_id: str) -> None:
+    """
+    Sets the id of the request being handled by the current thread.
+
+    Args:
+        req_id (str): request id
+    """
+    _request_id.set(req_id)
+
+
+def get_request_id() -> str | None:
+    """
+    Returns:
+        str | None: id of the request being handled by the current thread, if any
+    """
+    return _request_id.get()
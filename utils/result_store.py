@@ -0,0 +1,316 @@
+"""
+Storage of processed upload results (zipped images and metadata), so a client whose connection
+dropped can download the result again, or resume the download with HTTP Range requests, instead
+of re-running the whole pipeline. Results expire after a configurable time. Like the other stores,
+the backend is selected with STORE_BACKEND.
+
+Classes:
+    ResultStore: interface implemented by all result storage backends
+    GridFSResultStore: stores results in GridFS in the app's MongoDB database
+    InMemoryResultStore: stores results in a process-local dictionary
+
+Functions:
+    create_result_store(backend: str, mongo: MongoConnection, bucket_name: str,
+        ttl: datetime.timedelta, purge_interval_s: float) -> ResultStore
+"""
+
+import datetime
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from typing import BinaryIO
+from abc import ABC, abstractmethod
+
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo import MongoClient, ASCENDING
+
+from utils.mongo_utils import MongoConnection, create_db
+from utils.user_store import MONGO_BACKEND, MEMORY_BACKEND
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = datetime.timedelta(hours=24)
+DEFAULT_PURGE_INTERVAL_S = 300
+# larger than the GridFS default of 255 KB, to reduce round trips when storing large archives
+CHUNK_SIZE_BYTES = 1024 * 1024
+
+USER_FIELD = "metadata.user"
+UPLOAD_ID_FIELD = "metadata.upload_id"
+EXPIRES_AT_FIELD = "metadata.expires_at"
+
+
+class ResultStore(ABC):
+    """
+    Interface for result storage backends. Results are stored and expired results are purged by
+    a background writer thread, so responses do not wait for either. Until a result is stored,
+    open serves it from memory.
+    """
+
+    def __init__(self, ttl: datetime.timedelta, purge_interval_s: float):
+        """
+        Args:
+            ttl (datetime.timedelta): time after which a stored result expires
+            purge_interval_s (float): time between purges of expired results
+        """
+        self.ttl = ttl
+        self.purge_interval_s = purge_interval_s
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._queued = queue.Queue()
+        self._pending = {}
+        self._writer = None
+
+    def save(self, user: str, upload_id: str, data: BinaryIO) -> None:
+        """
+        Queues the result of an upload to be stored by the writer thread.
+
+        Args:
+            user (str): username of the uploader
+            upload_id (str): id of the upload request
+            data (BinaryIO): result file, read from its current position to the end
+        """
+        key = (user, upload_id)
+        result = (data.read(), datetime.datetime.utcnow() + self.ttl)
+        with self._lock:
+            self._pending[key] = result
+        self._queued.put((key, result))
+        self._start_writer()
+
+    def flush(self) -> None:
+        """
+        Blocks until all queued results are stored.
+        """
+        self._queued.join()
+
+    def open(self, user: str, upload_id: str) -> tuple[BinaryIO, int] | None:
+        """
+        Opens the stored result of an upload for reading.
+
+        Args:
+            user (str): username of the uploader
+            upload_id (str): id of the upload request
+
+        Returns:
+            tuple[BinaryIO, int] | None: seekable stream and length in bytes of the result,
+                None if the user has no such result or it expired
+        """
+        with self._lock:
+            pending = self._pending.get((user, upload_id))
+        if pending is not None:
+            data, expires_at = pending
+            return (
+                (io.BytesIO(data), len(data)) if expires_at > datetime.datetime.utcnow() else None
+            )
+        return self._open(user, upload_id)
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """
+        Deletes all expired results.
+
+        Returns:
+            int: number of deleted results
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _save(self, user: str, upload_id: str, data: BinaryIO, expires_at: datetime.datetime):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _open(self, user: str, upload_id: str) -> tuple[BinaryIO, int] | None:
+        raise NotImplementedError
+
+    def _start_writer(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._write, name="result-writer", daemon=True)
+            self._writer.start()
+
+    def _write(self) -> None:
+        next_purge = time.monotonic() + self.purge_interval_s
+        while True:
+            try:
+                key, result = self._queued.get(timeout=max(0, next_purge - time.monotonic()))
+                self._store(key, result)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_purge:
+                self._purge()
+                next_purge = time.monotonic() + self.purge_interval_s
+
+    def _store(self, key: tuple[str, str], result: tuple[bytes, datetime.datetime]) -> None:
+        (user, upload_id), (data, expires_at) = key, result
+        try:
+            self._save(user, upload_id, io.BytesIO(data), expires_at)
+        except Exception as e:
+            log.error(f"Failed to store result of upload '{upload_id}' -> {e}")
+        finally:
+            with self._lock:
+                if self._pending.get(key) is result:
+                    del self._pending[key]
+            self._queued.task_done()
+
+    def _purge(self) -> None:
+        try:
+            purged = self.purge_expired()
+            if purged:
+                log.info(f"Purged {purged} expired results")
+        except Exception as e:
+            log.error(f"Failed to purge expired results -> {e}")
+
+
+class GridFSResultStore(ResultStore):
+    """
+    Stores results in a GridFS bucket. Expired files are deleted together with their chunks by
+    purge_expired; a TTL index is not used because it would only delete the file documents and
+    leave their chunks behind.
+    """
+
+    def __init__(
+        self,
+        mongo: MongoConnection,
+        bucket_name: str,
+        ttl: datetime.timedelta = DEFAULT_TTL,
+        purge_interval_s: float = DEFAULT_PURGE_INTERVAL_S,
+    ):
+        """
+        Args:
+            mongo (MongoConnection): lazily connected MongoDB connection
+            bucket_name (str): name of the GridFS bucket
+            ttl (datetime.timedelta): time after which a stored result expires
+            purge_interval_s (float): time between purges of expired results
+        """
+        super().__init__(ttl, purge_interval_s)
+        self.mongo = mongo
+        self.bucket_name = bucket_name
+        mongo.on_connect(self._ensure_indexes)
+
+    @property
+    def bucket(self) -> GridFSBucket:
+        return GridFSBucket(
+            self.mongo.db, bucket_name=self.bucket_name, chunk_size_bytes=CHUNK_SIZE_BYTES
+        )
+
+    @property
+    def files(self):
+        return self.mongo.db[f"{self.bucket_name}.files"]
+
+    def _ensure_indexes(self, mongo_client: MongoClient) -> None:
+        files = create_db(mongo_client, self.mongo.db_name)[f"{self.bucket_name}.files"]
+        log.debug(f"Ensuring indexes on GridFS bucket '{self.bucket_name}'")
+        files.create_index([(USER_FIELD, ASCENDING), (UPLOAD_ID_FIELD, ASCENDING)])
+        files.create_index([(EXPIRES_AT_FIELD, ASCENDING)])
+
+    def _save(self, user: str, upload_id: str, data: BinaryIO, expires_at: datetime.datetime):
+        log.debug(f"Storing result of upload '{upload_id}' in GridFS bucket '{self.bucket_name}'")
+        self.bucket.upload_from_stream(
+            upload_id,
+            data,
+            metadata={"user": user, "upload_id": upload_id, "expires_at": expires_at},
+        )
+
+    def _open(self, user: str, upload_id: str) -> tuple[BinaryIO, int] | None:
+        file = self.files.find_one(
+            {
+                USER_FIELD: user,
+                UPLOAD_ID_FIELD: upload_id,
+                EXPIRES_AT_FIELD: {"$gt": datetime.datetime.utcnow()},
+            },
+            projection={"_id": 1},
+        )
+        if file is None:
+            return None
+        try:
+            stream = self.bucket.open_download_stream(file["_id"])
+        except NoFile:
+            return None
+        return stream, stream.length
+
+    def purge_expired(self) -> int:
+        bucket = self.bucket
+        expired = self.files.find(
+            {EXPIRES_AT_FIELD: {"$lte": datetime.datetime.utcnow()}}, projection={"_id": 1}
+        )
+        purged = 0
+        for file in expired:
+            try:
+                bucket.delete(file["_id"])
+                purged += 1
+            except NoFile:
+                pass
+        return purged
+
+
+class InMemoryResultStore(ResultStore):
+    """
+    Stores results in a process-local dictionary. Intended for tests and local development.
+    """
+
+    def __init__(
+        self,
+        ttl: datetime.timedelta = DEFAULT_TTL,
+        purge_interval_s: float = DEFAULT_PURGE_INTERVAL_S,
+    ):
+        super().__init__(ttl, purge_interval_s)
+        self._results = {}
+        self._results_lock = threading.Lock()
+
+    def _save(self, user: str, upload_id: str, data: BinaryIO, expires_at: datetime.datetime):
+        with self._results_lock:
+            self._results[(user, upload_id)] = (data.read(), expires_at)
+
+    def _open(self, user: str, upload_id: str) -> tuple[BinaryIO, int] | None:
+        with self._results_lock:
+            result = self._results.get((user, upload_id))
+        if result is None or result[1] <= datetime.datetime.utcnow():
+            return None
+        return io.BytesIO(result[0]), len(result[0])
+
+    def purge_expired(self) -> int:
+        now = datetime.datetime.utcnow()
+        with self._results_lock:
+            expired = [key for key, (_, expires_at) in self._results.items() if expires_at <= now]
+            for key in expired:
+                del self._results[key]
+        return len(expired)
+
+
+def create_result_store(
+    backend: str,
+    mongo: MongoConnection,
+    bucket_name: str,
+    ttl: datetime.timedelta = DEFAULT_TTL,
+    purge_interval_s: float = DEFAULT_PURGE_INTERVAL_S,
+) -> ResultStore:
+    """
+    Creates the result store for a storage backend.
+
+    Args:
+        backend (str): "mongo" or "memory"
+        mongo (MongoConnection): MongoDB connection, used by the mongo backend
+        bucket_name (str): name of the GridFS bucket, used by the mongo backend
+        ttl (datetime.timedelta): time after which a stored result expires
+        purge_interval_s (float): time between purges of expired results
+
+    Returns:
+        ResultStore: result store for the backend
+
+    Raises:
+        ValueError: if backend is not a known storage backend
+    """
+    if backend == MONGO_BACKEND:
+        return GridFSResultStore(mongo, bucket_name, ttl, purge_interval_s)
+    if backend == MEMORY_BACKEND:
+        return InMemoryResultStore(ttl, purge_interval_s)
+    raise ValueError(f"Unknown storage backend '{backend}'")
@@ -0,0 +1,275 @@
+"""
+Resumable uploads: a client creates an upload session for a zipfile of known size, sends the
+zipfile in chunks at increasing offsets, can ask for the offset received so far after a failure,
+and finalizes the session once all bytes arrived. Chunks are appended to a file in the session's
+temp folder, and session state is kept next to it on disk, so any worker process on the host can
+serve any request of a session.
+
+Functions:
+    create_session(session_id: str, user: str, size: int, size_limit: int, root: str) -> dict
+    get_session(session_id: str, user: str, root: str) -> dict
+    write_chunk(session_id: str, user: str, offset: int, chunk: BinaryIO,
+        chunk_length: int, chunk_limit: int, root: str) -> int
+    finalize_session(session_id: str, user: str, root: str) -> tuple[str, str, str]
+    delete_session(session_id: str, user: str, root: str) -> None
+
+All functions take the folder sessions are kept in as root, which defaults to UPLOAD_FOLDER.
+
+Exceptions:
+    SessionNotFoundError(Exception)
+    InvalidSessionError(Exception)
+    OffsetMismatchError(Exception)
+    SessionBusyError(Exception)
+    IncompleteUploadError(Exception)
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+from typing import BinaryIO
+
+from utils.constants import UPLOAD_FOLDER
+from utils.upload_utils import create_temp_folder
+
+
+log = logging.getLogger(__name__)
+
+SESSION_FILE = "session.json"
+# assembled zipfile of a session; named like a regular upload so it is unzipped the same way
+UPLOAD_FILE = "upload.zip"
+
+SESSION_ID_PATTERN = re.compile(r"^[\w-]{1,64}$")
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class SessionNotFoundError(Exception):
+    """
+    Exception raised when an upload session does not exist, was finalized, or belongs to
+    another user.
+    """
+
+    pass
+
+
+class InvalidSessionError(Exception):
+    """
+    Exception raised for an invalid upload size, or a chunk that is too large or does not fit
+    in the declared upload size.
+    """
+
+    pass
+
+
+class OffsetMismatchError(Exception):
+    """
+    Exception raised when a chunk's offset is not the number of bytes received so far.
+    """
+
+    def __init__(self, offset: int, expected_offset: int):
+        self.offset = offset
+        self.expected_offset = expected_offset
+        super().__init__(f"Chunk offset {offset} does not match received offset {expected_offset}")
+
+
+class SessionBusyError(Exception):
+    """
+    Exception raised when another request is writing to the same upload session.
+    """
+
+    pass
+
+
+class IncompleteUploadError(Exception):
+    """
+    Exception raised when finalizing an upload session that has not received all bytes.
+    """
+
+    pass
+
+
+def _session_folder(session_id: str, root: str) -> str:
+    if not SESSION_ID_PATTERN.match(session_id):
+        raise SessionNotFoundError(f"Invalid upload session id '{session_id}'")
+    return os.path.join(root, session_id)
+
+
+def _offset(base_folder: str) -> int:
+    return os.path.getsize(os.path.join(base_folder, UPLOAD_FILE))
+
+
+def create_session(
+    session_id: str, user: str, size: int, size_limit: int, root: str = UPLOAD_FOLDER
+) -> dict:
+    """
+    Creates an upload session and its temp folder.
+
+    Args:
+        session_id (str): id of the session, also the name of its temp folder
+        user (str): username of the uploader
+        size (int): size of the zipfile in bytes
+        size_limit (int): maximum allowed size of the zipfile in bytes
+        root (str): folder sessions are kept in
+
+    Returns:
+        dict: session state, with keys id, user, size and offset
+
+    Raises:
+        InvalidSessionError: if size is not positive or over the size limit
+        CreateTempFolderError: if the temp folder cannot be created
+    """
+    if size <= 0 or size > size_limit:
+        raise InvalidSessionError(f"Upload size must be between 1 and {size_limit} bytes")
+
+    base_folder, _ = create_temp_folder(session_id, root)
+    open(os.path.join(base_folder, UPLOAD_FILE), "wb").close()
+    session = {"id": session_id, "user": user, "size": size}
+    with open(os.path.join(base_folder, SESSION_FILE), "w") as f:
+        json.dump(session, f)
+
+    log.debug(f"Created upload session '{session_id}' for {size} bytes")
+    return {**session, "offset": 0}
+
+
+def get_session(session_id: str, user: str, root: str = UPLOAD_FOLDER) -> dict:
+    """
+    Returns the state of an upload session.
+
+    Args:
+        session_id (str): id of the session
+        user (str): username of the uploader
+        root (str): folder sessions are kept in
+
+    Returns:
+        dict: session state, with keys id, user, size and offset
+
+    Raises:
+        SessionNotFoundError: if the session does not exist or belongs to another user
+    """
+    base_folder = _session_folder(session_id, root)
+    try:
+        with open(os.path.join(base_folder, SESSION_FILE)) as f:
+            session = json.load(f)
+        offset = _offset(base_folder)
+    except (OSError, ValueError) as e:
+        raise SessionNotFoundError(f"Upload session '{session_id}' not found") from e
+
+    if session["user"] != user:
+        raise SessionNotFoundError(f"Upload session '{session_id}' not found")
+    return {**session, "offset": offset}
+
+
+def write_chunk(
+    session_id: str,
+    user: str,
+    offset: int,
+    chunk: BinaryIO,
+    chunk_length: int,
+    chunk_limit: int,
+    root: str = UPLOAD_FOLDER,
+) -> int:
+    """
+    Appends a chunk to the zipfile of an upload session.
+
+    Args:
+        session_id (str): id of the session
+        user (str): username of the uploader
+        offset (int): position of the chunk in the zipfile
+        chunk (BinaryIO): stream of the chunk's bytes
+        chunk_length (int): length of the chunk in bytes
+        chunk_limit (int): maximum allowed length of a chunk in bytes
+        root (str): folder sessions are kept in
+
+    Returns:
+        int: number of bytes received after writing the chunk
+
+    Raises:
+        SessionNotFoundError: if the session does not exist or belongs to another user
+        InvalidSessionError: if the chunk is too large or exceeds the declared upload size
+        OffsetMismatchError: if offset is not the number of bytes received so far
+        SessionBusyError: if another request is writing to the session
+    """
+    session = get_session(session_id, user, root)
+    if chunk_length > chunk_limit:
+        raise InvalidSessionError(f"Chunk exceeds size limit of {chunk_limit} bytes")
+    if offset + chunk_length > session["size"]:
+        raise InvalidSessionError(f"Chunk exceeds declared upload size of {session['size']} bytes")
+
+    upload_path = os.path.join(_session_folder(session_id, root), UPLOAD_FILE)
+    with open(upload_path, "r+b") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as e:
+            raise SessionBusyError(f"Upload session '{session_id}' is busy") from e
+
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise OffsetMismatchError(offset, received)
+
+        f.seek(offset)
+        remaining = chunk_length
+        try:
+            while remaining > 0:
+                data = chunk.read(min(COPY_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                remaining -= len(data)
+        finally:
+            # keep the bytes that did arrive, so the client can resume from there
+            f.flush()
+
+        return f.tell()
+
+
+def finalize_session(session_id: str, user: str, root: str = UPLOAD_FOLDER) -> tuple[str, str, str]:
+    """
+    Ends an upload session that received all bytes. The session's temp folder is handed over to
+    the caller, which must delete it after processing the zipfile.
+
+    Args:
+        session_id (str): id of the session
+        user (str): username of the uploader
+        root (str): folder sessions are kept in
+
+    Returns:
+        tuple[str, str, str]: path to base folder, path to images folder, path to zipfile
+
+    Raises:
+        SessionNotFoundError: if the session does not exist, belongs to another user, or was
+            finalized by a concurrent request
+        IncompleteUploadError: if the session has not received all bytes
+    """
+    session = get_session(session_id, user, root)
+    if session["offset"] != session["size"]:
+        raise IncompleteUploadError(
+            f"Upload session '{session_id}' received {session['offset']} of {session['size']} bytes"
+        )
+
+    base_folder = _session_folder(session_id, root)
+    try:
+        # removing the session file ends the session, at most one request can succeed at this
+        os.remove(os.path.join(base_folder, SESSION_FILE))
+    except FileNotFoundError as e:
+        raise SessionNotFoundError(f"Upload session '{session_id}' not found") from e
+
+    return base_folder, os.path.join(base_folder, "images"), os.path.join(base_folder, UPLOAD_FILE)
+
+
+def delete_session(session_id: str, user: str, root: str = UPLOAD_FOLDER) -> None:
+    """
+    Deletes an upload session and its temp folder.
+
+    Args:
+        session_id (str): id of the session
+        user (str): username of the uploader
+        root (str): folder sessions are kept in
+
+    Raises:
+        SessionNotFoundError: if the session does not exist or belongs to another user
+    """
+    get_session(session_id, user, root)
+    shutil.rmtree(_session_folder(session_id, root), ignore_errors=True)
+    log.debug(f"Deleted upload session '{session_id}'")
@@ -0,0 +1,123 @@
+"""
+Summary statistics of the images of an upload: camera model counts, capture date range, ISO
+distribution and GPS bounding box. The statistics are running aggregates, updated image by image
+as metadata is extracted, so summarizing an upload needs no second pass over its metadata, and
+memory use depends on the number of distinct camera models and ISO values, not of images.
+
+Classes:
+    UploadSummary: running aggregates of the metadata of an upload's images
+"""
+
+import json
+from collections import Counter
+
+from utils.metadata_store import (
+    get_search_fields,
+    get_capture_time,
+    MAKE_FIELD,
+    MODEL_FIELD,
+    ISO_FIELD,
+    LOCATION_FIELD,
+)
+
+
+# name of the summary file added to the result zipfile of an upload
+SUMMARY_NAME = "summary.json"
+
+
+class UploadSummary:
+    """
+    Running aggregates of the metadata of an upload's images.
+
+    Attributes:
+        images (int): number of images added
+    """
+
+    def __init__(self):
+        self.images = 0
+        self._cameras = Counter()
+        self._iso = Counter()
+        self._captured = 0
+        self._first_capture = self._last_capture = None
+        self._located = 0
+        # min_lon, min_lat, max_lon, max_lat
+        self._bbox = None
+
+    def add(self, metadata: dict) -> None:
+        """
+        Adds the metadata of an image to the aggregates.
+
+        Args:
+            metadata (dict): extracted metadata of an image
+        """
+        self.images += 1
+        fields = get_search_fields(metadata)
+
+        camera = _camera_name(fields[MAKE_FIELD], fields[MODEL_FIELD])
+        if camera is not None:
+            self._cameras[camera] += 1
+        if fields[ISO_FIELD] is not None:
+            self._iso[f"{fields[ISO_FIELD]:g}"] += 1
+
+        captured_at = get_capture_time(metadata)
+        if captured_at is not None:
+            self._captured += 1
+            if self._first_capture is None or captured_at < self._first_capture:
+                self._first_capture = captured_at
+            if self._last_capture is None or captured_at > self._last_capture:
+                self._last_capture = captured_at
+
+        if LOCATION_FIELD in fields:
+            lon, lat = fields[LOCATION_FIELD]["coordinates"]
+            self._located += 1
+            if self._bbox is None:
+                self._bbox = [lon, lat, lon, lat]
+            else:
+                self._bbox = [
+                    min(self._bbox[0], lon),
+                    min(self._bbox[1], lat),
+                    max(self._bbox[2], lon),
+                    max(self._bbox[3], lat),
+                ]
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: the summary, as written to SUMMARY_NAME. Cameras and ISO values map to their
+                number of images, and the bounding box is [min_lon, min_lat, max_lon, max_lat]
+                like the bbox search parameter, None if no image has GPS coordinates.
+        """
+        return {
+            "images": self.images,
+            "cameras": dict(self._cameras.most_common()),
+            "iso": dict(sorted(self._iso.items(), key=lambda item: float(item[0]))),
+            "captured": {
+                "images": self._captured,
+                "first": self._first_capture.isoformat() if self._first_capture else None,
+                "last": self._last_capture.isoformat() if self._last_capture else None,
+            },
+            "gps": {"images": self._located, "bbox": self._bbox},
+        }
+
+    def write(self, file_path: str) -> None:
+        """
+        Writes the summary to a json file.
+
+        Args:
+            file_path (str): path to the json file
+        """
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+def _camera_name(make: str | None, model: str | None) -> str | None:
+    """
+    Returns:
+        str | None: make and model of a camera, without repeating the make if the model
+            starts with it, e.g. "NIKON CORPORATION" and "NIKON D750" give "NIKON D750"
+    """
+    if make is None or model is None:
+        return model or make
+    if model.lower().startswith(make.split()[0].lower()):
+        return model
+    return f"{make} {model}"
@@ -2,31 +2,48 @@
 Utility functions for uploading files.
 
 Functions:
-    validate_zip_contents(zip_file: BytesIO) -> None
+    validate_image_filename(filename: str) -> None
+    validate_image_content(filename: str, header: bytes) -> None
+    validate_image_file(filename: str, header: bytes) -> None
+    validate_image_stream(chunks: Iterable[bytes], filename: str) -> Iterator[bytes]
     check_zip_size(zip_file: BytesIO) -> None
     save_file(file: FileStorage, folder: str) -> str
-    create_temp_folder(req_id: str) -> tuple[str, str]
+    save_stream(chunks: Iterable[bytes], filename: str, folder: str) -> str
+    create_unique_file(filename: str, folder: str) -> tuple[int, str]
+    create_temp_folder(req_id: str, root: str = UPLOAD_FOLDER) -> tuple[str, str]
 
 Exceptions:
     InvalidFileError(Exception)
     LargeZipError(Exception)
     CreateTempFolderError(Exception)
-    SaveZipFileError(Exception)
+    SaveFileError(Exception)
+    SaveZipFileError(SaveFileError)
 """
 
+import itertools
 import os
-import zipfile
 import logging
 import re
 from io import BytesIO
+from typing import Iterable, Iterator
 
 from werkzeug.datastructures import FileStorage
 
-from utils.constants import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, ZIP_SIZE_LIMIT_MB
+from utils.constants import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, IMAGE_SIGNATURES, ZIP_SIZE_LIMIT_MB
 
 
 log = logging.getLogger(__name__)
 
+# permissions of saved uploads: read-write for owner, read for group and others
+FILE_MODE = 0o644
+
+DISALLOWED_CHARS = re.compile(r"[^\w.!@#$%^()\[\]-]")
+REPEATED_PERIODS = re.compile(r"\.{2,}")
+REPEATED_UNDERSCORES = re.compile(r"_+")
+
+# number of leading bytes needed to check a file's content against its extension
+SIGNATURE_SIZE = max(len(signature) for signature in IMAGE_SIGNATURES.values())
+
 
 class InvalidFileError(Exception):
     """
@@ -53,7 +70,15 @@ class CreateTempFolderError(Exception):
     pass
 
 
-class SaveZipFileError(Exception):
+class SaveFileError(Exception):
+    """
+    Exception raised for when an uploaded file cannot be saved to disk.
+    """
+
+    pass
+
+
+class SaveZipFileError(SaveFileError):
     """
     Exception raised for when a request's zipfile cannot be saved to disk.
     """
@@ -61,26 +86,80 @@ class SaveZipFileError(Exception):
     pass
 
 
-def validate_zip_contents(zip_file: BytesIO) -> None:
+def validate_image_filename(filename: str) -> None:
     """
-    Validates that all files in a zipfile are image files.
+    Validates that a filename has an image file extension.
 
     Args:
-        zip_file (FileStorage): zipfile to validate
+        filename (str): filename to validate
 
     Raises:
-        InvalidFileError: if any file in zipfile is not an image file
-        BadZipFile: if zipfile is corrupted (or likely file pointer is not at start of file)
+        InvalidFileError: if filename is not an image filename
     """
-    try:
-        with zipfile.ZipFile(zip_file, "r") as zip_ref:
-            for file in zip_ref.namelist():
-                _, file_extension = os.path.splitext(file)
-                if not file_extension[1:] in ALLOWED_EXTENSIONS:
-                    raise InvalidFileError(f"File {file} is not an image file")
-    except zipfile.BadZipFile as e:
-        log.error(f"BadZipFile: zipfile is corrupted -> {e}")
-        raise e
+    _, file_extension = os.path.splitext(filename)
+    if not file_extension[1:] in ALLOWED_EXTENSIONS:
+        raise InvalidFileError(f"File {filename} is not an image file")
+
+
+def validate_image_content(filename: str, header: bytes) -> None:
+    """
+    Validates that the leading bytes of a file match its image file extension.
+
+    Args:
+        filename (str): name of file
+        header (bytes): leading bytes of file, at least 8 unless the file is shorter
+
+    Raises:
+        InvalidFileError: if the file's content does not match its extension
+    """
+    _, file_extension = os.path.splitext(filename)
+    signature = IMAGE_SIGNATURES.get(file_extension[1:].lower())
+    if signature is None or not header.startswith(signature):
+        raise InvalidFileError(f"File {filename} is not an image file")
+
+
+def validate_image_file(filename: str, header: bytes) -> None:
+    """
+    Validates that a file has an image file extension and that its leading bytes match it. Used
+    as the validate callback of unzip_file, so each member is checked once, as it is extracted.
+
+    Args:
+        filename (str): name of file
+        header (bytes): leading bytes of file, at least 8 unless the file is shorter
+
+    Raises:
+        InvalidFileError: if the file is not an image file
+    """
+    validate_image_filename(filename)
+    validate_image_content(filename, header)
+
+
+def validate_image_stream(chunks: Iterable[bytes], filename: str) -> Iterator[bytes]:
+    """
+    Validates the leading bytes of streamed file data against its image file extension, reading
+    only as many chunks as needed for that.
+
+    Args:
+        chunks (Iterable[bytes]): file data
+        filename (str): name of file
+
+    Returns:
+        Iterator[bytes]: the complete file data, including the chunks read for validation
+
+    Raises:
+        InvalidFileError: if the file's content does not match its extension
+    """
+    chunks = iter(chunks)
+    head = []
+    head_size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        head_size += len(chunk)
+        if head_size >= SIGNATURE_SIZE:
+            break
+
+    validate_image_content(filename, b"".join(head))
+    return itertools.chain(head, chunks)
 
 
 def _sanitize_filename(filename: str) -> str:
@@ -93,16 +172,14 @@ def _sanitize_filename(filename: str) -> str:
     Returns:
         str: sanitized filename
     """
-    allowed_chars = r"[^\w.!@#$%^()\[\]-]"
-
-    # Remove all characters not in allowed_chars
-    sanitized_filename = re.sub(allowed_chars, "", filename)
+    # Remove all characters not allowed
+    sanitized_filename = DISALLOWED_CHARS.sub("", filename)
 
     # Replace consecutive periods with a single period
-    sanitized_filename = re.sub(r"\.{2,}", ".", sanitized_filename)
+    sanitized_filename = REPEATED_PERIODS.sub(".", sanitized_filename)
 
     # Replace consecutive underscores with a single underscore
-    sanitized_filename = re.sub(r"[_]+", "_", sanitized_filename)
+    sanitized_filename = REPEATED_UNDERSCORES.sub("_", sanitized_filename)
 
     # Remove leading and trailing underscores, periods
     sanitized_filename = sanitized_filename.strip("_.")
@@ -152,12 +229,71 @@ def save_file(file: FileStorage, folder: str) -> str:
     return file_path
 
 
-def create_temp_folder(req_id: str) -> tuple[str, str]:
+def save_stream(chunks: Iterable[bytes], filename: str, folder: str) -> str:
+    """
+    Saves streamed file data to a folder, under the sanitized filename. If a file with that name
+    already exists, a numeric suffix is added to the name.
+
+    Args:
+        chunks (Iterable[bytes]): file data
+        filename (str): name of file, as sent by the client
+        folder (str): folder to save file to
+
+    Returns:
+        str: path to saved file
+
+    Raises:
+        SaveFileError: if the file cannot be created or written
+    """
+    fd, file_path = create_unique_file(os.path.basename(filename), folder)
+    try:
+        with open(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except OSError as e:
+        raise SaveFileError(f"Failed to write file '{file_path}' -> {e}") from e
+
+    return file_path
+
+
+def create_unique_file(filename: str, folder: str) -> tuple[int, str]:
+    """
+    Creates a new file in a folder, under the sanitized filename, with permissions restricted
+    to FILE_MODE. If a file with that name already exists, a numeric suffix is added to the name.
+
+    Args:
+        filename (str): name of file, as sent by the client
+        folder (str): folder to create file in
+
+    Returns:
+        tuple[int, str]: file descriptor opened for writing, path to file
+
+    Raises:
+        SaveFileError: if the file cannot be created
+    """
+    name, extension = os.path.splitext(_sanitize_filename(filename))
+    name = name or "file"
+
+    suffix = 0
+    while True:
+        file_path = os.path.join(
+            folder, f"{name}_{suffix}{extension}" if suffix else name + extension
+        )
+        try:
+            return os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, FILE_MODE), file_path
+        except FileExistsError:
+            suffix += 1
+        except OSError as e:
+            raise SaveFileError(f"Failed to create file '{file_path}' -> {e}") from e
+
+
+def create_temp_folder(req_id: str, root: str = UPLOAD_FOLDER) -> tuple[str, str]:
     """
     Creates a temporary folder for storing images.
 
     Args:
         req_id (str): request id to use for naming folder
+        root (str): folder to create the temporary folder in
 
     Returns:
         tuple[str, str]: path to base folder, path to images folder
@@ -165,7 +301,7 @@ def create_temp_folder(req_id: str) -> tuple[str, str]:
     Raises:
         CreateTempFolderError: if temp folder cannot be created
     """
-    base_folder = f"{UPLOAD_FOLDER}/{req_id}"
+    base_folder = f"{root}/{req_id}"
     imgs_folder = f"{base_folder}/images"
     try:
         os.makedirs(imgs_folder)
@@ -0,0 +1,188 @@
+"""
+User storage backends. The backend is selected with the STORE_BACKEND config value, so the app
+and its tests can run either against MongoDB or entirely in-process.
+
+Classes:
+    UserStore: interface implemented by all user storage backends
+    MongoUserStore: stores users in a MongoDB collection
+    InMemoryUserStore: stores users in a process-local dictionary
+
+Functions:
+    create_user_store(backend: str, mongo: MongoConnection, collection_name: str) -> UserStore
+
+Stores raise models.users.UserExistsError when adding a username that is already taken.
+"""
+
+import copy
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from models.users import USERNAME_FIELD, PASSWORD_FIELD, UserExistsError
+from utils.mongo_utils import (
+    MongoConnection,
+    create_db,
+    create_collection,
+    create_user_indexes,
+    add_user,
+    get_user,
+    update_user_password,
+    delete_user,
+)
+
+
+log = logging.getLogger(__name__)
+
+MONGO_BACKEND = "mongo"
+MEMORY_BACKEND = "memory"
+
+
+class UserStore(ABC):
+    """
+    Interface for user storage backends. Usernames are unique in every backend.
+    """
+
+    @abstractmethod
+    def add_user(self, username: str, password: str) -> None:
+        """
+        Adds a user.
+
+        Args:
+            username (str): username of the user to add
+            password (str): hashed password of the user to add
+
+        Raises:
+            UserExistsError: if a user with the same username already exists
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user(self, username: str) -> dict | None:
+        """
+        Gets a user.
+
+        Args:
+            username (str): username of the user to get
+
+        Returns:
+            dict | None: user document with USERNAME_FIELD and PASSWORD_FIELD, None if not found
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_password(self, username: str, password: str) -> None:
+        """
+        Replaces a user's password hash. Updating a user that does not exist is a no-op.
+
+        Args:
+            username (str): username of the user to update
+            password (str): new hashed password
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_user(self, username: str) -> None:
+        """
+        Deletes a user. Deleting a user that does not exist is a no-op.
+
+        Args:
+            username (str): username of the user to delete
+        """
+        raise NotImplementedError
+
+
+class MongoUserStore(UserStore):
+    """
+    Stores users in a MongoDB collection with a unique index on the username.
+    """
+
+    def __init__(self, mongo: MongoConnection, collection_name: str):
+        """
+        Args:
+            mongo (MongoConnection): lazily connected MongoDB connection
+            collection_name (str): name of the users collection
+        """
+        self.mongo = mongo
+        self.collection_name = collection_name
+        mongo.on_connect(self._ensure_indexes)
+
+    @property
+    def collection(self) -> Collection:
+        return self.mongo.collection(self.collection_name)
+
+    def _ensure_indexes(self, mongo_client: MongoClient) -> None:
+        db = create_db(mongo_client, self.mongo.db_name)
+        create_user_indexes(create_collection(db, self.collection_name))
+
+    def add_user(self, username: str, password: str) -> None:
+        add_user(self.collection, username, password)
+
+    def get_user(self, username: str) -> dict | None:
+        return get_user(self.collection, username)
+
+    def update_password(self, username: str, password: str) -> None:
+        update_user_password(self.collection, username, password)
+
+    def delete_user(self, username: str) -> None:
+        delete_user(self.collection, username)
+
+
+class InMemoryUserStore(UserStore):
+    """
+    Stores users in a process-local dictionary. Intended for tests, local development and load
+    tests on a single machine; users are lost when the process exits and are not shared between
+    worker processes.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def add_user(self, username: str, password: str) -> None:
+        log.debug(f"Adding user '{username}' to in-memory store")
+        with self._lock:
+            if username in self._users:
+                raise UserExistsError(f"User '{username}' already exists")
+            self._users[username] = {USERNAME_FIELD: username, PASSWORD_FIELD: password}
+
+    def get_user(self, username: str) -> dict | None:
+        log.debug(f"Getting user '{username}' from in-memory store")
+        with self._lock:
+            user = self._users.get(username)
+            return copy.copy(user) if user is not None else None
+
+    def update_password(self, username: str, password: str) -> None:
+        log.debug(f"Updating password of user '{username}' in in-memory store")
+        with self._lock:
+            if username in self._users:
+                self._users[username][PASSWORD_FIELD] = password
+
+    def delete_user(self, username: str) -> None:
+        log.debug(f"Deleting user '{username}' from in-memory store")
+        with self._lock:
+            self._users.pop(username, None)
+
+
+def create_user_store(backend: str, mongo: MongoConnection, collection_name: str) -> UserStore:
+    """
+    Creates the user store for a storage backend.
+
+    Args:
+        backend (str): "mongo" or "memory"
+        mongo (MongoConnection): MongoDB connection, used by the mongo backend
+        collection_name (str): name of the users collection, used by the mongo backend
+
+    Returns:
+        UserStore: user store for the backend
+
+    Raises:
+        ValueError: if backend is not a known storage backend
+    """
+    if backend == MONGO_BACKEND:
+        return MongoUserStore(mongo, collection_name)
+    if backend == MEMORY_BACKEND:
+        return InMemoryUserStore()
+    raise ValueError(f"Unknown storage backend '{backend}'")
@@ -0,0 +1,509 @@
+"""
+Per-request workspaces: the temp folders uploads are saved, unzipped and processed in.
+
+Workspaces are created under a configurable root, which can be on a RAM-backed tmpfs such as
+/dev/shm. Released workspaces are moved into a trash folder and deleted by a background reaper
+thread, so responses do not wait for deletion. The reaper also sweeps workspaces orphaned by
+crashed worker processes and expired resumable upload sessions, and measures the disk usage of
+the root. New workspaces are checked against the quota using that measurement plus the bytes
+reserved or written since, so the check itself never walks the workspaces.
+
+Before writing a known amount of data, e.g. an upload body or the contents of a zipfile, a
+request reserves that much free space. Reservations are recorded in a ledger folder under the
+root, so concurrent requests of all worker processes cannot together overcommit the disk, and a
+request that cannot fit fails before any data is written. Released reservations stay in the
+ledger as written bytes until the next sweep has measured them.
+
+Classes:
+    WorkspaceManager: Flask extension creating, releasing and cleaning up workspaces
+    Reservation: disk space reserved for data about to be written
+
+Exceptions:
+    WorkspaceQuotaError(Exception)
+    InsufficientSpaceError(Exception)
+"""
+
+import contextlib
+import fcntl
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+from utils.constants import UPLOAD_FOLDER
+from utils.upload_utils import create_temp_folder, CreateTempFolderError
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUOTA_MB = 2000
+DEFAULT_SESSION_TTL_MINS = 24 * 60
+DEFAULT_SWEEP_INTERVAL_S = 10
+# free space kept unreserved on the workspace volume
+DEFAULT_DISK_HEADROOM_MB = 100
+
+TRASH_FOLDER = ".trash"
+# marks a workspace owned by a single request, holding "<pid> <boot token>" of the owning process
+OWNER_FILE = ".owner"
+# one file per worker process, named <pid> and holding the process's boot token, a uuid chosen
+# at startup; a pid reused after a restart, e.g. in a container, has a different boot token
+PROCESSES_FOLDER = ".processes"
+# one file per reservation, named <pid>-<boot token>-<id> and holding the reserved bytes
+RESERVATIONS_FOLDER = ".reservations"
+LEDGER_LOCK_FILE = ".lock"
+# released reservations, named <pid>-<id>.written, count towards the quota until the next sweep
+WRITTEN_SUFFIX = ".written"
+# workspace usage measured by the last sweep of any process
+USAGE_FILE = ".usage"
+
+
+class WorkspaceQuotaError(Exception):
+    """
+    Exception raised when the workspaces use up the disk quota.
+    """
+
+    pass
+
+
+class InsufficientSpaceError(Exception):
+    """
+    Exception raised when the workspace volume does not have enough unreserved free space.
+    """
+
+    pass
+
+
+class Reservation:
+    """
+    Disk space reserved for data about to be written. Release it once the data is written, as
+    the free space of the volume then accounts for it.
+    """
+
+    def __init__(self, ledger_path: str, nbytes: int):
+        self.ledger_path = ledger_path
+        self.nbytes = nbytes
+
+    def release(self) -> None:
+        """
+        Releases the reserved space. The reserved bytes still count towards the workspace quota
+        until the next sweep measures the written data.
+        """
+        written_path = self.ledger_path + WRITTEN_SUFFIX
+        with contextlib.suppress(FileNotFoundError):
+            os.rename(self.ledger_path, written_path)
+            # the sweep keeps records released after it started measuring
+            os.utime(written_path)
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class WorkspaceManager:
+    """
+    Creates request workspaces under WORKSPACE_ROOT and deletes them in the background.
+
+    Request workspaces record the pid and boot token of their process, and are swept once that
+    process is gone.
+    Workspaces without an owner, i.e. resumable upload sessions shared by all processes, are
+    swept once unmodified for WORKSPACE_SESSION_TTL_MINS.
+    """
+
+    def __init__(self, app=None):
+        self.root = UPLOAD_FOLDER
+        self.quota_bytes = DEFAULT_QUOTA_MB * 1000000
+        self.session_ttl_s = DEFAULT_SESSION_TTL_MINS * 60
+        self.sweep_interval_s = DEFAULT_SWEEP_INTERVAL_S
+        self.disk_headroom_bytes = DEFAULT_DISK_HEADROOM_MB * 1000000
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Reads the root, quota and sweep settings from the app config and sweeps orphaned
+        workspaces.
+
+        Args:
+            app (Flask): Flask app whose config may define WORKSPACE_ROOT, WORKSPACE_QUOTA_MB,
+                WORKSPACE_SESSION_TTL_MINS, WORKSPACE_SWEEP_INTERVAL_S and
+                WORKSPACE_DISK_HEADROOM_MB
+        """
+        self.root = app.config.get("WORKSPACE_ROOT") or UPLOAD_FOLDER
+        self.quota_bytes = app.config.get("WORKSPACE_QUOTA_MB", DEFAULT_QUOTA_MB) * 1000000
+        self.session_ttl_s = (
+            app.config.get("WORKSPACE_SESSION_TTL_MINS", DEFAULT_SESSION_TTL_MINS) * 60
+        )
+        self.sweep_interval_s = app.config.get(
+            "WORKSPACE_SWEEP_INTERVAL_S", DEFAULT_SWEEP_INTERVAL_S
+        )
+        self.disk_headroom_bytes = (
+            app.config.get("WORKSPACE_DISK_HEADROOM_MB", DEFAULT_DISK_HEADROOM_MB) * 1000000
+        )
+        app.extensions["workspaces"] = self
+        self.sweep()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._released = queue.Queue()
+        self._reaper = None
+        self._usage = 0
+        self._boot_token = uuid.uuid4().hex
+        self._registered = False
+
+    @property
+    def usage(self) -> int:
+        """
+        Returns:
+            int: bytes used by workspaces as of the last sweep
+        """
+        return self._usage
+
+    def check_quota(self) -> None:
+        """
+        Checks that the workspaces are within the disk quota.
+
+        Raises:
+            WorkspaceQuotaError: if the workspaces use up the quota
+        """
+        with self._ledger() as ledger:
+            self._check_quota(ledger)
+
+    def _check_quota(self, ledger: str) -> None:
+        """
+        Checks the quota against the usage measured by the last sweep, plus the bytes of open
+        reservations and of reservations released since. Must be called holding the ledger lock.
+        """
+        usage = _read_usage(ledger) + sum(size for _, _, size in _read_ledger(ledger))
+        usage += sum(size for _, _, size in _read_written(ledger))
+        if usage >= self.quota_bytes:
+            raise WorkspaceQuotaError(f"Workspaces use {usage} of {self.quota_bytes} bytes quota")
+
+    def reserve(self, nbytes: int) -> Reservation:
+        """
+        Reserves free space on the workspace volume.
+
+        Args:
+            nbytes (int): bytes about to be written
+
+        Returns:
+            Reservation: the reservation, to release once the data is written
+
+        Raises:
+            InsufficientSpaceError: if the volume's free space, less the headroom and the other
+                reservations, is smaller than nbytes
+        """
+        self._register()
+        with self._ledger() as ledger:
+            self._check_space(ledger, nbytes)
+            path = os.path.join(ledger, f"{os.getpid()}-{self._boot_token}-{uuid.uuid4().hex}")
+            with open(path, "w") as f:
+                f.write(str(nbytes))
+        return Reservation(path, nbytes)
+
+    def check_space(self, nbytes: int) -> None:
+        """
+        Checks that nbytes could be reserved, without reserving them.
+
+        Args:
+            nbytes (int): bytes that will be written
+
+        Raises:
+            InsufficientSpaceError: if nbytes cannot be reserved now
+        """
+        with self._ledger() as ledger:
+            self._check_space(ledger, nbytes)
+
+    @contextlib.contextmanager
+    def _ledger(self):
+        """
+        Holds the lock of the reservation ledger, shared by all processes using the root.
+        """
+        ledger = os.path.join(self.root, RESERVATIONS_FOLDER)
+        os.makedirs(ledger, exist_ok=True)
+        with open(os.path.join(ledger, LEDGER_LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield ledger
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _check_space(self, ledger: str, nbytes: int) -> None:
+        reserved = sum(size for _, _, size in _read_ledger(ledger))
+        available = shutil.disk_usage(self.root).free - self.disk_headroom_bytes - reserved
+        if nbytes > available:
+            raise InsufficientSpaceError(
+                f"Need {nbytes} bytes, {max(0, available)} bytes of free space are unreserved"
+            )
+
+    def create(self, req_id: str) -> tuple[str, str]:
+        """
+        Creates the workspace of a request.
+
+        Args:
+            req_id (str): request id to use for naming the workspace
+
+        Returns:
+            tuple[str, str]: path to base folder, path to images folder
+
+        Raises:
+            WorkspaceQuotaError: if the workspaces use up the quota
+            CreateTempFolderError: if the workspace cannot be created
+        """
+        self._start_reaper()
+        self._register()
+        # hold the ledger lock until the workspace exists, so concurrent requests see it
+        with self._ledger() as ledger:
+            self._check_quota(ledger)
+            base_folder, imgs_folder = create_temp_folder(req_id, self.root)
+        try:
+            with open(os.path.join(base_folder, OWNER_FILE), "w") as f:
+                f.write(f"{os.getpid()} {self._boot_token}")
+        except OSError as e:
+            raise CreateTempFolderError(f"Folder {base_folder} could not be claimed: {e}") from e
+        return base_folder, imgs_folder
+
+    def release(self, base_folder: str) -> None:
+        """
+        Moves a workspace out of the way and queues it for deletion by the reaper thread.
+
+        Args:
+            base_folder (str): path to the workspace's base folder
+        """
+        self._start_reaper()
+        trash_folder = os.path.join(self.root, TRASH_FOLDER)
+        trashed = os.path.join(trash_folder, f"{os.path.basename(base_folder)}-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(trash_folder, exist_ok=True)
+            os.rename(base_folder, trashed)
+        except OSError as e:
+            log.warning(f"Could not move workspace {base_folder} to trash, deleting in place: {e}")
+            trashed = base_folder
+        self._released.put(trashed)
+
+    def _register(self) -> None:
+        """
+        Records the boot token of this process, replacing that of an earlier process with the
+        same pid.
+        """
+        if self._registered:
+            return
+        processes = os.path.join(self.root, PROCESSES_FOLDER)
+        os.makedirs(processes, exist_ok=True)
+        path = os.path.join(processes, str(os.getpid()))
+        with open(f"{path}.tmp", "w") as f:
+            f.write(self._boot_token)
+        os.replace(f"{path}.tmp", path)
+        self._registered = True
+
+    def _is_running(self, pid: int, boot_token: str | None) -> bool:
+        """
+        Returns whether the process that recorded pid and boot_token still runs. Without a boot
+        token, only the pid is checked.
+        """
+        if not _process_exists(pid):
+            return False
+        if boot_token is None:
+            return True
+        try:
+            with open(os.path.join(self.root, PROCESSES_FOLDER, str(pid))) as f:
+                return f.read() == boot_token
+        except OSError:
+            return False
+
+    def _start_reaper(self) -> None:
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="workspace-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        next_sweep = time.monotonic() + self.sweep_interval_s
+        while True:
+            try:
+                folder = self._released.get(timeout=max(0, next_sweep - time.monotonic()))
+                shutil.rmtree(folder, ignore_errors=True)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_sweep:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    log.error(f"Failed to sweep workspaces -> {e}")
+                next_sweep = time.monotonic() + self.sweep_interval_s
+
+    def sweep(self) -> int:
+        """
+        Deletes the trash folder's contents, workspaces of processes that no longer run and
+        expired resumable upload sessions, then measures the disk usage of the remaining
+        workspaces.
+
+        Returns:
+            int: number of deleted workspaces
+        """
+        if not os.path.isdir(self.root):
+            self._usage = 0
+            return 0
+
+        self._register()
+        swept = 0
+        usage = 0
+        now = time.time()
+        for entry in _workspace_entries(self.root):
+            if self._is_orphaned(entry.path, now):
+                log.info(f"Sweeping orphaned workspace {entry.path}")
+                shutil.rmtree(entry.path, ignore_errors=True)
+                swept += 1
+            else:
+                usage += _folder_size(entry.path)
+
+        with self._ledger() as ledger:
+            # reservations of processes that exited before releasing them
+            for path, (pid, boot_token), _ in _read_ledger(ledger):
+                if not self._is_running(pid, boot_token):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+            # written bytes released before the measurement started are now part of usage
+            for path, released_at, _ in _read_written(ledger):
+                if released_at < now:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+            _write_usage(ledger, usage)
+
+        # boot tokens of processes that exited
+        for entry in os.scandir(os.path.join(self.root, PROCESSES_FOLDER)):
+            with contextlib.suppress(ValueError, FileNotFoundError):
+                if not _process_exists(int(entry.name)):
+                    os.remove(entry.path)
+
+        # trash left behind by processes that exited before their reaper emptied it
+        trash_folder = os.path.join(self.root, TRASH_FOLDER)
+        if os.path.isdir(trash_folder) and self._released.empty():
+            for entry in os.scandir(trash_folder):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+        self._usage = usage
+        return swept
+
+    def _is_orphaned(self, base_folder: str, now: float) -> bool:
+        try:
+            with open(os.path.join(base_folder, OWNER_FILE)) as f:
+                pid, _, boot_token = f.read().partition(" ")
+            return not self._is_running(int(pid), boot_token or None)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            return False
+        try:
+            return now - _latest_mtime(base_folder) > self.session_ttl_s
+        except OSError:
+            return False
+
+
+def _workspace_entries(root: str) -> list[os.DirEntry]:
+    """
+    Returns the workspace folders under the root.
+    """
+    if not os.path.isdir(root):
+        return []
+    return [
+        entry
+        for entry in os.scandir(root)
+        if entry.is_dir(follow_symlinks=False)
+        and entry.name not in (TRASH_FOLDER, RESERVATIONS_FOLDER, PROCESSES_FOLDER)
+    ]
+
+
+def _read_ledger(ledger: str) -> list[tuple[str, tuple[int, str | None], int]]:
+    """
+    Returns the path, owner (pid and boot token, if recorded) and size of each reservation in
+    the ledger.
+    """
+    reservations = []
+    for entry in os.scandir(ledger):
+        if entry.name.startswith(".") or entry.name.endswith(WRITTEN_SUFFIX):
+            continue
+        try:
+            with open(entry.path) as f:
+                size = int(f.read())
+            pid, *rest = entry.name.split("-")
+            boot_token = rest[0] if len(rest) == 2 else None
+            reservations.append((entry.path, (int(pid), boot_token), size))
+        except (OSError, ValueError):
+            continue
+    return reservations
+
+
+def _read_written(ledger: str) -> list[tuple[str, float, int]]:
+    """
+    Returns the path, release time and size of each released reservation in the ledger.
+    """
+    written = []
+    for entry in os.scandir(ledger):
+        if not entry.name.endswith(WRITTEN_SUFFIX):
+            continue
+        try:
+            with open(entry.path) as f:
+                size = int(f.read())
+            written.append((entry.path, entry.stat().st_mtime, size))
+        except (OSError, ValueError):
+            continue
+    return written
+
+
+def _read_usage(ledger: str) -> int:
+    """
+    Returns the workspace usage measured by the last sweep, 0 if none was recorded.
+    """
+    try:
+        with open(os.path.join(ledger, USAGE_FILE)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_usage(ledger: str, usage: int) -> None:
+    path = os.path.join(ledger, USAGE_FILE)
+    with open(f"{path}.{os.getpid()}", "w") as f:
+        f.write(str(usage))
+    os.replace(f"{path}.{os.getpid()}", path)
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _latest_mtime(folder: str) -> float:
+    latest = os.path.getmtime(folder)
+    for root, _, files in os.walk(folder):
+        for file in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, file)))
+            except OSError:
+                pass
+    return latest
+
+
+def _folder_size(folder: str) -> int:
+    size = 0
+    for root, _, files in os.walk(folder):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return size
@@ -2,7 +2,9 @@
 This module contains functions for zipping and unzipping files.
 
 Functions:
-    unzip_file(zip_path: str, extract_dir: str) -> None
+    unzip_file(zip_path: str, extract_dir: str,
+        validate: Callable[[str, bytes], None] | None = None) -> list[str]
+    get_uncompressed_size(zip_path: str) -> int
     zip_files(folder_path: str) -> BytesIO
 
 Exceptions:
@@ -14,13 +16,18 @@ import zipfile
 import os
 import io
 import logging
+from typing import Callable
 
 from utils.mime_type import get_mime_type
-from utils.upload_utils import _sanitize_filename
+from utils.upload_utils import create_unique_file, SaveFileError
 
 
 log = logging.getLogger(__name__)
 
+# bytes of a member passed to the validate callback of unzip_file, enough for file signatures
+HEADER_SIZE = 64
+COPY_BUFFER_SIZE = 1024 * 1024
+
 
 class UnzipError(Exception):
     """
@@ -54,25 +61,35 @@ class ZipError(Exception):
         return self.message
 
 
-def unzip_file(zip_path: str, extract_dir: str) -> None:
+def unzip_file(
+    zip_path: str, extract_dir: str, validate: Callable[[str, bytes], None] | None = None
+) -> list[str]:
     """
-    Unzips a zip file (on-disk) to a specified directory.
+    Unzips a zip file (on-disk) to a specified directory, in a single pass over its members.
+    Each member is saved under its sanitized name, with a numeric suffix if a previous member
+    was saved under the same name, in a file created with restricted permissions.
 
     Args:
         zip_path (str): path to zip file
         extract_dir (str): path to directory to extract zip file to
+        validate (Callable[[str, bytes], None] | None): called with the name and the leading
+            bytes of each member before it is saved; raising an exception stops the extraction
+
+    Returns:
+        list[str]: paths to the extracted files, in the zipfile's order
 
     Raises:
         UnzipError: if an error occurs while unzipping
     """
     try:
         with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            if zip_ref.namelist() == []:
+            members = [file_info for file_info in zip_ref.infolist() if not file_info.is_dir()]
+            if not members:
                 raise UnzipError("Zip file is empty")
-            for file_info in zip_ref.infolist():
-                sanitized_filename = _sanitize_filename(file_info.filename)
-                file_info.filename = sanitized_filename
-                zip_ref.extract(file_info, path=extract_dir)
+            os.makedirs(extract_dir, exist_ok=True)
+            return [
+                _extract_member(zip_ref, file_info, extract_dir, validate) for file_info in members
+            ]
     except zipfile.BadZipFile as e:
         log.error(f"BadZipFile: zipfile {zip_path} is corrupted -> {e}")
         raise UnzipError("Zip file is corrupted", e)
@@ -82,11 +99,56 @@ def unzip_file(zip_path: str, extract_dir: str) -> None:
     except zipfile.LargeZipFile as e:
         log.error(f"LargeZipFile: zip file exceeds limits -> {e}")
         raise UnzipError("Zip file exceeds size limit", e)
+    except SaveFileError as e:
+        log.error(f"SaveFileError: could not extract zipfile {zip_path} -> {e}")
+        raise UnzipError("", e)
     except OSError as e:
         log.error(f"OSError: could not extract zipfile {zip_path} -> {e}")
         raise UnzipError("", e)
 
 
+def _extract_member(
+    zip_ref: zipfile.ZipFile,
+    file_info: zipfile.ZipInfo,
+    extract_dir: str,
+    validate: Callable[[str, bytes], None] | None,
+) -> str:
+    """
+    Validates and saves a member of a zipfile, and returns the path it was saved to.
+    """
+    with zip_ref.open(file_info) as member:
+        header = member.read(HEADER_SIZE)
+        if validate is not None:
+            validate(file_info.filename, header)
+
+        fd, file_path = create_unique_file(os.path.basename(file_info.filename), extract_dir)
+        log.debug(f"Extracting '{file_info.filename}' to '{file_path}'")
+        with open(fd, "wb") as f:
+            f.write(header)
+            while data := member.read(COPY_BUFFER_SIZE):
+                f.write(data)
+
+    return file_path
+
+
+def get_uncompressed_size(zip_path: str) -> int:
+    """
+    Returns the total uncompressed size of a zipfile's members, as declared in its central
+    directory. Extraction never writes more than the declared size of a member.
+
+    Args:
+        zip_path (str): path to zip file
+
+    Returns:
+        int: uncompressed size in bytes
+
+    Raises:
+        BadZipFile: if zipfile is corrupted
+    """
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        return sum(file_info.file_size for file_info in zip_ref.infolist())
+
+
 def zip_files(folder_path: str) -> io.BytesIO:
     """
     Zips all files in a folder (on-disk) to a zipfile (in-memory).